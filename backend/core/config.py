@@ -15,3 +15,87 @@ TOKEN_FILE = os.getenv("TOKEN_FILE", "token.json")
 
 # For CORS
 ALLOWED_ORIGINS = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "*").split(",")]
+
+# Serving: uvicorn worker processes (uvicorn reads WEB_CONCURRENCY itself as its --workers
+# default). Workers share state through SQLite (services/web_workers.py); the process
+# pools below default to this worker's share of the cores.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+WORKER_HEARTBEAT = float(os.getenv("WORKER_HEARTBEAT", "5"))  # seconds between heartbeats / metric snapshots
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", "30"))  # a worker silent this long is taken as gone
+CPU_SHARE = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+
+# Extraction cache (keyed by SHA-256 of the uploaded bytes)
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 86400)))  # seconds
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# OCR engine (page-parallel OCR of scanned PDFs)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")  # auto | tesserocr | pytesseract
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or CPU_SHARE
+OCR_MAX_INFLIGHT_PAGES = int(os.getenv("OCR_MAX_INFLIGHT_PAGES", "0")) or OCR_WORKERS * 2
+OCR_PDF_DEADLINE = float(os.getenv("OCR_PDF_DEADLINE", "180"))  # seconds per document
+# Scale pages/photos to the text size Tesseract reads best, deskew and binarize before OCR
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1").lower() in ("1", "true", "yes")
+OCR_TARGET_LINE_PX = int(os.getenv("OCR_TARGET_LINE_PX", "32"))  # text line height, ascender to descender
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(8_000_000)))  # per page or photo fed to Tesseract
+# A PDF page with fewer text-layer characters than this is OCR'd (if it has images)
+PAGE_TEXT_MIN_CHARS = int(os.getenv("PAGE_TEXT_MIN_CHARS", "20"))
+# Longer PDFs are read first/last pages first and stop once vendor, date and amount are found
+PDF_EARLY_EXIT_PAGES = int(os.getenv("PDF_EARLY_EXIT_PAGES", "10"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "40"))  # pages read per long document, at most
+PDF_MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", "400000"))  # text kept per long document, at most
+# threads search-indexing every page of long PDFs after their upload (pipeline.insert_records)
+FULL_TEXT_WORKERS = int(os.getenv("FULL_TEXT_WORKERS", "1"))
+
+# Background upload jobs (POST /jobs)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "200"))  # queued files before POST /jobs returns 503
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(STORAGE_ROOT, ".jobs"))
+# Drive credentials of a queued upload job are stored encrypted with this key (default: the
+# session SECRET_KEY) and dropped when the job finishes, or after JOB_CREDS_TTL seconds
+JOB_CREDS_KEY = os.getenv("JOB_CREDS_KEY") or os.getenv("SECRET_KEY", "super-secret-key-change-me")
+JOB_CREDS_TTL = int(os.getenv("JOB_CREDS_TTL", str(86400)))
+
+# Batch uploads (POST /upload/batch)
+# threads reading PDFs (documents in extract_text at once); their OCR goes to the OCR_WORKERS processes
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0")) or max(4, CPU_SHARE)
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))  # threads for file moves and SQLite writes
+DRIVE_WORKERS = int(os.getenv("DRIVE_WORKERS", "4"))  # threads for Drive uploads (googleapiclient is blocking)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))  # async LLM calls in flight (/upload, /upload/batch)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+# Upload ingest
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Duplicate uploads (services/duplicates.py): same bytes, a re-taken photo, or the same
+# vendor/date/amount stop before processing unless the request passes allow_duplicate
+DUPLICATE_CHECK = os.getenv("DUPLICATE_CHECK", "1").lower() in ("1", "true", "yes")
+IMAGE_DUP_MAX_BITS = int(os.getenv("IMAGE_DUP_MAX_BITS", "40"))  # of the 256-bit photo hash
+
+# Regex field extractor: extra keyword packs on top of the built-in English tables,
+# by name (KEYWORD_PACK_DIR/<name>.json) or path, e.g. KEYWORD_PACKS=hi
+KEYWORD_PACKS = [p.strip() for p in os.getenv("KEYWORD_PACKS", "").split(",") if p.strip()]
+KEYWORD_PACK_DIR = os.getenv(
+    "KEYWORD_PACK_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "keywords"),
+)
+
+# Learned vendor dictionary (services/vendor_index.py)
+VENDOR_INDEX_REFRESH = float(os.getenv("VENDOR_INDEX_REFRESH", "30"))  # seconds between reloads from SQLite
+VENDOR_MIN_USES = int(os.getenv("VENDOR_MIN_USES", "1"))  # confirmed uploads before a vendor is matched
+VENDOR_FUZZY_RATIO = float(os.getenv("VENDOR_FUZZY_RATIO", "0.9"))  # similarity needed for an inexact header match
+# With a known vendor, take date/amount from the regex extractor (when it finds both) instead of calling the LLM
+VENDOR_SKIP_LLM = os.getenv("VENDOR_SKIP_LLM", "0").lower() in ("1", "true", "yes")
+
+# LLM gateway (services/llm_gateway.py): cached Groq responses, keyed by prompt version + normalized text
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 86400)))  # seconds, 0 = no response cache
+# Client-side LLM rate limiting (services/llm_scheduler.py). Starting budget; the token
+# budget is then learned from Groq's x-ratelimit-* headers, the request rate from 429s.
+LLM_MAX_RPM = float(os.getenv("LLM_MAX_RPM", "30"))
+LLM_MAX_TPM = float(os.getenv("LLM_MAX_TPM", "6000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+# How long a request may wait for quota (queue + retries) before it is treated as rate limited
+LLM_INTERACTIVE_MAX_WAIT = float(os.getenv("LLM_INTERACTIVE_MAX_WAIT", "20"))  # /upload, the user is waiting
+LLM_BATCH_MAX_WAIT = float(os.getenv("LLM_BATCH_MAX_WAIT", "300"))  # /upload/batch and /jobs
+# Document text in the extraction prompt is trimmed to about this many tokens (0 = send it all)
+LLM_PROMPT_TOKENS = int(os.getenv("LLM_PROMPT_TOKENS", "1500"))
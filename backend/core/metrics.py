@@ -0,0 +1,244 @@
+# backend/core/metrics.py
+"""
+In-process metrics, rendered in the Prometheus text format by GET /metrics.
+
+  HTTP_REQUESTS.inc(method="POST", route="/upload", status="200")
+  with STAGE_SECONDS.time(stage="drive"): ...
+
+Counters and histograms live in module globals and are cheap to update (a
+dict lookup and a bisect under a lock). Gauges that already exist
+elsewhere (stage queues, the LLM rate limiter) are read at scrape time
+through register_collector().
+
+Work run on the extraction process pool records into that process's
+registry; stages.py ships it back with the result (drain() in the worker,
+merge() here), so the parent's /metrics includes it. With several web
+workers, each one publishes snapshot() and /metrics renders the sum
+(services/web_workers.py).
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Seconds: covers a cached lookup (~1 ms) up to a slow OCR or LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: Dict[str, "_Metric"] = {}
+_collectors: List[Callable] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(map(labels.get, self.labels))
+
+    def _label_str(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape("" if value is None else str(value))}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def _merge(self, values):
+        with self._lock:
+            for key, n in values.items():
+                self._values[key] = self._values.get(key, 0) + n
+
+    @staticmethod
+    def _combine(a, b):
+        return a + b
+
+    def _lines(self, values):
+        for key, n in sorted(values.items(), key=_sort_key):
+            yield f"{self.name}{self._label_str(key)} {_num(n)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, seconds: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket (not cumulative) counts + the +Inf bucket, sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += seconds
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _merge(self, values):
+        with self._lock:
+            for key, (counts, total, n) in values.items():
+                entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += n
+
+    @staticmethod
+    def _combine(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def _lines(self, values):
+        for key, (counts, total, n) in sorted(values.items(), key=_sort_key):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{self._label_str(key, le_label)} {cumulative}"
+            yield f"{self.name}_sum{self._label_str(key)} {_num(round(total, 6))}"
+            yield f"{self.name}_count{self._label_str(key)} {n}"
+
+
+def _sort_key(item):
+    return tuple(str(v) for v in item[0])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def register_collector(fn: Callable):
+    """
+    fn() -> [(name, kind, help, [(labels dict, value), ...])] read at scrape
+    time, for figures another module already keeps (kind: gauge or counter).
+    """
+    _collectors.append(fn)
+
+
+def drain() -> Dict[str, dict]:
+    """Everything recorded in this process since the last drain(), and reset (pool workers)."""
+    out = {}
+    for name, metric in _registry.items():
+        with metric._lock:
+            if metric._values:
+                out[name] = metric._values
+                metric._values = {}
+    return out
+
+
+def merge(drained: Dict[str, dict]):
+    for name, values in drained.items():
+        metric = _registry.get(name)
+        if metric is not None:
+            metric._merge(values)
+
+
+def _values(metric: _Metric) -> dict:
+    with metric._lock:
+        return {k: ([list(v[0]), v[1], v[2]] if isinstance(v, list) else v) for k, v in metric._values.items()}
+
+
+def collect():
+    """(families, errors): every registered collector's output, and the ones that failed."""
+    families, errors = [], []
+    for fn in _collectors:
+        try:
+            families.extend(fn())
+        except Exception as e:
+            errors.append(f"collector {getattr(fn, '__name__', fn)} failed: {e}")
+    return families, errors
+
+
+def snapshot() -> Dict[str, list]:
+    """Everything recorded in this process so far as {name: [[label values], value]}, JSON-ready."""
+    return {name: [[list(k), v] for k, v in _values(metric).items()] for name, metric in _registry.items()}
+
+
+def combine(snapshots) -> Dict[str, dict]:
+    """Sum of several snapshot()s, as {name: {label values: value}} for render()."""
+    out = {}
+    for snap in snapshots:
+        for name, pairs in snap.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            values = out.setdefault(name, {})
+            for key, v in pairs:
+                key = tuple(key)
+                values[key] = metric._combine(values[key], v) if key in values else v
+    return out
+
+
+def render(values: Dict[str, dict] = None, families=None, errors=()) -> str:
+    """
+    Prometheus text for this process, or for the given values (combine())
+    and collector families (collect()) when rendering several workers.
+    """
+    if families is None:
+        families, errors = collect()
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric._lines(_values(metric) if values is None else values.get(metric.name, {})))
+    for error in errors:
+        lines.append(f"# {_escape(error)}")
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {_num(value)}" if label_str else f"{name} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- the application's metrics ------------------------------------------
+
+HTTP_REQUESTS = Counter("invoice_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_SECONDS = Histogram("invoice_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+STAGE_SECONDS = Histogram("invoice_stage_duration_seconds",
+                          "Pipeline stage time per document (save, extract_text, extract_fields, store, drive)",
+                          ("stage",))
+STAGE_QUEUE_SECONDS = Histogram("invoice_stage_queue_seconds",
+                                "Time waiting for a free slot in a pipeline stage (services/stages.py)", ("stage",))
+EXTRACT_SECONDS = Histogram("invoice_text_extraction_seconds",
+                            "Text extraction time by the path that produced the text "
+                            "(text layer, ocr, hybrid, image_ocr)", ("method",))
+PDF_PAGES = Counter("invoice_pdf_pages_total",
+                    "PDF pages by how their text was read (text layer, ocr, empty, skipped)", ("method",))
+LLM_SECONDS = Histogram("invoice_llm_request_seconds", "Groq API request time (cache misses only)", ("outcome",))
+REGEX_SECONDS = Histogram("invoice_regex_extraction_seconds", "Regex field extraction time", ("reason",),
+                          buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+CACHE_LOOKUPS = Counter("invoice_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+FIELD_SOURCES = Counter("invoice_field_source_total", "Where a document's fields came from", ("source",))
+DUPLICATES = Counter("invoice_duplicates_total", "Uploads stopped as duplicates, by what matched", ("match",))
+FALLBACKS = Counter("invoice_fallbacks_total", "Degraded paths taken (regex instead of LLM, Drive failure)",
+                    ("kind",))
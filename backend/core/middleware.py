@@ -0,0 +1,49 @@
+# backend/core/middleware.py
+"""
+Per-request context for every HTTP request: a request id (the caller's
+X-Request-ID, or a new one) in the logging context var and the response
+headers, and the request's count and latency in core/metrics.
+
+A plain ASGI middleware rather than @app.middleware("http"), which would
+wrap every response (including streamed batch results) in another task.
+"""
+import time
+
+from backend.core.metrics import HTTP_REQUESTS, HTTP_SECONDS
+from backend.utils.logging_utils import request_id_var, new_request_id
+
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = new_request_id()
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id" and value:
+                request_id = value.decode("latin-1")[:64]
+                break
+        token = request_id_var.set(request_id)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            # the route template, not the path, so ids in URLs don't become label values
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_SECONDS.observe(time.perf_counter() - t0, method=method, route=route)
+            request_id_var.reset(token)
@@ -0,0 +1,82 @@
+# backend/core/storage.py
+"""
+Upload ingest. Uploaded bytes are written once, chunk by chunk, to a
+uniquely named temp file under STORAGE_ROOT/.incoming, hashed and
+size-checked as they arrive. Because the temp file lives on the same
+filesystem as STORAGE_ROOT, finalize() is a single atomic rename.
+"""
+import os
+import hashlib
+import tempfile
+
+from backend.core.config import STORAGE_ROOT, MAX_UPLOAD_BYTES
+
+CHUNK_SIZE = 1024 * 1024
+INCOMING_DIR = os.path.join(STORAGE_ROOT, ".incoming")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def new_temp_path(suffix: str = "") -> str:
+    """Unique, already-created temp file next to the final storage tree."""
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=INCOMING_DIR, suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def new_temp_dir(prefix: str = "") -> str:
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=INCOMING_DIR, prefix=prefix)
+
+
+def write_stream(fileobj, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    Copy fileobj to dest_path in chunks. Returns the SHA-256 of the bytes.
+    Raises UploadTooLarge (and removes the partial file) past max_bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the upload limit of {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        discard(dest_path)
+        raise
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest(fileobj, suffix: str = "", max_bytes: int = MAX_UPLOAD_BYTES):
+    """Stream an upload into a fresh temp file. Returns (temp_path, sha256)."""
+    path = new_temp_path(suffix)
+    return path, write_stream(fileobj, path, max_bytes)
+
+
+def finalize(temp_path: str, final_path: str) -> str:
+    """Atomically move an ingested file to its final place (same filesystem)."""
+    os.makedirs(os.path.dirname(final_path) or ".", exist_ok=True)
+    os.replace(temp_path, final_path)
+    return final_path
+
+
+def discard(path: str):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception:
+            pass
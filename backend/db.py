@@ -1,23 +1,170 @@
 # backend/db.py
 import os
+import html
+import json
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
+from backend.utils.text_utils import parse_amount, vendor_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single worker is assumed
+    fcntl = None
+
 DB_PATH = os.getenv("DB_PATH", os.path.join("backend", "data", "invoices.db"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# Applied to every new connection. WAL lets readers run alongside the writer,
+# NORMAL sync is durable in WAL mode except on power loss, busy_timeout makes
+# concurrent writers wait instead of failing with "database is locked".
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache
+]
+
+_pool = queue.LifoQueue()
+_folder_ready = False
+_folder_lock = threading.Lock()
 
 def _ensure_folder():
-    folder = os.path.dirname(DB_PATH)
-    if folder and not os.path.exists(folder):
-        os.makedirs(folder, exist_ok=True)
+    global _folder_ready
+    if _folder_ready:
+        return
+    with _folder_lock:
+        folder = os.path.dirname(DB_PATH)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        _folder_ready = True
 
-def get_conn():
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose close() hands it back to the pool instead of
+    closing it. Pooled connections keep their compiled-statement cache, so
+    the fixed SQL strings used below are prepared once per connection.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        if _pool.qsize() < DB_POOL_SIZE:
+            _pool.put(self)
+        else:
+            super().close()
+
+
+def _connect() -> PooledConnection:
     _ensure_folder()
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(
+        DB_PATH,
+        factory=PooledConnection,
+        check_same_thread=False,  # a pooled connection is used by one thread at a time
+        cached_statements=256,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+
+def get_conn():
+    """A connection from the pool; call close() to give it back."""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _connect()
+
+
+@contextmanager
+def connection():
+    conn = get_conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# Columns added after the first release, ALTERed into existing databases
+INVOICE_COLUMNS_ADDED = [
+    ("content_hash", "TEXT"),
+    ("timings", "TEXT"),    # JSON {stage: ms}
+    ("total_ms", "REAL"),
+    ("amount_value", "REAL"),  # amount_raw as a number, for range filters
+    ("owner", "TEXT"),  # drive_service.account_key of the uploader; history and search only show a user their own
+    ("vendor_confirmed", "INTEGER NOT NULL DEFAULT 0"),  # the user supplied or confirmed vendor_raw
+]
+
+# Support the history filters (routers/history.py). History is per owner, so
+# every index starts with owner, and ends in id so keyset pagination
+# (id < cursor ORDER BY id DESC) can walk it directly.
+INVOICE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner ON invoices(owner, id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_vendor ON invoices(owner, vendor_norm COLLATE NOCASE, id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_date ON invoices(owner, date_norm, id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_status ON invoices(owner, status, id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_amount ON invoices(owner, amount_value, id)",
+    # Duplicate checks (services/duplicates.py), also per owner
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_hash ON invoices(owner, content_hash, id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_owner_fields "
+    "ON invoices(owner, vendor_norm COLLATE NOCASE, date_norm, amount_value, id)",
+]
+
+# Replaced by the owner-scoped indexes above
+INVOICE_INDEXES_DROPPED = ["idx_invoices_vendor", "idx_invoices_date", "idx_invoices_status", "idx_invoices_amount",
+                           "idx_invoices_content_hash", "idx_invoices_fields"]
+
+# bm25 weights for the invoices_fts columns (vendor, filename, body)
+FTS_RANK = "bm25(5.0, 2.0, 1.0)"
+
+def _add_missing_columns(cur, table: str, columns) -> set:
+    """ALTER in the columns the table lacks; returns their names."""
+    existing = {r["name"] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    added = set()
+    for name, decl in columns:
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.add(name)
+    return added
+
+# Columns added to job_items after the first release
+JOB_ITEM_COLUMNS_ADDED = [
+    ("worker_id", "TEXT"),  # web worker running the item (services/web_workers.py)
+]
+
+# Columns added to jobs after the first release
+JOB_COLUMNS_ADDED = [
+    ("owner", "TEXT"),  # drive_service.account_key of the submitter, stored on the job's invoices
+]
+
+def _backfill_amount_values(cur):
+    rows = cur.execute(
+        "SELECT id, amount_raw FROM invoices WHERE amount_value IS NULL AND amount_raw IS NOT NULL"
+    ).fetchall()
+    updates = [(parse_amount(r["amount_raw"]), r["id"]) for r in rows]
+    cur.executemany("UPDATE invoices SET amount_value = ? WHERE id = ?", [u for u in updates if u[0] is not None])
+
+@contextmanager
+def _init_lock():
+    """Held while init_db runs, so web workers starting together migrate the database one at a time."""
+    _ensure_folder()
+    with open(DB_PATH + ".init-lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
 def init_db():
+    with _init_lock():
+        _create_tables()
+
+def _create_tables():
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("""
@@ -39,19 +186,138 @@ def init_db():
         error TEXT
     )
     """)
+    added = _add_missing_columns(cur, "invoices", INVOICE_COLUMNS_ADDED)
+    _backfill_amount_values(cur)
+    for name in INVOICE_INDEXES_DROPPED:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    for sql in INVOICE_INDEXES:
+        cur.execute(sql)
+    # Content-addressed cache of extraction results (see services/extraction_cache.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS extraction_cache (
+        sha256 TEXT PRIMARY KEY,
+        extractor_version TEXT NOT NULL,
+        text TEXT NOT NULL,
+        fields TEXT,
+        size_bytes INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """)
+    # Cached LLM responses (see services/llm_gateway.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+    # Background upload jobs (see services/job_queue.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        status TEXT NOT NULL,
+        options TEXT,
+        creds_json TEXT
+    )
+    """)
+    _add_missing_columns(cur, "jobs", JOB_COLUMNS_ADDED)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS job_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL REFERENCES jobs(id),
+        idx INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        spool_path TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        status TEXT NOT NULL,
+        stages TEXT,
+        result TEXT,
+        error TEXT,
+        updated_at TEXT NOT NULL
+    )
+    """)
+    _add_missing_columns(cur, "job_items", JOB_ITEM_COLUMNS_ADDED)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_job_items_job ON job_items(job_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status)")
+    # Vendors seen on confirmed uploads, keyed by text_utils.vendor_key (see services/vendor_index.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS vendors (
+        key TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_norm TEXT,
+        uses INTEGER NOT NULL,
+        last_seen TEXT NOT NULL
+    )
+    """)
+    if "vendor_confirmed" in added:
+        # learned before we knew which vendors were confirmed; relearn from the confirmed rows only
+        cur.execute("DELETE FROM vendors")
+    if not cur.execute("SELECT 1 FROM vendors LIMIT 1").fetchone():
+        _learn_vendors(conn, [dict(r) for r in cur.execute(
+            "SELECT vendor_raw, vendor_norm, status, vendor_confirmed, created_at FROM invoices "
+            "WHERE status = 'success' AND vendor_confirmed = 1 ORDER BY id"
+        )])
+    # Perceptual hashes of uploaded photos (see services/duplicates.py): the fine hash per
+    # invoice, and the coarse hash's 16-bit bands as (band number << 16 | bits) for lookups
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS image_hashes (
+        invoice_id INTEGER PRIMARY KEY,
+        dhash BLOB NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS image_hash_bands (
+        band INTEGER NOT NULL,
+        invoice_id INTEGER NOT NULL,
+        PRIMARY KEY (band, invoice_id)
+    ) WITHOUT ROWID
+    """)
+    # Web worker processes sharing this database: heartbeat and metrics snapshot (see services/web_workers.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS web_workers (
+        id TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at REAL NOT NULL,
+        heartbeat_at REAL,
+        metrics TEXT
+    )
+    """)
+    # LLM rate limiter buckets, shared by the web workers (see services/llm_scheduler.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_quota (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        state TEXT NOT NULL
+    )
+    """)
+    # Full-text index over the extracted text, rowid = invoices.id (see search_invoices)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS invoices_fts USING fts5(
+        vendor, filename, body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """)
+    # Default ranking: a hit in the vendor outweighs one in the filename or body
+    cur.execute(f"INSERT INTO invoices_fts (invoices_fts, rank) VALUES ('rank', '{FTS_RANK}')")
     conn.commit()
     conn.close()
 
-def insert_invoice(data: Dict[str, Any]) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    INSERT INTO invoices (
-        created_at, original_filename, stored_path, drive_link,
-        vendor_raw, vendor_norm, date_raw, date_norm, amount_raw, amount_norm,
-        status, error
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+INSERT_INVOICE_SQL = """
+INSERT INTO invoices (
+    created_at, original_filename, stored_path, drive_link,
+    vendor_raw, vendor_norm, date_raw, date_norm, amount_raw, amount_norm,
+    status, error, content_hash, timings, total_ms, amount_value, owner, vendor_confirmed
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _invoice_params(data: Dict[str, Any]) -> tuple:
+    timings = data.get("timings")
+    return (
         data.get("created_at") or datetime.utcnow().isoformat(),
         data.get("original_filename"),
         data.get("stored_path"),
@@ -64,16 +330,268 @@ def insert_invoice(data: Dict[str, Any]) -> int:
         data.get("amount_norm"),
         data.get("status", "success"),
         data.get("error"),
-    ))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
-    return new_id
+        data.get("content_hash"),
+        json.dumps(timings) if timings else None,
+        data.get("total_ms"),
+        parse_amount(data.get("amount_raw")),
+        data.get("owner"),
+        int(bool(data.get("vendor_confirmed"))),
+    )
+
+UPSERT_VENDOR_SQL = """
+INSERT INTO vendors (key, name, name_norm, uses, last_seen) VALUES (?, ?, ?, 1, ?)
+ON CONFLICT(key) DO UPDATE SET
+    name = excluded.name, name_norm = excluded.name_norm,
+    uses = vendors.uses + 1, last_seen = excluded.last_seen
+"""
+
+def _learn_vendors(conn, rows):
+    """
+    Count the vendor of every successful upload whose vendor the user supplied
+    or confirmed (not unreviewed batch or job guesses); the latest spelling
+    becomes the display name.
+    """
+    params = []
+    for r in rows:
+        name = r.get("vendor_raw")
+        key = vendor_key(name) if name and name != "UNKNOWN" else ""
+        if key and r.get("status", "success") == "success" and r.get("vendor_confirmed"):
+            params.append((key, name, r.get("vendor_norm"), r.get("created_at") or datetime.utcnow().isoformat()))
+    if params:
+        conn.executemany(UPSERT_VENDOR_SQL, params)
+
+def _index_text(conn, invoice_id: int, data: Dict[str, Any]):
+    if data.get("text"):
+        conn.execute(
+            "INSERT INTO invoices_fts (rowid, vendor, filename, body) VALUES (?, ?, ?, ?)",
+            (invoice_id, data.get("vendor_raw"), data.get("original_filename"), data["text"]),
+        )
+
+def _index_image_hash(conn, invoice_id: int, data: Dict[str, Any]):
+    image_hash = data.get("image_hash")
+    if image_hash:
+        conn.execute("INSERT INTO image_hashes (invoice_id, dhash) VALUES (?, ?)", (invoice_id, image_hash["dhash"]))
+        conn.executemany("INSERT INTO image_hash_bands (band, invoice_id) VALUES (?, ?)",
+                         [(band, invoice_id) for band in image_hash["bands"]])
+
+def insert_invoice(data: Dict[str, Any]) -> int:
+    """
+    data["text"], if given, goes into the search index and data["image_hash"]
+    into the photo hash index, in the same transaction.
+    """
+    with connection() as conn:
+        cur = conn.execute(INSERT_INVOICE_SQL, _invoice_params(data))
+        _index_text(conn, cur.lastrowid, data)
+        _index_image_hash(conn, cur.lastrowid, data)
+        _learn_vendors(conn, [data])
+        conn.commit()
+        return cur.lastrowid
+
+def insert_invoices(rows: List[Dict[str, Any]]):
+    """Bulk insert in a single transaction."""
+    if not rows:
+        return
+    with connection() as conn:
+        if not any(r.get("text") or r.get("image_hash") for r in rows):
+            conn.executemany(INSERT_INVOICE_SQL, [_invoice_params(r) for r in rows])
+        else:
+            # need each row's id for its index entries
+            for r in rows:
+                cur = conn.execute(INSERT_INVOICE_SQL, _invoice_params(r))
+                _index_text(conn, cur.lastrowid, r)
+                _index_image_hash(conn, cur.lastrowid, r)
+        _learn_vendors(conn, rows)
+        conn.commit()
+
+def index_invoice_texts(entries: List[Dict[str, Any]]):
+    """(Re)index existing invoices: [{"id", "vendor_raw", "original_filename", "text"}]."""
+    if not entries:
+        return
+    with connection() as conn:
+        for e in entries:
+            conn.execute("DELETE FROM invoices_fts WHERE rowid = ?", (e["id"],))
+            _index_text(conn, e["id"], e)
+        conn.commit()
+
+# What a duplicate check returns about the earlier upload
+DUPLICATE_FIELDS = "id, created_at, original_filename, stored_path, drive_link, vendor_raw, date_raw, amount_raw"
+
+def find_invoice_by_hash(content_hash: str, owner: str) -> Optional[Dict[str, Any]]:
+    """The owner's newest successful upload of exactly these bytes."""
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {DUPLICATE_FIELDS} FROM invoices WHERE owner = ? AND content_hash = ? AND status = 'success' "
+            "ORDER BY id DESC LIMIT 1", (owner, content_hash)
+        ).fetchone()
+    return dict(row) if row else None
+
+def find_invoice_by_fields(vendor_norm: str, date_norm: str, amount_value: float,
+                           owner: str) -> Optional[Dict[str, Any]]:
+    """The owner's newest successful upload with this vendor, date and amount."""
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {DUPLICATE_FIELDS} FROM invoices "
+            "WHERE owner = ? AND vendor_norm = ? COLLATE NOCASE AND date_norm = ? AND amount_value = ? "
+            "AND status = 'success' ORDER BY id DESC LIMIT 1", (owner, vendor_norm, date_norm, amount_value)
+        ).fetchone()
+    return dict(row) if row else None
+
+def find_image_hash_candidates(bands: List[int], owner: str, limit: int) -> List[Dict[str, Any]]:
+    """The owner's successful uploads sharing a hash band with the photo (newest first), with their fine hash."""
+    marks = ",".join("?" * len(bands))
+    with connection() as conn:
+        rows = conn.execute(f"""
+        SELECT {", ".join("i." + c.strip() for c in DUPLICATE_FIELDS.split(","))}, h.dhash
+        FROM (SELECT DISTINCT invoice_id FROM image_hash_bands WHERE band IN ({marks})) b
+        JOIN image_hashes h ON h.invoice_id = b.invoice_id
+        JOIN invoices i ON i.id = b.invoice_id
+        WHERE i.owner = ? AND i.status = 'success'
+        ORDER BY i.id DESC LIMIT ?
+        """, (*bands, owner, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+# Columns callers may project in query_invoices
+INVOICE_FIELDS = [
+    "id", "created_at", "original_filename", "stored_path", "drive_link",
+    "vendor_raw", "vendor_norm", "date_raw", "date_norm", "amount_raw", "amount_norm", "amount_value",
+    "status", "error", "content_hash", "timings", "total_ms",
+]
+
+def query_invoices(
+    owner: str,
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    fields: Optional[List[str]] = None,
+    vendor: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    status: Optional[str] = None,
+):
+    """
+    Newest-first invoice history of one owner, with keyset pagination.
+      owner:      drive_service.account_key of the uploader
+      cursor:     id of the last row of the previous page
+      vendor:     case-insensitive prefix of vendor_norm
+      date_*:     inclusive, YYYY_MM_DD (same format as date_norm)
+      fields:     columns to return (id is always included)
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    cols = ["id"] + [f for f in (fields or INVOICE_FIELDS) if f in INVOICE_FIELDS and f != "id"]
+
+    # (index that serves the filter, SQL, params)
+    filters = []
+    if vendor:
+        # Prefix match as an index range. Vendor names are ASCII (safe_filename), so \x7f sorts last.
+        filters.append(("idx_invoices_owner_vendor",
+                        "vendor_norm >= ? COLLATE NOCASE AND vendor_norm < ? COLLATE NOCASE",
+                        [vendor, vendor + "\x7f"]))
+    if date_from or date_to:
+        filters.append(("idx_invoices_owner_date", "date_norm BETWEEN ? AND ?",
+                        [date_from or "0000_00_00", date_to or "9999_99_99"]))
+    if amount_min is not None or amount_max is not None:
+        filters.append(("idx_invoices_owner_amount", "amount_value BETWEEN ? AND ?",
+                        [amount_min if amount_min is not None else float("-inf"),
+                         amount_max if amount_max is not None else float("inf")]))
+    if status:
+        filters.append(("idx_invoices_owner_status", "status = ?", [status]))
+
+    where, params = ["owner = ?"], [owner]
+    if cursor is not None:
+        where.append("id < ?")
+        params.append(cursor)
+    for _, clause, p in filters:
+        where.append(clause)
+        params += p
+
+    with connection() as conn:
+        source = _pick_access_path(conn, owner, filters, cursor)
+        sql = f"SELECT {', '.join(cols)} FROM invoices {source} WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)  # one extra row tells us whether there's a next page
+        rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"]
+    return rows, next_cursor
+
+# A filter matching fewer rows than this is read through its index and sorted;
+# if every filter is broader, walking the owner's rows newest-first hits `limit` sooner.
+HISTORY_PROBE_ROWS = 2000
+
+def _pick_access_path(conn, owner, filters, cursor) -> str:
+    """
+    SQLite's planner ignores LIMIT, so it happily range-scans a broad index
+    and sorts it, or walks the whole table for a rare vendor. Count (up to
+    HISTORY_PROBE_ROWS) what each filter's index would visit and pick.
+    """
+    if not filters:
+        return ""
+    best, best_count = None, HISTORY_PROBE_ROWS
+    for index, clause, params in filters:
+        sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM invoices INDEXED BY {index} WHERE owner = ? AND {clause}"
+        probe_params = [owner, *params]
+        if cursor is not None:
+            sql += " AND id < ?"
+            probe_params.append(cursor)
+        sql += f" LIMIT {HISTORY_PROBE_ROWS})"
+        n = conn.execute(sql, probe_params).fetchone()[0]
+        if n < best_count:
+            best, best_count = index, n
+    return f"INDEXED BY {best or 'idx_invoices_owner'}"
+
+# snippet() marks hits with control characters, swapped for <mark> after HTML-escaping the text
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+def fts_query(q: str) -> str:
+    """
+    Free text -> FTS5 query. Every term is quoted so punctuation in e.g. a GST
+    number can't be a syntax error; a trailing * keeps prefix search. Terms are ANDed.
+    """
+    terms = []
+    for term in q.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search_invoices(q: str, owner: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """Best matches among the owner's invoices first, each with a score (higher is better) and an HTML snippet."""
+    match = fts_query(q)
+    if not match:
+        return []
+    with connection() as conn:
+        rows = conn.execute(f"""
+        SELECT i.id, i.created_at, i.original_filename, i.stored_path, i.drive_link,
+               i.vendor_raw, i.date_norm, i.amount_raw, i.status,
+               -invoices_fts.rank AS score,
+               snippet(invoices_fts, -1, '{_HIT_START}', '{_HIT_END}', '…', 16) AS snippet
+        FROM invoices_fts JOIN invoices i ON i.id = invoices_fts.rowid
+        WHERE invoices_fts MATCH ? AND i.owner = ?
+        ORDER BY invoices_fts.rank
+        LIMIT ? OFFSET ?
+        """, (match, owner, limit, offset)).fetchall()
+
+    results = []
+    for r in rows:
+        item = dict(r)
+        item["snippet"] = (html.escape(item["snippet"] or "")
+                           .replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+        results.append(item)
+    return results
+
+def load_vendors(min_uses: int = 1) -> List[Dict[str, Any]]:
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT key, name, name_norm, uses FROM vendors WHERE uses >= ? ORDER BY uses DESC", (min_uses,)
+        ).fetchall()
+    return [dict(r) for r in rows]
 
 def list_invoices(limit: int = 50) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM invoices ORDER BY id DESC LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    conn.close()
+    with connection() as conn:
+        rows = conn.execute("SELECT * FROM invoices ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
     return [dict(r) for r in rows]
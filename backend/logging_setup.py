@@ -1,7 +1,24 @@
 import logging
 
+from backend.utils.logging_utils import request_id_var
+
+_configured = False
+
 def setup_logging():
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    factory = logging.getLogRecordFactory()
+
+    def record_with_request_id(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.request_id = request_id_var.get()
+        return record
+
+    logging.setLogRecordFactory(record_with_request_id)
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s | %(levelname)s | %(message)s"
+        format="%(asctime)s | %(levelname)s | %(request_id)s | %(message)s"
     )
@@ -11,11 +11,22 @@ from fastapi.staticfiles import StaticFiles
 # Routers
 from backend.routers.upload import router as upload_router
 from backend.routers.drive_auth import router as drive_router
+from backend.routers.jobs import router as jobs_router
+from backend.routers.history import router as history_router
+from backend.routers.search import router as search_router
+from backend.routers.llm import router as llm_router
+from backend.routers.pipeline import router as pipeline_router
+from backend.routers.metrics import router as metrics_router
+from backend.core.middleware import RequestContextMiddleware
 from backend.logging_setup import setup_logging
+from backend.db import init_db
+from backend.services.job_queue import resume_jobs
+from backend.services import web_workers
 
 from starlette.middleware.sessions import SessionMiddleware
 
 setup_logging()
+init_db()
 app = FastAPI(title="Invoice Processing API", version="1.0.0")
 
 # Add Session Middleware (Keys should be in .env for production)
@@ -34,10 +45,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Outermost: request id + request metrics cover everything below
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(drive_router)
 app.include_router(upload_router)
+app.include_router(jobs_router)
+app.include_router(history_router)
+app.include_router(search_router)
+app.include_router(llm_router)
+app.include_router(pipeline_router)
+app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+def _start_worker():
+    # Heartbeat (liveness for job claims, metrics for the merged /metrics), then pick
+    # up uploads that were queued/running when we last stopped; after every heartbeat,
+    # also those of workers that have died since
+    web_workers.start(on_beat=[resume_jobs])
+    resume_jobs()
 
 # Serve frontend at root (must be last)
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, JSONResponse
-from backend.services.drive_service import get_auth_url, get_credentials, is_drive_connected
+from backend.services.drive_service import get_auth_url, get_credentials, is_drive_connected, session_owner
 
 router = APIRouter()
 
@@ -21,6 +21,8 @@ def oauth_callback(request: Request, code: str):
     # Exchange code for credentials and save to SESSION
     creds_json = get_credentials(code)
     request.session["user_creds"] = creds_json
+    request.session.pop("owner", None)
+    session_owner(request.session)
     
     # send user back to your UI
     import os
@@ -1,9 +1,55 @@
 # backend/routers/history.py
-from fastapi import APIRouter
-from backend.db import list_invoices
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from backend.db import query_invoices, INVOICE_FIELDS
+from backend.services.drive_service import session_owner
+from backend.utils.text_utils import normalize_date, safe_filename
 
 router = APIRouter(tags=["history"])
 
+def _date_param(raw: Optional[str], name: str) -> Optional[str]:
+    if not raw:
+        return None
+    d = normalize_date(raw)
+    if d == "UNKNOWN":
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, use YYYY-MM-DD")
+    return d
+
 @router.get("/history")
-def history(limit: int = 50):
-    return {"items": list_invoices(limit=limit)}
+def history(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    vendor: Optional[str] = Query(None, description="Vendor name prefix (case-insensitive)"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    status: Optional[str] = None,
+):
+    owner = session_owner(request.session)
+    if not owner:
+        raise HTTPException(status_code=401, detail="Authentication required. Please connect Google Drive.")
+
+    field_list = None
+    if fields:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in field_list if f not in INVOICE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    items, next_cursor = query_invoices(
+        owner,
+        cursor=cursor,
+        limit=limit,
+        fields=field_list,
+        # stored vendor_norm is safe_filename(vendor), so normalize the filter the same way
+        vendor=safe_filename(vendor) if vendor else None,
+        date_from=_date_param(date_from, "date_from"),
+        date_to=_date_param(date_to, "date_to"),
+        amount_min=amount_min,
+        amount_max=amount_max,
+        status=status,
+    )
+    return {"items": items, "next_cursor": next_cursor}
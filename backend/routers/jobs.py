@@ -0,0 +1,60 @@
+# backend/routers/jobs.py
+import os
+import uuid
+import shutil
+from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from backend.services.pipeline import ALLOWED_EXTENSIONS
+from backend.core.storage import write_stream, UploadTooLarge
+from backend.services.job_queue import create_job, get_job, count_pending
+from backend.services.drive_service import session_owner
+from backend.core.config import JOB_SPOOL_DIR, JOB_MAX_PENDING
+
+router = APIRouter(tags=["jobs"])
+
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    dry_run: bool = False,
+    use_custom_name: bool = False,
+    allow_duplicate: bool = False,
+):
+    creds_json = request.session.get("user_creds")
+    if not dry_run and not creds_json:
+        raise HTTPException(status_code=401, detail="Authentication required. Please connect Google Drive.")
+    owner = await run_in_threadpool(session_owner, request.session)
+
+    for f in files:
+        if os.path.splitext(f.filename)[1].lower() not in ALLOWED_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Only PDF, PNG, JPG supported ({f.filename})")
+
+    if await run_in_threadpool(count_pending) + len(files) > JOB_MAX_PENDING:
+        raise HTTPException(status_code=503, detail="Too many queued uploads, please retry shortly.")
+
+    # Spool to disk so the job survives the request (and a restart)
+    spool_dir = os.path.join(JOB_SPOOL_DIR, uuid.uuid4().hex)
+    os.makedirs(spool_dir, exist_ok=True)
+    spooled = []
+    for i, f in enumerate(files):
+        path = os.path.join(spool_dir, f"{i}_{os.path.basename(f.filename)}")
+        try:
+            content_hash = await run_in_threadpool(write_stream, f.file, path)
+        except UploadTooLarge as e:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            raise HTTPException(status_code=413, detail=f"{f.filename}: {e}")
+        spooled.append({"filename": f.filename, "spool_path": path, "content_hash": content_hash})
+
+    options = {"dry_run": dry_run, "use_custom_name": use_custom_name, "allow_duplicate": allow_duplicate}
+    job_id = await run_in_threadpool(create_job, spooled, options, creds_json, owner)
+    return {"job_id": job_id, "status": "queued", "items": len(spooled)}
+
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,11 @@
+# backend/routers/llm.py
+from fastapi import APIRouter
+from backend.services import llm_gateway, llm_scheduler
+
+router = APIRouter(tags=["llm"])
+
+@router.get("/llm/stats")
+def llm_stats():
+    # Counters since this process started: cache hits, coalesced waits, API calls,
+    # and the rate limiter's queue, learned limits and retries
+    return {**llm_gateway.stats(), "scheduler": llm_scheduler.stats()}
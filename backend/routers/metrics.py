@@ -0,0 +1,13 @@
+# backend/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.services.web_workers import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Prometheus text exposition format: request/stage/extraction/LLM histograms,
+    # cache and fallback counters, stage queue and rate limiter gauges; summed over
+    # the web workers when there are several
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
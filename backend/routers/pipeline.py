@@ -0,0 +1,10 @@
+# backend/routers/pipeline.py
+from fastapi import APIRouter
+from backend.services import stages
+
+router = APIRouter(tags=["pipeline"])
+
+@router.get("/pipeline/stats")
+def pipeline_stats():
+    # Per stage: concurrency limit, queued/active now, totals, recent queue-wait and run-time percentiles
+    return stages.stats()
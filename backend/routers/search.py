@@ -0,0 +1,19 @@
+# backend/routers/search.py
+from fastapi import APIRouter, HTTPException, Query, Request
+from backend.db import search_invoices
+from backend.services.drive_service import session_owner
+
+router = APIRouter(tags=["search"])
+
+@router.get("/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Words to find in the invoice text, vendor or filename; end a word with * for a prefix match"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    owner = session_owner(request.session)
+    if not owner:
+        raise HTTPException(status_code=401, detail="Authentication required. Please connect Google Drive.")
+    # snippet is HTML: the document text escaped, with hits wrapped in <mark>
+    return {"query": q, "items": search_invoices(q, owner, limit=limit, offset=offset)}
@@ -1,16 +1,28 @@
 import os
+import json
 import shutil
-from datetime import datetime
+import asyncio
+import zipfile
+from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import StreamingResponse
 from starlette.concurrency import run_in_threadpool
 
-from backend.services.pdf_service import extract_text_from_pdf
-from backend.services.ocr_service import ocr_image
-from backend.services.llm_service import extract_invoice_data_with_llm
-from backend.services.field_extractor import extract_fields
-from backend.services.drive_service import upload_to_drive
-from backend.utils.text_utils import normalize_text, normalize_date, safe_filename
-from backend.core.config import STORAGE_ROOT
+from backend.services.pipeline import (
+    ALLOWED_EXTENSIONS, InvalidDocument, RateLimited, StageTimer, invoice_record,
+    extract_text, extract_fields_async, build_naming, store_file, upload_file_to_drive, upload_files_to_drive,
+    dry_run_response, success_response, rate_limit_response, duplicate_response, insert_records,
+)
+from backend.services.duplicates import IMAGE_EXTENSIONS, check_file, check_fields, field_key, image_fingerprint
+from backend.services.llm_scheduler import PRIORITY_INTERACTIVE, PRIORITY_UPLOAD
+from backend.services.stages import stage
+from backend.services.drive_service import session_owner
+from backend.core.storage import ingest, write_stream, new_temp_dir, discard, UploadTooLarge
+from backend.core.config import BATCH_MAX_FILES
+from backend.db import insert_invoice
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
 
 router = APIRouter()
 
@@ -20,6 +32,7 @@ async def upload_file(
     file: UploadFile = File(...),
     dry_run: bool = False,
     use_custom_name: bool = False,
+    allow_duplicate: bool = False,
     provided_vendor: str = Form(None),
     provided_date: str = Form(None),
     provided_amount: str = Form(None)
@@ -28,185 +41,330 @@ async def upload_file(
     creds_json = request.session.get("user_creds")
     if not dry_run and not creds_json:
         raise HTTPException(status_code=401, detail="Authentication required. Please connect Google Drive.")
+    owner = await run_in_threadpool(session_owner, request.session)
     # 0) Validate
     ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in [".pdf", ".png", ".jpg", ".jpeg"]:
+    if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Only PDF, PNG, JPG supported")
 
-    # 1) Save temp
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    timer = StageTimer()
 
+    # 1) Stream to a unique temp file next to STORAGE_ROOT, hashing as we go
+    # (the digest keys the extraction cache)
     try:
-        # 2) Extract text (Still need this for validation or fallback, but could potentially skip if we trust input)
-        # However, we'll keep it for now to ensure invalid files aren't processed, 
-        # but the main bottleneck is the LLM call below.
-        if ext == ".pdf":
-            text = await run_in_threadpool(extract_text_from_pdf, temp_path)
-        else:
-            text = await run_in_threadpool(ocr_image, temp_path)
+        with timer.stage("save"):
+            temp_path, content_hash = await stage("save").run(ingest, file.file, ext)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        text = normalize_text(text)
+    naming = text = None
+    try:
+        # 1b) Stop here if these bytes (or this photo) were uploaded before
+        with timer.stage("dedupe"):
+            image_hash = await _fingerprint(temp_path, ext)
+            duplicate = None if allow_duplicate else await stage("record").run(
+                check_file, content_hash, owner, image_hash
+            )
+        if duplicate:
+            return duplicate_response(duplicate)
 
-        if not text or len(text.strip()) < 10:
-             # loose check for images which might have less text
-             raise HTTPException(status_code=400, detail="Invalid Image/PDF File")
+        # 2) Extract text, unless we already did it for these exact bytes
+        # (the frontend always sends a dry run first, then the confirm upload).
+        try:
+            with timer.stage("extract_text"):
+                text, cached = await stage("extract_text").run(extract_text, temp_path, ext, content_hash)
+        except InvalidDocument as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # 3) Extract fields (Skip LLM if provided)
-        rate_limited = False
-        if provided_vendor and provided_date and provided_amount:
-            print("Using provided fields from frontend, skipping LLM.")
-            fields = {
-                "vendor": provided_vendor,
-                "date": provided_date,
-                "amount": provided_amount
-            }
-        else:
-            # LLM First, Regex Fallback
-            try:
-                fields = await run_in_threadpool(extract_invoice_data_with_llm, text)
-            except Exception as e:
-                if "429" in str(e):
-                    rate_limited = True
-                    fields = None
-                    print("Rate limit hit, returning specific status.")
-                else:
-                    fields = None
-            
-            if not fields:
-                if rate_limited and dry_run:
-                     # If Dry Run and Rate Limited, abort and tell user to wait
-                     # We can't fallback because fallback sucks and confuses user
-                     return {
-                         "status": "rate_limit",
-                         "detail": "AI Service Quota Exceeded. Please wait a moment.",
-                         "predicted_filename": f"WAIT_RETRY_{file.filename}"
-                     }
-
-                print("LLM failed or unconfigured, using Regex fallback")
-                fields = await run_in_threadpool(extract_fields, text)
-            else:
-                print("LLM Extraction Success!", fields)
-
-        vendor_raw = str(fields.get("vendor", "UNKNOWN"))
-        date_raw = str(fields.get("date", "UNKNOWN"))
-        amount_raw = str(fields.get("amount", "UNKNOWN"))
-
-        # 4) Normalize date (ALWAYS safe)
-        date_norm = date_raw
-        if date_norm != "UNKNOWN":
-            if not (len(date_norm) == 10 and date_norm[4] == "_" and date_norm[7] == "_"):
-                date_norm = normalize_date(date_raw)
-        else:
-            date_norm = "UNKNOWN"
+        provided = {"vendor": provided_vendor, "date": provided_date, "amount": provided_amount}
+        try:
+            with timer.stage("extract_fields"):
+                priority = PRIORITY_INTERACTIVE if dry_run else PRIORITY_UPLOAD
+                fields = await stage("extract_fields").run(
+                    extract_fields_async, text, content_hash, cached, provided, dry_run, priority=priority
+                )
+        except RateLimited:
+            # If Dry Run and Rate Limited, abort and tell user to wait
+            return rate_limit_response(file.filename)
+
+        # 4-6) Normalize date, folder parts, filename
+        naming = build_naming(fields, ext, file.filename, use_custom_name)
+        if not allow_duplicate:
+            duplicate = await stage("record").run(check_fields, naming, owner)
+            if duplicate:
+                return duplicate_response(duplicate)
 
-        # 5) Folder parts from date_norm
-        date_pretty = date_raw
-        if date_norm != "UNKNOWN":
-            try:
-                parsed = datetime.strptime(date_norm, "%Y_%m_%d")
-                year = parsed.strftime("%Y")
-                month = parsed.strftime("%B")  # Use full month name (e.g., "January")
-                day = parsed.strftime("%d")
-                date_pretty = parsed.strftime("%d %B %Y")
-            except Exception:
-                year = month = "unknown"
-                day = "unknown"
-                date_norm = "UNKNOWN"
-        else:
-            year = month = day = "unknown"
-
-        # 6) Filename Construction
-        if use_custom_name:
-            # Respect user's custom name (from file.filename)
-            # Ensure safe filename just in case but keep user's structure
-            # Remove path components to be safe
-            final_filename = os.path.basename(file.filename)
-            # Optionally sanitize weird chars but keep intention
-        else:
-            # Auto-generate name: dd Month YYYY_Vendor_Amount.pdf
-            safe_vendor = safe_filename(vendor_raw)
-            safe_amount = safe_filename(amount_raw)
-            if date_norm != "UNKNOWN":
-                date_pretty = parsed.strftime("%d %B %Y")
-                final_filename = f"{date_pretty}_{safe_vendor}_{safe_amount}{ext}"
-            else:
-                final_filename = f"UNKNOWN_{safe_vendor}_{safe_amount}{ext}"
-
-        # Safe vendor/amount vars for response (might be undefined if use_custom_name is True)
-        # So re-define them for the response object
-        safe_vendor = safe_filename(vendor_raw)
-        safe_amount = safe_filename(amount_raw)
-        
         # --- DRY RUN CHECK ---
         if dry_run:
             # Return analysis only, do not move file or upload to drive
-            return {
-                "status": "dry_run",
-                "fields": {
-                    "vendor": vendor_raw,
-                    "date": date_pretty,
-                    "amount": amount_raw
-                },
-                "predicted_filename": f"{parsed.strftime('%d %B %Y') if date_norm != 'UNKNOWN' else 'UNKNOWN'}_{safe_vendor}_{safe_amount}{ext}", # Always suggest the auto-name in dry run
-                "detail": "Analysis complete. File not saved."
-            }
+            return dry_run_response(naming)
 
         # 7) Local foldering
-        final_dir = os.path.join(STORAGE_ROOT, year, month)
-        os.makedirs(final_dir, exist_ok=True)
-
-        final_pdf_path = os.path.join(final_dir, final_filename)
-        shutil.move(temp_path, final_pdf_path)
+        with timer.stage("store"):
+            final_pdf_path = await stage("store").run(store_file, temp_path, naming)
 
         # 8) Upload to Drive
-        drive_links = None
-        try:
-            drive_links = await run_in_threadpool(
-                upload_to_drive,
-                local_path=final_pdf_path,
-                year=year,
-                month=month,
-                day=day,
-                creds_json=creds_json
-            )
-        except Exception as e:
-            print(f"Drive upload failed: {e}")
-            drive_links = None
-
-        # 9) Response
-        
-        return {
-            "status": "success",
-            "fields": {
-                "vendor": vendor_raw,
-                "date": date_pretty,
-                "amount": amount_raw
-            },
-            "normalized": {
-                "vendor": safe_vendor,
-                "date": date_norm,
-                "amount": safe_amount
-            },
-            "stored_at": final_pdf_path,
-            "drive_link": drive_links.get("folder_link") if drive_links else None,
-            "file_link": drive_links.get("file_link") if drive_links else None,
-            "drive_link_clickable": drive_links.get("folder_link") if drive_links else None
-        }
+        with timer.stage("drive"):
+            drive_links = await stage("drive").run(upload_file_to_drive, final_pdf_path, naming, creds_json)
+
+        # 9) Record & respond
+        await stage("record").run(
+            insert_records, [invoice_record(file.filename, content_hash, timer, naming, final_pdf_path, drive_links,
+                                            text=text, image_hash=image_hash, owner=owner,
+                                            # the frontend sends back the vendor the user saw (and maybe edited)
+                                            vendor_confirmed=bool(provided_vendor))]
+        )
+        return success_response(naming, final_pdf_path, drive_links)
 
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Upload failed: {e}")
+        if not dry_run:
+            try:
+                await stage("record").run(
+                    insert_invoice, invoice_record(file.filename, content_hash, timer, naming, error=str(e), text=text,
+                                                   owner=owner)
+                )
+            except Exception:
+                pass
         raise HTTPException(status_code=500, detail=str(e))
 
 
     finally:
         # Cleanup temp file if it still exists
-        if os.path.exists(temp_path):
+        discard(temp_path)
+
+
+async def _fingerprint(path: str, ext: str):
+    """The photo's duplicate fingerprint, hashed on the OCR processes; None for PDFs."""
+    return await stage("fingerprint").run(image_fingerprint, path) if ext in IMAGE_EXTENSIONS else None
+
+
+def _spool_batch(files: List[UploadFile], spool_dir: str):
+    """
+    Spool every uploaded file (expanding .zip archives) into spool_dir.
+    Returns [{"filename", "path", "content_hash", "same_as"}] and a list of (name, reason)
+    rejections; same_as is {"index", "filename"} of an earlier file with the same bytes.
+    """
+    spooled, rejected = [], []
+    seen = {}  # content hash -> first file with it
+
+    def add(name, fileobj):
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            rejected.append((name, "Only PDF, PNG, JPG supported"))
+            return
+        # checked per file, so a huge archive stops here instead of being expanded onto disk first
+        if len(spooled) >= BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} files per batch")
+        # index prefix keeps same-named files apart; basename() keeps zip entries inside spool_dir
+        path = os.path.join(spool_dir, f"{len(spooled)}_{os.path.basename(name)}")
+        try:
+            content_hash = write_stream(fileobj, path)
+        except UploadTooLarge as e:
+            rejected.append((name, str(e)))
+            return
+        first = seen.setdefault(content_hash, {"index": len(spooled), "filename": os.path.basename(name)})
+        spooled.append({"filename": os.path.basename(name), "path": path, "content_hash": content_hash,
+                        "same_as": first if first["index"] != len(spooled) else None})
+
+    for f in files:
+        if f.filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(f.file) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        with zf.open(info) as member:
+                            add(info.filename, member)
+        else:
+            add(f.filename, f.file)
+
+    return spooled, rejected
+
+
+class _DriveBatcher:
+    """
+    Drive stage of a batch. Files are queued as they get stored; whenever
+    the uploader is free it takes everything queued so far and sends it
+    through the bulk uploader (or the single-file path if only one is waiting).
+    """
+
+    def __init__(self, creds_json):
+        self.creds_json = creds_json
+        self.queue = asyncio.Queue()
+        self.worker = None
+
+    async def upload(self, final_path: str, naming: dict):
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((final_path, naming, fut))
+        return await fut
+
+    async def _run(self):
+        while True:
+            pending = [await self.queue.get()]
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+
+            entries = [(path, naming) for path, naming, _ in pending]
             try:
-                os.remove(temp_path)
-            except Exception:
-                pass
+                if len(entries) == 1:
+                    links = [await stage("drive").run(upload_file_to_drive, *entries[0], self.creds_json)]
+                else:
+                    links = await stage("drive").run(upload_files_to_drive, entries, self.creds_json)
+                for (_, _, fut), link in zip(pending, links):
+                    fut.set_result(link)
+            except Exception as e:
+                for _, _, fut in pending:
+                    fut.set_exception(e)
+
+    def close(self):
+        if self.worker:
+            self.worker.cancel()
+
+
+async def _process_one(index: int, item: dict, dry_run: bool, allow_duplicate: bool, owner: str,
+                       drive: _DriveBatcher, records: list, seen_fields: dict) -> dict:
+    """
+    The /upload stages for one file (services/stages.py). Appends the invoice
+    row to `records` (real uploads only), also when cancelled after the file
+    was moved into storage. seen_fields maps the batch's (vendor, date,
+    amount) keys to the first file that had them, like same_as for bytes.
+    """
+    ext = os.path.splitext(item["filename"])[1].lower()
+    out = {"index": index, "filename": item["filename"]}
+    timer = StageTimer()
+    naming = text = image_hash = final_path = drive_links = None
+    try:
+        if item.get("same_as") is not None and not allow_duplicate:
+            first = item["same_as"]
+            return {**out, "status": "duplicate", "match": "exact", "duplicate_of": first,
+                    "detail": f"Same file as {first['filename']} in this batch"}
+        with timer.stage("dedupe"):
+            image_hash = await _fingerprint(item["path"], ext)
+            duplicate = None if allow_duplicate else await stage("record").run(
+                check_file, item["content_hash"], owner, image_hash
+            )
+        if duplicate:
+            return {**out, **duplicate_response(duplicate)}
+
+        with timer.stage("extract_text"):
+            text, cached = await stage("extract_text").run(extract_text, item["path"], ext, item["content_hash"])
+        with timer.stage("extract_fields"):
+            fields = await stage("extract_fields").run(
+                extract_fields_async, text, item["content_hash"], cached, None, dry_run
+            )
+        naming = build_naming(fields, ext, item["filename"])
+        if not allow_duplicate:
+            key = field_key(naming)
+            first = seen_fields.setdefault(key, {"index": index, "filename": item["filename"]}) if key else None
+            if first and first["index"] != index:
+                return {**out, "status": "duplicate", "match": "fields", "duplicate_of": first,
+                        "detail": f"Same vendor, date and amount as {first['filename']} in this batch"}
+            duplicate = await stage("record").run(check_fields, naming, owner)
+            if duplicate:
+                return {**out, **duplicate_response(duplicate)}
+        if dry_run:
+            return {**out, **dry_run_response(naming)}
+
+        with timer.stage("store"):
+            final_path = await stage("store").run(store_file, item["path"], naming)
+        with timer.stage("drive"):
+            drive_links = await drive.upload(final_path, naming)
+        records.append(invoice_record(item["filename"], item["content_hash"], timer, naming, final_path, drive_links,
+                                      text=text, image_hash=image_hash, owner=owner))
+        return {**out, **success_response(naming, final_path, drive_links)}
+
+    except asyncio.CancelledError:
+        if final_path:
+            records.append(invoice_record(item["filename"], item["content_hash"], timer, naming, final_path,
+                                          drive_links, text=text, image_hash=image_hash, owner=owner))
+        raise
+    except RateLimited:
+        return {**out, **rate_limit_response(item["filename"])}
+    except InvalidDocument as e:
+        return {**out, "status": "error", "detail": str(e)}
+    except Exception as e:
+        logger.exception(f"Upload failed: {e}")
+        if not dry_run:
+            records.append(invoice_record(item["filename"], item["content_hash"], timer, naming, error=str(e),
+                                          text=text, owner=owner))
+        return {**out, "status": "error", "detail": str(e)}
+
+
+async def _finish_batch(tasks: list, drive: _DriveBatcher, records: list, spool_dir: str):
+    """
+    End of a batch stream, finished or not (the client went away): cancel the
+    files still in progress, write the rows not yet written, clean up.
+    """
+    try:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        drive.close()
+        if records:
+            await stage("record").run(insert_records, records)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+@router.post("/upload/batch")
+async def upload_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    dry_run: bool = False,
+    allow_duplicate: bool = False,
+):
+    """
+    Many invoices in one request (a multipart list and/or .zip archives).
+    Streams one NDJSON line per file as soon as that file is done, then a
+    final {"status": "complete", ...} summary line.
+
+    Files already uploaded (services/duplicates.py), or repeated within the
+    batch (same bytes, or same vendor, date and amount), come back as
+    "duplicate" unless allow_duplicate is set.
+    """
+    creds_json = request.session.get("user_creds")
+    if not dry_run and not creds_json:
+        raise HTTPException(status_code=401, detail="Authentication required. Please connect Google Drive.")
+    owner = await run_in_threadpool(session_owner, request.session)
+
+    spool_dir = new_temp_dir(prefix="batch_")
+    try:
+        spooled, rejected = await stage("save").run(_spool_batch, files, spool_dir)
+    except zipfile.BadZipFile:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    except Exception:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise
+
+    async def stream():
+        drive = _DriveBatcher(creds_json)
+        records, tasks, seen_fields = [], [], {}
+        try:
+            for name, reason in rejected:
+                yield json.dumps({"filename": name, "status": "error", "detail": reason}) + "\n"
+
+            tasks = [
+                asyncio.create_task(_process_one(i, item, dry_run, allow_duplicate, owner, drive, records, seen_fields))
+                for i, item in enumerate(spooled)
+            ]
+            counts = {}
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+                yield json.dumps(result) + "\n"
+
+            # One transaction for the whole batch's history rows
+            rows, records[:] = records[:], []
+            await stage("record").run(insert_records, rows)
+
+            yield json.dumps({"status": "complete", "files": len(spooled), "rejected": len(rejected), "counts": counts}) + "\n"
+        finally:
+            # shielded: when the client disconnects, this still runs to the end
+            await asyncio.shield(_finish_batch(tasks, drive, records, spool_dir))
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
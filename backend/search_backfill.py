@@ -0,0 +1,155 @@
+# backend/search_backfill.py
+"""
+Index the files already in STORAGE_ROOT for GET /search.
+
+    python -m backend.search_backfill [--workers N] [--reindex] [--full-text]
+
+Text extraction runs on a process pool and goes through the extraction
+cache, so files uploaded since the cache existed are not OCRed again.
+A file whose invoices row is found (by stored_path) gets that row indexed;
+a file with no row (stored before history was recorded) gets a new row
+with status "imported", with vendor/date/amount taken from the standard
+"dd Month YYYY_Vendor_Amount.ext" filename when it matches.
+
+Long PDFs are read in full here, a few pages at a time: their uploads
+only read the pages needed for the fields (see pdf_service) and index the
+rest in the background (pipeline.insert_records), so a row whose indexing
+a restart cut short has no entry yet. --full-text re-reads every PDF that
+way, e.g. for rows indexed from partial text before that.
+"""
+import os
+import re
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Dict, Any
+
+from backend.db import init_db, connection, insert_invoices, index_invoice_texts
+from backend.core.config import STORAGE_ROOT, OCR_WORKERS
+from backend.core.storage import file_sha256
+from backend.services.pipeline import ALLOWED_EXTENSIONS, InvalidDocument, extract_text
+from backend.services.pdf_service import pdf_full_text, is_long_pdf
+from backend.services.ocr_service import run_inline
+
+# Rows are written in batches of this many files
+BATCH_SIZE = 100
+
+STORED_NAME_RE = re.compile(r"^(\d{2} [A-Za-z]+ \d{4})_(.+)_([^_]+)$")
+
+
+def _stored_files(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        # skip .incoming / .jobs spool dirs
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in ALLOWED_EXTENSIONS:
+                yield os.path.join(dirpath, name)
+
+
+def _existing_rows() -> Dict[str, Dict[str, Any]]:
+    """abspath(stored_path) -> newest invoices row for it, with an `indexed` flag."""
+    with connection() as conn:
+        rows = conn.execute("""
+        SELECT id, stored_path, vendor_raw, original_filename,
+               EXISTS (SELECT 1 FROM invoices_fts WHERE rowid = invoices.id) AS indexed
+        FROM invoices WHERE stored_path IS NOT NULL ORDER BY id
+        """).fetchall()
+    return {os.path.abspath(r["stored_path"]): dict(r) for r in rows}
+
+
+def _extract(path: str, full_text: bool = False) -> Dict[str, Any]:
+    """Runs in a pool worker."""
+    content_hash = file_sha256(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf" and (full_text or is_long_pdf(path)):
+        return {"path": path, "content_hash": content_hash, "text": pdf_full_text(path) or None}
+    try:
+        text, _ = extract_text(path, ext, content_hash)
+    except InvalidDocument:
+        text = None
+    return {"path": path, "content_hash": content_hash, "text": text}
+
+
+def _imported_record(path: str, content_hash: str, text: Optional[str]) -> Dict[str, Any]:
+    name = os.path.basename(path)
+    record = {
+        "original_filename": name,
+        "stored_path": path,
+        "status": "imported",
+        "content_hash": content_hash,
+        "text": text,
+    }
+    m = STORED_NAME_RE.match(os.path.splitext(name)[0])
+    if m:
+        date_pretty, vendor, amount = m.groups()
+        try:
+            record["date_norm"] = datetime.strptime(date_pretty, "%d %B %Y").strftime("%Y_%m_%d")
+            record["date_raw"] = date_pretty
+        except ValueError:
+            pass
+        record.update(vendor_raw=vendor.replace("_", " "), vendor_norm=vendor,
+                      amount_raw=amount, amount_norm=amount)
+    return record
+
+
+def backfill(root: str = STORAGE_ROOT, workers: int = OCR_WORKERS, reindex: bool = False,
+             full_text: bool = False):
+    init_db()
+    existing = _existing_rows()
+    todo = []
+    for path in _stored_files(root):
+        row = existing.get(os.path.abspath(path))
+        if reindex or full_text or not row or not row["indexed"]:
+            todo.append(path)
+    print(f"Indexing {len(todo)} file(s) under {root} with {workers} worker(s)")
+    if not todo:
+        return
+
+    new_rows, reindexed = [], []
+    done = failed = 0
+
+    def flush():
+        insert_invoices(new_rows)
+        index_invoice_texts(reindexed)
+        new_rows.clear()
+        reindexed.clear()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=run_inline,
+    ) as pool:
+        futures = {pool.submit(_extract, p, full_text): p for p in todo}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                out = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"Failed to extract {path}: {e}")
+                continue
+
+            row = existing.get(os.path.abspath(path))
+            if row:
+                if out["text"]:
+                    reindexed.append({**row, "text": out["text"]})
+            else:
+                new_rows.append(_imported_record(path, out["content_hash"], out["text"]))
+
+            done += 1
+            if len(new_rows) + len(reindexed) >= BATCH_SIZE:
+                flush()
+                print(f"  {done}/{len(todo)}")
+    flush()
+    print(f"Done: {done} indexed, {failed} failed")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--root", default=STORAGE_ROOT)
+    ap.add_argument("--workers", type=int, default=OCR_WORKERS)
+    ap.add_argument("--reindex", action="store_true", help="re-extract files that are already indexed")
+    ap.add_argument("--full-text", action="store_true", help="index every page of long PDFs (implies --reindex)")
+    args = ap.parse_args()
+    backfill(args.root, args.workers, args.reindex, args.full_text)
@@ -1,10 +1,24 @@
 # backend/services/drive_service.py
 import os
+import time
+import random
+import hashlib
+import threading
+from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
+from google.auth.exceptions import RefreshError
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 
+from backend.services import fake_drive
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
+
 # --- Config ---
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 
@@ -61,7 +75,7 @@ def get_flow(state=None):
                 state=state
             )
         except json.JSONDecodeError:
-            print("Error decoding GOOGLE_CREDENTIALS_JSON env var")
+            logger.error("Error decoding GOOGLE_CREDENTIALS_JSON env var")
     
     # 2. Fallback to File (Best for Local)
     _require_credentials_file()
@@ -85,26 +99,166 @@ def get_credentials(code: str):
     return creds.to_json()
 
 
+# --- Client & folder caches ---
+# "fake" swaps in the in-memory Drive from fake_drive.py (offline dev/testing)
+DRIVE_BACKEND = os.getenv("DRIVE_BACKEND", "google")
+DRIVE_CLIENT_CACHE_SIZE = int(os.getenv("DRIVE_CLIENT_CACHE_SIZE", "64"))
+
+# (user_key, thread id) -> (service, creds). Clients are per thread because
+# the httplib2 transport underneath them is not thread-safe.
+_clients = OrderedDict()
+# (user_key, ("Invoices", year, month)) -> folder id
+_folder_ids = {}
+_cache_lock = threading.Lock()
+
+
+def _parse_creds(creds_json) -> dict:
+    # Check if creds is a string (JSON) or dict
+    if isinstance(creds_json, str):
+        return json.loads(creds_json)
+    return creds_json
+
+
+def user_key(creds_json) -> str:
+    """Stable per-user cache key: the refresh token survives access-token refreshes."""
+    data = _parse_creds(creds_json)
+    ident = f"{data.get('client_id')}:{data.get('refresh_token') or data.get('token')}"
+    return hashlib.sha256(ident.encode()).hexdigest()[:16]
+
+
+def account_key(creds_json) -> str:
+    """
+    Owner key stored on the user's invoices. user_key changes every time the
+    user reconnects (each consent issues a new refresh token), so this hashes
+    the Drive account's permissionId instead.
+    """
+    if DRIVE_BACKEND == "fake":
+        return user_key(creds_json)
+    about = get_drive_service(creds_json).about().get(fields="user(permissionId)").execute()
+    return hashlib.sha256(f"account:{about['user']['permissionId']}".encode()).hexdigest()[:16]
+
+
+def session_owner(session) -> Optional[str]:
+    """account_key of the signed-in user, remembered in the session; None when Drive isn't connected."""
+    creds_json = session.get("user_creds")
+    if not creds_json:
+        return None
+    if not session.get("owner"):
+        session["owner"] = account_key(creds_json)
+    return session["owner"]
+
+
+def evict_client(creds_json):
+    key = user_key(creds_json)
+    with _cache_lock:
+        for k in [k for k in _clients if k[0] == key]:
+            del _clients[k]
+
+
 def get_drive_service(creds_json: str):
     if not creds_json:
         raise Exception("Google Drive not connected. Please visit /connect-drive")
-    
-    # Check if creds is a string (JSON) or dict
-    if isinstance(creds_json, str):
-        creds_data = json.loads(creds_json)
-    else:
-        creds_data = creds_json
-        
+
+    if DRIVE_BACKEND == "fake":
+        return fake_drive.get_fake_service()
+
+    creds_data = _parse_creds(creds_json)
+    key = (user_key(creds_data), threading.get_ident())
+
+    with _cache_lock:
+        entry = _clients.get(key)
+        if entry:
+            service, creds = entry
+            # An expired token is fine if google-auth can refresh it on the next request
+            if creds.valid or creds.refresh_token:
+                _clients.move_to_end(key)
+                return service
+            del _clients[key]
+
     creds = Credentials.from_authorized_user_info(creds_data, SCOPES)
-    return build("drive", "v3", credentials=creds)
+    service = build("drive", "v3", credentials=creds, cache_discovery=False)
+
+    with _cache_lock:
+        _clients[key] = (service, creds)
+        while len(_clients) > DRIVE_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return service
+
+
+# --- Request budget & retries ---
+DRIVE_MAX_CONCURRENCY = int(os.getenv("DRIVE_MAX_CONCURRENCY", "4"))  # parallel uploads per bulk call
+DRIVE_MAX_RPS = float(os.getenv("DRIVE_MAX_RPS", "8"))  # API requests/second for this process, 0 = unlimited
+DRIVE_MAX_RETRIES = int(os.getenv("DRIVE_MAX_RETRIES", "5"))
+
+_budget_lock = threading.Lock()
+_next_slot = 0.0
+
+
+def _take_budget():
+    """Space API requests at least 1/DRIVE_MAX_RPS apart across all threads."""
+    global _next_slot
+    if DRIVE_MAX_RPS <= 0:
+        return
+    with _budget_lock:
+        now = time.monotonic()
+        wait = _next_slot - now
+        _next_slot = max(now, _next_slot) + 1.0 / DRIVE_MAX_RPS
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _is_retryable(e: HttpError) -> bool:
+    status = e.resp.status
+    if status in (429, 500, 502, 503, 504):
+        return True
+    # Drive reports most quota errors as 403 rateLimitExceeded / userRateLimitExceeded
+    return status == 403 and b"ratelimitexceeded" in (e.content or b"").lower()
+
+
+def execute_with_backoff(make_request):
+    """
+    make_request() builds a fresh googleapiclient request (media bodies can't be
+    re-sent). Rate limits and 5xx are retried with jittered exponential backoff.
+    """
+    for attempt in range(DRIVE_MAX_RETRIES + 1):
+        _take_budget()
+        try:
+            return make_request().execute()
+        except HttpError as e:
+            if attempt == DRIVE_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = min(32, 2 ** attempt) * random.uniform(0.5, 1.0)
+            logger.warning(f"Drive rate limited ({e.resp.status}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def resolve_folder(service, ukey: str, path: tuple) -> str:
+    """Folder id for a path like ("Invoices", "2025", "January"), creating it if needed."""
+    with _cache_lock:
+        folder_id = _folder_ids.get((ukey, path))
+    if folder_id:
+        return folder_id
+
+    parent_id = resolve_folder(service, ukey, path[:-1]) if len(path) > 1 else None
+    folder_id = get_or_create_folder(service, path[-1], parent_id)
+    with _cache_lock:
+        _folder_ids[(ukey, path)] = folder_id
+    return folder_id
+
+
+def invalidate_folders(ukey: str):
+    """Forget every cached folder of a user (a 404 doesn't tell us which level went away)."""
+    with _cache_lock:
+        for k in [k for k in _folder_ids if k[0] == ukey]:
+            del _folder_ids[k]
 
 
 def get_or_create_folder(service, name, parent_id=None):
-    query = f"name='{name}' and mimeType='application/vnd.google-apps.folder'"
+    query = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
     if parent_id:
         query += f" and '{parent_id}' in parents"
 
-    results = service.files().list(q=query, fields="files(id)").execute()
+    results = execute_with_backoff(lambda: service.files().list(q=query, fields="files(id)"))
     files = results.get("files", [])
     if files:
         return files[0]["id"]
@@ -113,25 +267,37 @@ def get_or_create_folder(service, name, parent_id=None):
     if parent_id:
         metadata["parents"] = [parent_id]
 
-    folder = service.files().create(body=metadata, fields="id").execute()
+    folder = execute_with_backoff(lambda: service.files().create(body=metadata, fields="id"))
     return folder["id"]
 
 
 def upload_to_drive(local_path, year, month, day, creds_json):
     service = get_drive_service(creds_json)
+    ukey = user_key(creds_json)
 
-    root = get_or_create_folder(service, "Invoices")
-    year_f = get_or_create_folder(service, year, root)
-    month_f = get_or_create_folder(service, month, year_f)
+    # Warm path: folder ids come from the cache, so this is a single API call
+    for attempt in range(2):
+        month_f = resolve_folder(service, ukey, ("Invoices", year, month))
 
-    file_metadata = {"name": os.path.basename(local_path), "parents": [month_f]}
-    media = MediaFileUpload(local_path, resumable=True)
+        file_metadata = {"name": os.path.basename(local_path), "parents": [month_f]}
 
-    uploaded = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields="id,webViewLink",
-    ).execute()
+        try:
+            uploaded = execute_with_backoff(lambda: service.files().create(
+                body=file_metadata,
+                media_body=MediaFileUpload(local_path, resumable=True),
+                fields="id,webViewLink",
+            ))
+            break
+        except HttpError as e:
+            # Cached folder was deleted on the Drive side: re-resolve once
+            if e.resp.status == 404 and attempt == 0:
+                invalidate_folders(ukey)
+                continue
+            raise
+        except RefreshError:
+            # Token revoked/expired for good: don't keep serving this client
+            evict_client(creds_json)
+            raise
 
     folder_link = f"https://drive.google.com/drive/u/0/folders/{month_f}"
 
@@ -141,6 +307,51 @@ def upload_to_drive(local_path, year, month, day, creds_json):
     }
 
 
+def upload_many_to_drive(items, creds_json):
+    """
+    Bulk upload. items: [{"local_path", "year", "month", "day"}].
+    Folders are resolved once per destination month, then files go up
+    concurrently (DRIVE_MAX_CONCURRENCY) within the shared request budget.
+    Returns one outcome per item, in order:
+      {"status": "success", "file_link", "folder_link"} | {"status": "failed", "error"}
+    """
+    outcomes = [None] * len(items)
+    if not items:
+        return outcomes
+
+    service = get_drive_service(creds_json)
+    ukey = user_key(creds_json)
+
+    groups = {}
+    for i, it in enumerate(items):
+        groups.setdefault((it["year"], it["month"]), []).append(i)
+
+    # 1) Folders, once per destination
+    todo = []
+    for (year, month), idxs in groups.items():
+        try:
+            resolve_folder(service, ukey, ("Invoices", year, month))
+            todo.extend(idxs)
+        except Exception as e:
+            for i in idxs:
+                outcomes[i] = {"status": "failed", "error": f"Could not create folder: {e}"}
+
+    # 2) Files, concurrently. Folder ids are cached now, so each is one request.
+    def upload_one(i):
+        it = items[i]
+        try:
+            links = upload_to_drive(it["local_path"], it["year"], it["month"], it["day"], creds_json)
+            return i, {"status": "success", **links}
+        except Exception as e:
+            return i, {"status": "failed", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(DRIVE_MAX_CONCURRENCY, len(todo)))) as pool:
+        for i, outcome in pool.map(upload_one, todo):
+            outcomes[i] = outcome
+
+    return outcomes
+
+
 # def disconnect_drive():
 #     if os.path.exists(TOKEN_FILE):
 #         os.remove(TOKEN_FILE)
@@ -0,0 +1,133 @@
+# backend/services/duplicates.py
+"""
+Duplicate uploads, caught before the expensive stages run:
+
+  exact   the same bytes (content hash), any file type
+  image   a re-taken or re-saved photo: the 256-bit dHash of the deskewed,
+          cropped receipt is within IMAGE_DUP_MAX_BITS bits of an earlier one
+  fields  after extraction, the same vendor, date and amount
+
+Hashing a photo is CPU-bound numpy/PIL work (tens of ms), so it runs on the
+OCR process pool (stage "fingerprint", or fingerprint_file for /jobs).
+
+Only the caller's own successful uploads count, so nothing about another
+user's files comes back; without an owner (a dry run before connecting
+Drive) there is no lookup. Every lookup is an index seek (db.py): the
+content hash and (vendor, date, amount) have B-tree indexes, and photos
+are found through the four 16-bit bands of a coarse 64-bit dHash (two
+photos within 3 bits surely share a band, and most within 7 do), then
+compared on the fine hash.
+"""
+from typing import Optional, Dict, Any
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from backend.core.config import DUPLICATE_CHECK, IMAGE_DUP_MAX_BITS
+from backend.core.metrics import DUPLICATES
+from backend.db import find_invoice_by_hash, find_invoice_by_fields, find_image_hash_candidates
+from backend.services.ocr_service import get_pool, measure_page, otsu_threshold
+from backend.utils.text_utils import parse_amount
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+
+# Size the photo is normalized at, and most candidates compared per lookup
+_NORM_PX = 600
+_MAX_CANDIDATES = 500
+
+
+def check_file(content_hash: str, owner: Optional[str],
+               image_hash: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Duplicate among the owner's uploads of an ingested upload, by its bytes
+    or, for a photo, its fingerprint (image_fingerprint): None or
+    {"match", "invoice"}.
+    """
+    if not DUPLICATE_CHECK or not owner:
+        return None
+    invoice = find_invoice_by_hash(content_hash, owner)
+    if invoice:
+        return _found("exact", invoice)
+    if image_hash:
+        invoice = _closest_image(image_hash, owner)
+        if invoice:
+            return _found("image", invoice)
+    return None
+
+
+def field_key(naming: Dict[str, str]):
+    """(vendor, date, amount) that check_fields matches on, or None unless all three are known."""
+    amount = parse_amount(naming.get("amount_raw"))
+    if "UNKNOWN" in (naming.get("safe_vendor"), naming.get("date_norm")) or amount is None:
+        return None
+    return naming["safe_vendor"].lower(), naming["date_norm"], amount
+
+
+def check_fields(naming: Dict[str, str], owner: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Duplicate among the owner's uploads by extracted vendor, date and amount (all three known), or None."""
+    key = field_key(naming) if DUPLICATE_CHECK and owner else None
+    if not key:
+        return None
+    invoice = find_invoice_by_fields(*key, owner)
+    return _found("fields", invoice) if invoice else None
+
+
+def fingerprint_file(path: str, ext: str) -> Optional[Dict[str, Any]]:
+    """image_fingerprint of a photo, computed on the OCR process pool; None for PDFs."""
+    return get_pool().submit(image_fingerprint, path).result() if ext in IMAGE_EXTENSIONS else None
+
+
+def image_fingerprint(path: str) -> Optional[Dict[str, Any]]:
+    """
+    {"bands": [4 band keys], "dhash": 32 bytes}: dHashes of the photo after
+    deskewing and cropping to the inked area, so re-framing, rotation and
+    resolution don't change them much. None if the image can't be read.
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (_NORM_PX, _NORM_PX))
+            img = img.convert("L")
+    except Exception as e:
+        logger.warning(f"Could not hash image for duplicate check: {e}")
+        return None
+    img.thumbnail((_NORM_PX, _NORM_PX))
+    img = img.filter(ImageFilter.MedianFilter(3))  # speckle would shift the crop
+
+    angle, _ = measure_page(np.asarray(img))
+    if abs(angle) >= 0.2:
+        img = img.rotate(-angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    gray = np.asarray(img)
+    ink = gray < otsu_threshold(gray)
+    rows = np.flatnonzero(ink.sum(axis=1) > ink.shape[1] * 0.01)
+    cols = np.flatnonzero(ink.sum(axis=0) > ink.shape[0] * 0.01)
+    if len(rows) and len(cols):
+        img = img.crop((int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1))
+
+    coarse = int.from_bytes(_dhash(img, 8), "big")
+    bands = [(b << 16) | ((coarse >> (16 * b)) & 0xFFFF) for b in range(4)]
+    return {"bands": bands, "dhash": _dhash(img, 16)}
+
+
+def _dhash(img: Image.Image, size: int) -> bytes:
+    """size*size bits: is each pixel brighter than its left neighbour, on a (size+1) x size thumbnail."""
+    g = np.asarray(img.resize((size + 1, size), Image.BILINEAR), dtype=np.int16)
+    return np.packbits(g[:, 1:] > g[:, :-1]).tobytes()
+
+
+def _closest_image(image_hash: Dict[str, Any], owner: str) -> Optional[Dict[str, Any]]:
+    fine = int.from_bytes(image_hash["dhash"], "big")
+    best, best_bits = None, IMAGE_DUP_MAX_BITS + 1
+    for cand in find_image_hash_candidates(image_hash["bands"], owner, _MAX_CANDIDATES):
+        bits = (fine ^ int.from_bytes(cand.pop("dhash"), "big")).bit_count()
+        if bits < best_bits:
+            best, best_bits = cand, bits
+    return best
+
+
+def _found(match: str, invoice: Dict[str, Any]) -> Dict[str, Any]:
+    DUPLICATES.inc(match=match)
+    logger.info(f"Duplicate of invoice #{invoice['id']} ({match} match)")
+    return {"match": match, "invoice": invoice}
@@ -0,0 +1,89 @@
+# backend/services/extraction_cache.py
+import json
+import time
+from typing import Optional, Dict, Any
+
+from backend.db import get_conn
+from backend.core.config import EXTRACTION_CACHE_TTL, EXTRACTION_CACHE_MAX_BYTES
+
+# Bump this whenever text extraction or field extraction changes its output,
+# so entries produced by the old code are ignored instead of served.
+EXTRACTOR_VERSION = "2"
+
+
+def get_cached(sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"text": str, "fields": dict | None} for a fresh entry, else None.
+    Expired entries and entries from another extractor version count as misses.
+    """
+    now = time.time()
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT text, fields, created_at FROM extraction_cache WHERE sha256 = ? AND extractor_version = ?",
+            (sha256, EXTRACTOR_VERSION),
+        )
+        row = cur.fetchone()
+        if not row or now - row["created_at"] > EXTRACTION_CACHE_TTL:
+            return None
+
+        cur.execute("UPDATE extraction_cache SET last_used = ? WHERE sha256 = ?", (now, sha256))
+        conn.commit()
+        return {
+            "text": row["text"],
+            "fields": json.loads(row["fields"]) if row["fields"] else None,
+        }
+    finally:
+        conn.close()
+
+
+def put_cached(sha256: str, text: str, fields: Optional[Dict[str, Any]] = None):
+    """Insert or refresh an entry. Passing fields=None keeps previously cached fields."""
+    now = time.time()
+    fields_json = json.dumps(fields) if fields else None
+    size = len(text.encode("utf-8")) + len(fields_json or "")
+
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+        INSERT INTO extraction_cache (sha256, extractor_version, text, fields, size_bytes, created_at, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET
+            extractor_version = excluded.extractor_version,
+            text = excluded.text,
+            fields = CASE
+                WHEN extraction_cache.extractor_version = excluded.extractor_version
+                THEN COALESCE(excluded.fields, extraction_cache.fields)
+                ELSE excluded.fields
+            END,
+            size_bytes = excluded.size_bytes,
+            created_at = excluded.created_at,
+            last_used = excluded.last_used
+        """, (sha256, EXTRACTOR_VERSION, text, fields_json, size, now, now))
+        conn.commit()
+        _evict(cur, now)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _evict(cur, now: float):
+    # 1) TTL
+    cur.execute("DELETE FROM extraction_cache WHERE created_at < ?", (now - EXTRACTION_CACHE_TTL,))
+
+    # 2) Size budget: drop least recently used entries until we fit
+    cur.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM extraction_cache")
+    total = cur.fetchone()[0]
+    if total <= EXTRACTION_CACHE_MAX_BYTES:
+        return
+
+    cur.execute("SELECT sha256, size_bytes FROM extraction_cache ORDER BY last_used ASC")
+    victims = []
+    for row in cur.fetchall():
+        if total <= EXTRACTION_CACHE_MAX_BYTES:
+            break
+        victims.append((row["sha256"],))
+        total -= row["size_bytes"]
+    cur.executemany("DELETE FROM extraction_cache WHERE sha256 = ?", victims)
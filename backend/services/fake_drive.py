@@ -0,0 +1,125 @@
+# backend/services/fake_drive.py
+"""
+In-memory stand-in for the Drive v3 client, enough of files().list /
+create / delete for drive_service to run offline. Enable it with
+DRIVE_BACKEND=fake, or pass a FakeDriveService around directly.
+
+Every executed request is counted in `service.calls`, so cache behaviour
+("a warm upload costs one API call") can be checked.
+"""
+import re
+import uuid
+import threading
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+
+def _http_error(status: int, reason: str) -> HttpError:
+    resp = httplib2.Response({"status": status})
+    resp.reason = reason
+    return HttpError(resp, reason.encode())
+
+
+class _Request:
+    def __init__(self, service, fn):
+        self._service = service
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        with self._service._lock:
+            self._service.calls += 1
+            if self._service._failures:
+                status, reason = self._service._failures.pop(0)
+                raise _http_error(status, reason)
+            return self._fn()
+
+
+class _Files:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, q="", fields=None, **kwargs):
+        return _Request(self._service, lambda: {"files": self._service._query(q)})
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        return _Request(self._service, lambda: self._service._create(body or {}, media_body))
+
+    def delete(self, fileId=None, **kwargs):
+        return _Request(self._service, lambda: self._service._delete(fileId))
+
+
+class FakeDriveService:
+    def __init__(self):
+        self.files_by_id = {}
+        self.calls = 0
+        self._failures = []
+        self._lock = threading.RLock()
+
+    def files(self):
+        return _Files(self)
+
+    def fail_next(self, status: int = 429, reason: str = "rateLimitExceeded", times: int = 1):
+        """Make the next `times` requests fail, e.g. to exercise retry/backoff."""
+        with self._lock:
+            self._failures.extend([(status, reason)] * times)
+
+    def _query(self, q: str):
+        name = re.search(r"name='([^']*)'", q)
+        mime = re.search(r"mimeType='([^']*)'", q)
+        parent = re.search(r"'([^']*)' in parents", q)
+        matches = []
+        for f in self.files_by_id.values():
+            if name and f["name"] != name.group(1):
+                continue
+            if mime and f["mimeType"] != mime.group(1):
+                continue
+            if parent and parent.group(1) not in f["parents"]:
+                continue
+            if "trashed=false" in q and f.get("trashed"):
+                continue
+            matches.append({"id": f["id"], "name": f["name"]})
+        return matches
+
+    def _create(self, body, media_body):
+        parents = body.get("parents", [])
+        for p in parents:
+            if p not in self.files_by_id:
+                raise _http_error(404, f"File not found: {p}")
+        file_id = uuid.uuid4().hex[:16]
+        self.files_by_id[file_id] = {
+            "id": file_id,
+            "name": body.get("name"),
+            "mimeType": body.get("mimeType", "application/octet-stream"),
+            "parents": parents,
+        }
+        return {"id": file_id, "webViewLink": f"https://drive.google.com/file/d/{file_id}/view"}
+
+    def _delete(self, file_id):
+        if file_id not in self.files_by_id:
+            raise _http_error(404, f"File not found: {file_id}")
+        # deleting a folder drops its contents too
+        doomed = {file_id}
+        changed = True
+        while changed:
+            changed = False
+            for f in self.files_by_id.values():
+                if f["id"] not in doomed and doomed.intersection(f["parents"]):
+                    doomed.add(f["id"])
+                    changed = True
+        for fid in doomed:
+            del self.files_by_id[fid]
+        return {}
+
+
+_shared = None
+
+
+def get_fake_service() -> FakeDriveService:
+    """Process-wide fake, used when DRIVE_BACKEND=fake."""
+    global _shared
+    if _shared is None:
+        _shared = FakeDriveService()
+    return _shared
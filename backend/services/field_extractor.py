@@ -1,5 +1,7 @@
 import re
-from backend.utils.text_utils import normalize_text, normalize_date, extract_money_candidates
+from backend.utils.text_utils import normalize_text, normalize_date, line_money_candidates, estimate_tokens
+from backend.utils.keyword_matcher import KeywordMatcher, load_keyword_packs
+from backend.core.config import KEYWORD_PACKS, KEYWORD_PACK_DIR
 
 STOP_VENDOR_WORDS = {
     "tax", "taxes", "gst", "cgst", "sgst", "igst", "invoice", "receipt", "bill",
@@ -35,9 +37,51 @@ DATE_KEYS = [
     "date",
 ]
 
+# How far into the document each rule looks (in non-empty lines)
+VENDOR_TOP_LINES = 25
+DATE_LABEL_LINES = 80
+DATE_SCAN_LINES = 120
+AMOUNT_FALLBACK_LINES = 80  # from the bottom
+
+# What prompt_excerpt keeps first: the header, labelled lines with this many
+# neighbours on each side, and the last lines of the document
+PROMPT_HEADER_LINES = 10
+PROMPT_CONTEXT_LINES = 1
+PROMPT_TAIL_LINES = 6
+GAP_MARKER = "[...]"  # stands for the lines left out
+_GAP_TOKENS = estimate_tokens(GAP_MARKER) + 1
+
+# "Restaurant Name:", "Merchant:", etc. Tried in this order on each line.
+EXPLICIT_VENDOR_RES = [
+    re.compile(r"\b(restaurant name|merchant|sold by|store|vendor)\s*:\s*(.+)$", re.I),
+    re.compile(r"\b(billed from)\s*:\s*(.+)$", re.I),
+]
+
+# Every keyword table in one automaton; a line is classified with one scan
+_PACK = load_keyword_packs(KEYWORD_PACKS, KEYWORD_PACK_DIR)
+KEYWORDS = KeywordMatcher({
+    "address": list(ADDRESS_HINTS) + _PACK.get("address", []),
+    "date": DATE_KEYS + _PACK.get("date", []),
+    "total": TOTAL_KEYS + _PACK.get("total", []),
+    "bad_total": [b for b in BAD_TOTAL_CONTEXT if b != "total"] + _PACK.get("bad_total", []),
+})
+_ADDRESS = KEYWORDS.flag("address")
+_DATE_KEY = KEYWORDS.flag("date")
+_TOTAL_KEY = KEYWORDS.flag("total")
+_BAD_TOTAL = KEYWORDS.flag("bad_total")
+
+# whole-token matches, so a set rather than the automaton
+_STOP_VENDOR_WORDS = STOP_VENDOR_WORDS | set(_PACK.get("stop_vendor", []))
+
+_VENDOR_JUNK_RE = re.compile(r"[^A-Za-z0-9 &()._-]+")
+_SPACES_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[a-zA-Z]+")
+_LETTER_RE = re.compile(r"[A-Za-z]")
+_BUSINESS_RE = re.compile(r"\b(pvt|ltd|limited|inc|llp|store|restaurant|cafe|hotel)\b")
+
 def _clean_vendor(line: str) -> str:
-    line = re.sub(r"[^A-Za-z0-9 &()._-]+", " ", line)
-    line = re.sub(r"\s+", " ", line).strip()
+    line = _VENDOR_JUNK_RE.sub(" ", line)
+    line = _SPACES_RE.sub(" ", line).strip()
     return line
 
 def _vendor_score(line: str) -> float:
@@ -56,7 +100,7 @@ def _vendor_score(line: str) -> float:
         return -50
 
     # reject address-ish lines
-    if any(w in low for w in ADDRESS_HINTS):
+    if KEYWORDS.scan(low) & _ADDRESS:
         return -30
 
     # reject if contains too many digits
@@ -65,9 +109,9 @@ def _vendor_score(line: str) -> float:
         return -25
 
     # reject stop words dominating
-    tokens = re.findall(r"[a-zA-Z]+", low)
+    tokens = _WORD_RE.findall(low)
     if tokens:
-        stop_hits = sum(1 for t in tokens if t in STOP_VENDOR_WORDS)
+        stop_hits = sum(1 for t in tokens if t in _STOP_VENDOR_WORDS)
         if stop_hits / max(1, len(tokens)) > 0.5:
             return -20
 
@@ -75,9 +119,9 @@ def _vendor_score(line: str) -> float:
     score = 0
     if 3 <= len(s) <= 40:
         score += 10
-    if re.search(r"[A-Za-z]", s):
+    if _LETTER_RE.search(s):
         score += 5
-    if re.search(r"\b(pvt|ltd|limited|inc|llp|store|restaurant|cafe|hotel)\b", low):
+    if _BUSINESS_RE.search(low):
         score += 8
     # Title-case / upper-ish is common for vendor names
     upper_ratio = sum(ch.isupper() for ch in s if ch.isalpha()) / max(1, sum(ch.isalpha() for ch in s))
@@ -86,6 +130,93 @@ def _vendor_score(line: str) -> float:
 
     return score
 
+def _explicit_vendor(line: str):
+    for pat in EXPLICIT_VENDOR_RES:
+        m = pat.search(line)
+        if m:
+            cand = _clean_vendor(m.group(2))
+            if cand and len(cand) >= 3:
+                return cand
+    return None
+
+def _label_date(line: str):
+    # attempt to extract value after colon if present
+    if ":" in line:
+        d = normalize_date(line.split(":", 1)[1].strip())
+        if d != "UNKNOWN":
+            return d
+    # else try entire line
+    d = normalize_date(line)
+    return d if d != "UNKNOWN" else None
+
+def _split_lines(text: str):
+    if not text:
+        return []
+    return [ln.strip() for ln in normalize_text(text).splitlines() if ln.strip()]
+
+def _scan(lines, vendor: bool = True, date: bool = True, amount: bool = True) -> dict:
+    """
+    Every rule in one pass over the (already normalized) lines:
+
+    vendor: an explicit "Merchant: X" style label in the top lines wins,
+            otherwise the best-scoring top line (if it scores at least 5).
+    date:   the first line mentioning a date label that parses, otherwise
+            the first line that parses as a date at all.
+    amount: the largest money value on a total-like line (ignoring tax,
+            tip, fee... lines), otherwise the largest money value near the
+            bottom of the document.
+    """
+    explicit_vendor = None
+    best_vendor, best_score = "UNKNOWN", -999
+    label_date = first_date = None
+    best_val = best_raw = None
+
+    for i, ln in enumerate(lines):
+        if vendor and explicit_vendor is None and i < VENDOR_TOP_LINES:
+            if ":" in ln:
+                explicit_vendor = _explicit_vendor(ln)
+            cand = _clean_vendor(ln)
+            sc = _vendor_score(cand)
+            if sc > best_score:
+                best_vendor, best_score = cand, sc
+
+        want_date_key = date and label_date is None and i < DATE_LABEL_LINES
+        keys = KEYWORDS.scan(ln.lower()) if (want_date_key or amount) else 0
+
+        if date and label_date is None and i < DATE_SCAN_LINES:
+            if want_date_key and keys & _DATE_KEY:
+                # _label_date already tried the whole line
+                label_date = _label_date(ln)
+            elif first_date is None:
+                d = normalize_date(ln)
+                if d != "UNKNOWN":
+                    first_date = d
+
+        if amount and keys & _TOTAL_KEY and not keys & _BAD_TOTAL:
+            cands = line_money_candidates(ln)
+            if cands:
+                # prefer largest in this line
+                val, raw, _ = max(cands, key=lambda x: x[0])
+                if best_val is None or val > best_val:
+                    best_val, best_raw = val, raw
+
+    fields = {}
+    if vendor:
+        if explicit_vendor:
+            fields["vendor"] = explicit_vendor
+        else:
+            fields["vendor"] = best_vendor if best_score >= 5 else "UNKNOWN"
+    if date:
+        fields["date"] = label_date or first_date or "UNKNOWN"
+    if amount:
+        if best_raw is None:
+            # fallback: consider bottom portion of doc (totals usually there)
+            cands = [c for ln in lines[-AMOUNT_FALLBACK_LINES:] for c in line_money_candidates(ln)]
+            if cands:
+                best_raw = max(cands, key=lambda x: x[0])[1]
+        fields["amount"] = best_raw or "UNKNOWN"
+    return fields
+
 def extract_vendor(text: str) -> str:
     """
     Practical vendor extraction:
@@ -93,35 +224,7 @@ def extract_vendor(text: str) -> str:
       - Pick the highest-scoring line.
       - Avoid customer name / address / labels.
     """
-    if not text:
-        return "UNKNOWN"
-    t = normalize_text(text)
-    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
-
-    # take the very top chunk
-    top = lines[:25]
-
-    # also consider "Restaurant Name:", "Merchant:", etc
-    explicit_patterns = [
-        r"\b(restaurant name|merchant|sold by|store|vendor)\s*:\s*(.+)$",
-        r"\b(billed from)\s*:\s*(.+)$",
-    ]
-    for ln in top:
-        for pat in explicit_patterns:
-            m = re.search(pat, ln, re.I)
-            if m:
-                cand = _clean_vendor(m.group(len(m.groups())))
-                if cand and len(cand) >= 3:
-                    return cand
-
-    best = ("UNKNOWN", -999)
-    for ln in top:
-        cand = _clean_vendor(ln)
-        sc = _vendor_score(cand)
-        if sc > best[1]:
-            best = (cand, sc)
-
-    return best[0] if best[1] >= 5 else "UNKNOWN"
+    return _scan(_split_lines(text), date=False, amount=False)["vendor"]
 
 def extract_date(text: str) -> str:
     """
@@ -130,33 +233,7 @@ def extract_date(text: str) -> str:
       - if found parse with normalize_date
       - fallback: scan first ~60 lines for any date pattern
     """
-    if not text:
-        return "UNKNOWN"
-    t = normalize_text(text)
-    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
-
-    # label-based
-    for ln in lines[:80]:
-        low = ln.lower()
-        if any(k in low for k in DATE_KEYS):
-            # attempt to extract value after colon if present
-            if ":" in ln:
-                val = ln.split(":", 1)[1].strip()
-                d = normalize_date(val)
-                if d != "UNKNOWN":
-                    return d
-            # else try entire line
-            d = normalize_date(ln)
-            if d != "UNKNOWN":
-                return d
-
-    # fallback scan
-    for ln in lines[:120]:
-        d = normalize_date(ln)
-        if d != "UNKNOWN":
-            return d
-
-    return "UNKNOWN"
+    return _scan(_split_lines(text), vendor=False, amount=False)["date"]
 
 def extract_amount(text: str) -> str:
     """
@@ -165,38 +242,7 @@ def extract_amount(text: str) -> str:
       2) From those lines pick the biggest money value in that context.
       3) If none, pick the maximum money candidate near bottom of doc.
     """
-    if not text:
-        return "UNKNOWN"
-
-    t = normalize_text(text)
-    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
-
-    # 1) keyword lines
-    best_val = None
-    best_raw = None
-
-    for ln in lines:
-        low = ln.lower()
-
-        if any(k in low for k in TOTAL_KEYS) and not any(b in low for b in BAD_TOTAL_CONTEXT if b not in {"total"}):
-            cands = extract_money_candidates(ln)
-            if cands:
-                # prefer largest in this line
-                val, raw, _ = max(cands, key=lambda x: x[0])
-                if best_val is None or val > best_val:
-                    best_val, best_raw = val, raw
-
-    if best_raw:
-        return best_raw
-
-    # 2) fallback: consider bottom portion of doc (totals usually there)
-    bottom = "\n".join(lines[-80:])
-    cands = extract_money_candidates(bottom)
-    if cands:
-        val, raw, ctx = max(cands, key=lambda x: x[0])
-        return raw
-
-    return "UNKNOWN"
+    return _scan(_split_lines(text), vendor=False, date=False)["amount"]
 
 def extract_fields(text: str) -> dict:
     """
@@ -204,8 +250,64 @@ def extract_fields(text: str) -> dict:
       vendor: string (raw)
       date:   YYYY_MM_DD or UNKNOWN
       amount: raw currency string or UNKNOWN
+
+    Normalizes and splits the text once, then gets all three in one pass.
+    """
+    return _scan(_split_lines(text))
+
+def prompt_excerpt(text: str, max_tokens: int) -> str:
+    """
+    The part of `text` worth sending to the LLM, in about max_tokens tokens.
+    Text that fits is returned unchanged. Otherwise lines are kept in this
+    order until the budget is spent, and printed in document order with the
+    gaps marked:
+      1) the header (vendor)
+      2) date-labelled lines near the top, with their neighbours
+      3) total-like lines, bottom up, real totals before tax/fee lines
+      4) the last lines (totals without a label)
+      5) everything else, top down (mostly line items)
+    Left-out runs of lines show up as GAP_MARKER.
     """
-    vendor = extract_vendor(text)
-    date = extract_date(text)
-    amount = extract_amount(text)
-    return {"vendor": vendor, "date": date, "amount": amount}
+    if not text or max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    lines = _split_lines(text)
+    date_lines, totals, other_totals = [], [], []
+    for i, ln in enumerate(lines):
+        keys = KEYWORDS.scan(ln.lower())
+        if keys & _DATE_KEY and i < DATE_LABEL_LINES:
+            date_lines.append(i)
+        if keys & _TOTAL_KEY:
+            (other_totals if keys & _BAD_TOTAL else totals).append(i)
+
+    def around(idxs):
+        return [j for i in idxs for j in range(i - PROMPT_CONTEXT_LINES, i + PROMPT_CONTEXT_LINES + 1)]
+
+    n = len(lines)
+    order = (
+        list(range(min(PROMPT_HEADER_LINES, n)))
+        + around(date_lines)
+        + around(totals[::-1])
+        + list(range(max(0, n - PROMPT_TAIL_LINES), n))
+        + other_totals[::-1]
+        + list(range(n))
+    )
+    keep, used = set(), 0
+    for i in order:
+        if 0 <= i < n and i not in keep:
+            # + newline, + a gap marker unless it joins lines already kept
+            cost = estimate_tokens(lines[i]) + 1
+            if i - 1 not in keep and i + 1 not in keep:
+                cost += _GAP_TOKENS
+            if used + cost <= max_tokens:
+                keep.add(i)
+                used += cost
+
+    out, prev = [], -1
+    for i in sorted(keep):
+        if i > prev + 1:
+            out.append(GAP_MARKER)
+        out.append(lines[i])
+        prev = i
+    if prev < n - 1:
+        out.append(GAP_MARKER)
+    return "\n".join(out)
@@ -0,0 +1,404 @@
+# backend/services/job_queue.py
+"""
+Background upload jobs. POST /jobs spools the files, records a job with one
+item per file in SQLite and returns straight away; a bounded thread pool
+then runs the usual pipeline stages (services/pipeline.py) for each item.
+Per-stage progress is written back to the item row, and unfinished items
+are re-queued on startup.
+
+The user's Drive credentials are kept with the job only for real uploads,
+encrypted with JOB_CREDS_KEY, and are dropped once every item is finished
+(whatever the outcome) or the job is older than JOB_CREDS_TTL.
+
+With several web workers, an item is run by whichever worker claims it
+first (job_items.worker_id); items whose worker has stopped sending
+heartbeats (services/web_workers.py) are picked up again by the others.
+"""
+import os
+import json
+import base64
+import hashlib
+import shutil
+import uuid
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from backend.db import get_conn, insert_invoice
+from backend.services.web_workers import WORKER_ID, live_cutoff
+from backend.core.config import JOB_WORKERS, JOB_CREDS_KEY, JOB_CREDS_TTL
+from backend.utils.logging_utils import get_logger, request_id_var
+from backend.services.pipeline import (
+    InvalidDocument, RateLimited,
+    StageTimer, extract_text, extract_fields, build_naming, store_file, upload_file_to_drive,
+    invoice_record, insert_records, dry_run_response, success_response, rate_limit_response, duplicate_response,
+)
+from backend.services.duplicates import check_file, check_fields, fingerprint_file
+
+DRY_RUN_STAGES = ["dedupe", "extract_text", "extract_fields"]
+UPLOAD_STAGES = DRY_RUN_STAGES + ["store", "drive"]
+
+# Item statuses that are final
+TERMINAL = {"success", "dry_run", "rate_limit", "duplicate", "failed"}
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_write_lock = threading.Lock()
+_submitted = set()  # item ids queued on this worker's executor
+
+# Unfinished items no live web worker holds
+UNCLAIMED = """
+(status = 'queued' OR (status = 'running' AND (worker_id IS NULL OR worker_id NOT IN (
+    SELECT id FROM web_workers WHERE heartbeat_at >= ?
+))))
+"""
+
+logger = get_logger()
+
+_fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(JOB_CREDS_KEY.encode()).digest()))
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _seal(creds_json: Optional[str]) -> Optional[str]:
+    return _fernet.encrypt(creds_json.encode()).decode() if creds_json else None
+
+
+def _unseal(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    try:
+        return _fernet.decrypt(token.encode()).decode()
+    except InvalidToken:
+        # stored under another JOB_CREDS_KEY, or not sealed at all
+        logger.warning("Stored job credentials can't be decrypted")
+        return None
+
+
+def _execute(sql: str, params=()):
+    with _write_lock:
+        conn = get_conn()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def create_job(files: List[Dict[str, str]], options: Dict[str, Any], creds_json: Optional[str],
+               owner: Optional[str] = None) -> str:
+    """
+    files: [{"filename", "spool_path", "content_hash"}]
+    options: {"dry_run": bool, "use_custom_name": bool}
+    owner: drive_service.account_key of the submitter
+    """
+    job_id = uuid.uuid4().hex
+    now = _now()
+    stages = DRY_RUN_STAGES if options.get("dry_run") else UPLOAD_STAGES
+    pending = json.dumps({name: {"status": "pending"} for name in stages})
+
+    with _write_lock:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO jobs (id, created_at, updated_at, status, options, creds_json, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, now, now, "queued", json.dumps(options),
+                 None if options.get("dry_run") else _seal(creds_json), owner),
+            )
+            cur.executemany("""
+            INSERT INTO job_items (job_id, idx, filename, spool_path, content_hash, status, stages, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)
+            """, [
+                (job_id, i, f["filename"], f["spool_path"], f["content_hash"], pending, now)
+                for i, f in enumerate(files)
+            ])
+            conn.commit()
+            cur.execute("SELECT id FROM job_items WHERE job_id = ? ORDER BY idx", (job_id,))
+            item_ids = [r["id"] for r in cur.fetchall()]
+        finally:
+            conn.close()
+
+    for item_id in item_ids:
+        _submit(item_id)
+    return job_id
+
+
+def _submit(item_id: int):
+    with _write_lock:
+        if item_id in _submitted:
+            return False
+        _submitted.add(item_id)
+    _executor.submit(_run_item, item_id)
+    return True
+
+
+def count_pending() -> int:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM job_items WHERE status IN ('queued', 'running')")
+        return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id, created_at, updated_at, status, options FROM jobs WHERE id = ?", (job_id,))
+        job = cur.fetchone()
+        if not job:
+            return None
+        cur.execute("""
+        SELECT idx, filename, status, stages, result, error, updated_at
+        FROM job_items WHERE job_id = ? ORDER BY idx
+        """, (job_id,))
+        items = cur.fetchall()
+    finally:
+        conn.close()
+
+    counts = {}
+    for it in items:
+        counts[it["status"]] = counts.get(it["status"], 0) + 1
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "options": json.loads(job["options"] or "{}"),
+        "counts": counts,
+        "items": [{
+            "index": it["idx"],
+            "filename": it["filename"],
+            "status": it["status"],
+            "stages": json.loads(it["stages"] or "{}"),
+            "result": json.loads(it["result"]) if it["result"] else None,
+            "error": it["error"],
+            "updated_at": it["updated_at"],
+        } for it in items],
+    }
+
+
+def expire_jobs():
+    """
+    Fail the unfinished items of jobs older than JOB_CREDS_TTL and drop their
+    credentials, so a job that can never finish doesn't keep them.
+    """
+    cutoff = (datetime.utcnow() - timedelta(seconds=JOB_CREDS_TTL)).isoformat()
+    now = _now()
+    with _write_lock:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM jobs WHERE status != 'completed' AND created_at < ?", (cutoff,))
+            job_ids = [r["id"] for r in cur.fetchall()]
+            for job_id in job_ids:
+                cur.execute("""
+                UPDATE job_items SET status = 'failed', error = 'Job expired before it finished', updated_at = ?
+                WHERE job_id = ? AND status IN ('queued', 'running')
+                """, (now, job_id))
+                cur.execute(
+                    "UPDATE jobs SET status = 'completed', creds_json = NULL, updated_at = ? WHERE id = ?",
+                    (now, job_id),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+    if job_ids:
+        logger.warning(f"Expired {len(job_ids)} unfinished job(s) older than {JOB_CREDS_TTL}s")
+
+
+def resume_jobs():
+    """
+    Queue unfinished items no live worker holds: left by a previous process,
+    by a worker that has died, or queued by another worker. Runs at startup
+    and after every heartbeat.
+    """
+    expire_jobs()
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT id FROM job_items WHERE {UNCLAIMED} ORDER BY id", (live_cutoff(),))
+        item_ids = [r["id"] for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    resumed = sum(_submit(item_id) for item_id in item_ids)
+    if resumed:
+        logger.info(f"Resuming {resumed} unfinished job item(s)")
+
+
+def _claim(item_id: int) -> bool:
+    """Take the item for this worker, unless another live worker has it or it is finished."""
+    with _write_lock:
+        conn = get_conn()
+        try:
+            cur = conn.execute(
+                f"UPDATE job_items SET status = 'running', worker_id = ?, updated_at = ? WHERE id = ? AND {UNCLAIMED}",
+                (WORKER_ID, _now(), item_id, live_cutoff()),
+            )
+            conn.commit()
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+
+def _load_item(item_id: int):
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+        SELECT i.*, j.options, j.creds_json, j.owner FROM job_items i JOIN jobs j ON j.id = i.job_id
+        WHERE i.id = ?
+        """, (item_id,))
+        return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def _save_stages(item_id: int, stages: Dict[str, Any], status: str = "running"):
+    _execute(
+        "UPDATE job_items SET status = ?, stages = ?, updated_at = ? WHERE id = ?",
+        (status, json.dumps(stages), _now(), item_id),
+    )
+
+
+def _finish_item(item_id: int, job_id: str, stages: Dict[str, Any], status: str,
+                 result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+    now = _now()
+    with _write_lock:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE job_items SET status = ?, stages = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(stages), json.dumps(result) if result else None, error, now, item_id),
+            )
+            cur.execute("SELECT status FROM job_items WHERE job_id = ?", (job_id,))
+            statuses = [r["status"] for r in cur.fetchall()]
+            if all(s in TERMINAL for s in statuses):
+                # Done: drop the Drive credentials, we no longer need them
+                cur.execute(
+                    "UPDATE jobs SET status = 'completed', creds_json = NULL, updated_at = ? WHERE id = ?",
+                    (now, job_id),
+                )
+            else:
+                cur.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, job_id))
+            conn.commit()
+            job_done = all(s in TERMINAL for s in statuses)
+        finally:
+            conn.close()
+    return job_done
+
+
+class _Duplicate(Exception):
+    def __init__(self, duplicate: Dict[str, Any]):
+        self.duplicate = duplicate
+
+
+def _run_item(item_id: int):
+    try:
+        if _claim(item_id):
+            _run_claimed(item_id)
+    finally:
+        with _write_lock:
+            _submitted.discard(item_id)
+
+
+def _run_claimed(item_id: int):
+    item = _load_item(item_id)
+    if not item or item["status"] in TERMINAL:
+        return
+
+    job_id = item["job_id"]
+    # log lines of this item carry "<job>/<item>" where requests carry their request id
+    request_id_var.set(f"{job_id[:8]}/{item_id}")
+    options = json.loads(item["options"] or "{}")
+    dry_run = bool(options.get("dry_run"))
+    allow_duplicate = bool(options.get("allow_duplicate"))
+    path = item["spool_path"]
+    ext = os.path.splitext(item["filename"])[1].lower()
+    stages = json.loads(item["stages"] or "{}")
+    timer = StageTimer()
+
+    def run_stage(name, fn, *args):
+        stages[name] = {"status": "running", "started_at": _now()}
+        _save_stages(item_id, stages)
+        try:
+            with timer.stage(name):
+                out = fn(*args)
+        except Exception as e:
+            stages[name].update(status="failed", error=str(e))
+            raise
+        finally:
+            stages[name]["duration_ms"] = timer.timings[name]
+        stages[name]["status"] = "done"
+        _save_stages(item_id, stages)
+        return out
+
+    status, result, error = "failed", None, None
+    naming = text = None
+    try:
+        if not os.path.exists(path):
+            # e.g. we were restarted after the file had already been moved
+            raise FileNotFoundError("Spooled file is gone, job item was interrupted")
+        creds_json = None if dry_run else _unseal(item["creds_json"])
+        if not dry_run and not creds_json:
+            raise PermissionError("Stored Drive credentials can't be read, please resubmit the upload")
+
+        image_hash = run_stage("dedupe", fingerprint_file, path, ext)
+        duplicate = None if allow_duplicate else check_file(item["content_hash"], item["owner"], image_hash)
+        if duplicate:
+            raise _Duplicate(duplicate)
+        text, cached = run_stage("extract_text", extract_text, path, ext, item["content_hash"])
+        fields = run_stage("extract_fields", extract_fields, text, item["content_hash"], cached, None, dry_run)
+        naming = build_naming(fields, ext, item["filename"], bool(options.get("use_custom_name")))
+        duplicate = None if allow_duplicate else check_fields(naming, item["owner"])
+        if duplicate:
+            raise _Duplicate(duplicate)
+
+        if dry_run:
+            result = dry_run_response(naming)
+        else:
+            final_path = run_stage("store", store_file, path, naming)
+            drive_links = run_stage("drive", upload_file_to_drive, final_path, naming, creds_json)
+            result = success_response(naming, final_path, drive_links)
+            insert_records([invoice_record(item["filename"], item["content_hash"], timer, naming, final_path,
+                                           drive_links, text=text, image_hash=image_hash, owner=item["owner"])])
+        status = result["status"]
+
+    except _Duplicate as e:
+        result = duplicate_response(e.duplicate)
+        status = "duplicate"
+    except RateLimited:
+        result = rate_limit_response(item["filename"])
+        status = "rate_limit"
+    except InvalidDocument as e:
+        error = str(e)
+    except Exception as e:
+        logger.exception(f"Job item {item_id} failed: {e}")
+        error = str(e)
+        if not dry_run:
+            try:
+                insert_invoice(invoice_record(item["filename"], item["content_hash"], timer, naming, error=error,
+                                              text=text, owner=item["owner"]))
+            except Exception:
+                pass
+
+    finally:
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+    if _finish_item(item_id, job_id, stages, status, result, error):
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
@@ -0,0 +1,233 @@
+# backend/services/llm_gateway.py
+"""
+Every Groq call goes through here:
+
+  - one client per process, so the HTTP connection pool (and its TLS
+    sessions) is reused instead of built per document
+  - responses are cached in SQLite (llm_cache) under a key the caller
+    derives from the prompt version and the normalized document text, so a
+    re-upload, a re-scan of the same receipt or a retry after a 429 that
+    already succeeded elsewhere never reaches the API
+  - concurrent requests with the same key are coalesced: one caller talks
+    to the API, the others wait for its answer (or its exception)
+
+complete() is for threads, complete_async() for the event loop (AsyncGroq
+client); both share the cache, the in-flight table and the counters.
+stats() has the hit/miss counters for this process.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import weakref
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Optional, Dict, Any
+
+from backend.db import get_conn
+from backend.services.workers import io_pool
+from backend.core.config import LLM_CACHE_TTL
+from backend.core.metrics import CACHE_LOOKUPS, LLM_SECONDS
+
+_client = None
+_client_lock = threading.Lock()
+# AsyncGroq's HTTP pool belongs to the loop it was created on
+_async_clients = weakref.WeakKeyDictionary()
+
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+_stats = {"requests": 0, "hits": 0, "misses": 0, "coalesced": 0, "api_calls": 0, "api_errors": 0, "api_ms": 0.0}
+_stats_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Groq client (None without GROQ_API_KEY)."""
+    global _client
+    if _client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            return None
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                # retries are llm_scheduler's job: it knows about the other requests
+                _client = Groq(api_key=api_key, max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """The AsyncGroq client for the running event loop (None without GROQ_API_KEY)."""
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from groq import AsyncGroq
+        client = _async_clients[loop] = AsyncGroq(api_key=api_key, max_retries=0)
+    return client
+
+
+def normalize_for_key(text: str) -> str:
+    # Runs of whitespace differ between PDF text and OCR of the same receipt
+    return " ".join(text.split())
+
+
+def request_key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _count(name: str, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _lookup(result: str):
+    """One request answered: result is "hit", "coalesced" or "miss"."""
+    _count({"hit": "hits", "coalesced": "coalesced", "miss": "misses"}[result])
+    CACHE_LOOKUPS.inc(cache="llm", result=result)
+
+
+def _api_call_done(t0: float, ok: bool):
+    elapsed = time.perf_counter() - t0
+    _count("api_calls")
+    _count("api_ms", elapsed * 1000)
+    LLM_SECONDS.observe(elapsed, outcome="ok" if ok else "error")
+
+
+def _cache_get(key: str) -> Optional[str]:
+    if LLM_CACHE_TTL <= 0:
+        return None
+    now = time.time()
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?", (key, now - LLM_CACHE_TTL)
+        ).fetchone()
+        if not row:
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        conn.commit()
+        return row["response"]
+    finally:
+        conn.close()
+
+
+def _cache_put(key: str, response: str):
+    if LLM_CACHE_TTL <= 0:
+        return
+    now = time.time()
+    conn = get_conn()
+    try:
+        conn.execute("""
+        INSERT INTO llm_cache (key, response, created_at, last_used) VALUES (?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET response = excluded.response,
+            created_at = excluded.created_at, last_used = excluded.last_used
+        """, (key, response, now, now))
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE_TTL,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _join(key: str):
+    """(future, leader): the in-flight request for key, or a new one this caller must run."""
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut, False
+        fut = _inflight[key] = Future()
+        return fut, True
+
+
+def complete(key: str, call: Callable[[], str]) -> str:
+    """
+    The response for `key`: from the cache, from a request already in flight,
+    or from call() (which does the API request and returns the response text).
+    Exceptions from call() reach every caller waiting on it and nothing is cached.
+    """
+    _count("requests")
+    cached = _cache_get(key)
+    if cached is not None:
+        _lookup("hit")
+        return cached
+
+    fut, leader = _join(key)
+    if not leader:
+        _lookup("coalesced")
+        return fut.result()
+
+    try:
+        # The previous leader for this key may have finished just before we got the lock
+        response = _cache_get(key)
+        if response is not None:
+            _lookup("hit")
+        else:
+            _lookup("miss")
+            t0 = time.perf_counter()
+            try:
+                response = call()
+            except Exception:
+                _count("api_errors")
+                _api_call_done(t0, ok=False)
+                raise
+            _api_call_done(t0, ok=True)
+            _cache_put(key, response)
+        fut.set_result(response)
+        return response
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+async def complete_async(key: str, call: Callable[[], Awaitable[str]]) -> str:
+    """complete() for the event loop: call() is a coroutine, SQLite runs on the io threads."""
+    loop = asyncio.get_running_loop()
+    _count("requests")
+    cached = await loop.run_in_executor(io_pool(), _cache_get, key)
+    if cached is not None:
+        _lookup("hit")
+        return cached
+
+    fut, leader = _join(key)
+    if not leader:
+        _lookup("coalesced")
+        return await asyncio.wrap_future(fut)
+
+    try:
+        response = await loop.run_in_executor(io_pool(), _cache_get, key)
+        if response is not None:
+            _lookup("hit")
+        else:
+            _lookup("miss")
+            t0 = time.perf_counter()
+            try:
+                response = await call()
+            except Exception:
+                _count("api_errors")
+                _api_call_done(t0, ok=False)
+                raise
+            _api_call_done(t0, ok=True)
+            await loop.run_in_executor(io_pool(), _cache_put, key, response)
+        fut.set_result(response)
+        return response
+    except BaseException as e:
+        # CancelledError included: waiters must not hang on a cancelled leader
+        fut.set_exception(e if isinstance(e, Exception) else RuntimeError("LLM request cancelled"))
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out = dict(_stats)
+    served = out["hits"] + out["coalesced"] + out["misses"]
+    out["hit_rate"] = round((out["hits"] + out["coalesced"]) / served, 3) if served else 0.0
+    out["api_ms"] = round(out["api_ms"], 1)
+    return out
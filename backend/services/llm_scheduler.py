@@ -0,0 +1,388 @@
+# backend/services/llm_scheduler.py
+"""
+Client-side quota for Groq calls, so a burst of uploads runs at the
+highest rate the account allows instead of turning into a burst of 429s.
+
+Two token buckets, refilled continuously:
+  - requests per minute: starts at LLM_MAX_RPM; a 429 cuts the rate by a
+    quarter, every success wins a little of it back (Groq's headers only
+    report the daily request limit, so the per-minute one has to be found)
+  - tokens per minute: starts at LLM_MAX_TPM, then follows the
+    x-ratelimit-limit-tokens / x-ratelimit-remaining-tokens headers
+
+Requests wait in a priority queue: a dry run the user is looking at goes
+ahead of a confirm upload, which goes ahead of batch and background jobs.
+Only the head of the queue draws from the buckets, so order is kept.
+Threads (run) and coroutines (run_async) share the same queue and buckets.
+
+A 429 (or 5xx / connection error) is retried with backoff. The wait comes
+from Retry-After when the server sends it, and after a 429 it applies to
+everyone, not just the request that hit it. A request that cannot get
+through within its max wait raises QuotaExhausted.
+
+The account's quota is one budget however many web workers there are, so
+with WEB_CONCURRENCY > 1 the buckets (and what was learned about the
+limits) live in SQLite, read and written back in one transaction each
+time a request takes quota. The queue stays per worker. That transaction
+can wait on the other workers' write locks, so it never runs with the
+queue's lock held, and coroutines run it on an io thread, off the loop.
+"""
+import re
+import json
+import time
+import asyncio
+import heapq
+import random
+import functools
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional, Dict, Any, Tuple
+
+import groq
+
+from backend.core.config import (
+    LLM_MAX_RPM, LLM_MAX_TPM, LLM_MAX_RETRIES, LLM_INTERACTIVE_MAX_WAIT, LLM_BATCH_MAX_WAIT, WEB_CONCURRENCY,
+)
+from backend.core.metrics import register_collector
+from backend.db import get_conn
+from backend.services.workers import io_pool
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
+
+PRIORITY_INTERACTIVE = 0  # /upload dry run: the preview the user is waiting for
+PRIORITY_UPLOAD = 1  # /upload confirm
+PRIORITY_BATCH = 2  # /upload/batch, /jobs
+
+# Groq's limits are per minute
+LIMIT_WINDOW = 60.0
+
+# How often an async request that others are ahead of checks the queue again
+ASYNC_POLL = 0.02
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_BACKOFF = 30.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class QuotaExhausted(Exception):
+    """No quota for this request within its max wait (it's been queued or retried that long)."""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Groq reset headers ("2m59.56s", "7.66s", "250ms") or Retry-After seconds, in seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    return sum(float(n) * _UNITS[unit] for n, unit in parts) if parts else None
+
+
+def is_rate_limit(e: Exception) -> bool:
+    return isinstance(e, QuotaExhausted) or getattr(e, "status_code", None) == 429
+
+
+def _is_retryable(e: Exception) -> bool:
+    return getattr(e, "status_code", None) in RETRY_STATUSES or isinstance(e, groq.APIConnectionError)
+
+
+class LLMScheduler:
+    def __init__(self, rpm: float, tpm: float, shared: bool = False):
+        """shared: keep the buckets in SQLite (llm_quota), one budget for every process."""
+        # _cond guards the queue and stats; _bucket_lock the buckets, and is held across their transaction
+        self._cond = threading.Condition()
+        self._bucket_lock = threading.Lock()
+        self._generation = 0  # bumped by every notify, so a waiter can't miss one while unlocked
+        self._queue = []
+        self._seq = itertools.count()
+        self.max_rpm = rpm
+        self.shared = shared
+        # Current rates and bucket levels; times are wall clock, so processes agree on them
+        self._b = {"rpm": rpm, "tpm": tpm, "requests": rpm, "tokens": tpm, "refilled_at": time.time(),
+                   "paused_until": 0.0}
+        self._stats = {"requests": 0, "waited": 0, "wait_ms": 0.0, "retries": 0, "rate_limited": 0,
+                       "quota_exhausted": 0}
+
+    # --- buckets -------------------------------------------------------
+
+    @contextmanager
+    def _buckets(self):
+        """
+        The bucket state, refilled up to now, to read and update. Shared: loaded
+        from llm_quota and written back in one transaction, which can block; never
+        call this with _cond held or on the event loop (see _offload).
+        """
+        with self._bucket_lock:
+            if not self.shared:
+                _refill(self._b, time.time())
+                yield self._b
+                return
+            conn = get_conn()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT state FROM llm_quota WHERE id = 1").fetchone()
+                b = json.loads(row["state"]) if row else dict(self._b)
+                _refill(b, time.time())
+                yield b
+                conn.execute(
+                    "INSERT INTO llm_quota (id, state) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET state = excluded.state",
+                    (json.dumps(b),),
+                )
+                conn.commit()
+                self._b = b
+            finally:
+                conn.close()
+
+    async def _offload(self, fn, *args):
+        """fn(*args) from a coroutine: on an io thread when it means a SQLite transaction."""
+        if not self.shared:
+            return fn(*args)
+        call = functools.partial(contextvars.copy_context().run, fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(io_pool(), call)
+
+    def _notify(self):
+        """With _cond held: wake the waiters (the next in line may be able to go now)."""
+        self._generation += 1
+        self._cond.notify_all()
+
+    def _turn(self, ticket):
+        """With _cond held: (whether `ticket` is first in line, the generation to wait on)."""
+        return self._queue[0] == ticket, self._generation
+
+    def _take(self, tokens: float) -> float:
+        """Take one request's quota if it fits now: 0, else the seconds until it would."""
+        with self._buckets() as b:
+            wait = _wait_for(b, time.time(), tokens)
+            if wait == 0:
+                b["requests"] -= 1
+                b["tokens"] -= min(tokens, b["tpm"])
+            return wait
+
+    def _took(self, ticket, t0: float):
+        """With _cond held: `ticket` has its quota, so it leaves the queue."""
+        self._leave(ticket)
+        now = time.monotonic()
+        self._stats["requests"] += 1
+        if now - t0 > 0.001:
+            self._stats["waited"] += 1
+            self._stats["wait_ms"] += (now - t0) * 1000
+
+    def _leave(self, ticket):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+        self._notify()
+
+    def _exhausted(self, t0: float, deadline: float) -> QuotaExhausted:
+        self._stats["quota_exhausted"] += 1
+        return QuotaExhausted(f"No LLM quota within {deadline - t0:.0f}s (429)")
+
+    def acquire(self, priority: int, tokens: float, deadline: float):
+        """Block until this request is first in line and fits the budget. Raises QuotaExhausted at deadline."""
+        t0 = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    first, generation = self._turn(ticket)
+                # only the head of the queue draws from the buckets, without holding _cond
+                wait = self._take(tokens) if first else None
+                with self._cond:
+                    if wait == 0:
+                        self._took(ticket, t0)
+                        return
+                    now = time.monotonic()
+                    if now >= deadline:
+                        raise self._exhausted(t0, deadline)
+                    if self._generation == generation:
+                        self._cond.wait(min(wait, deadline - now) if wait is not None else deadline - now)
+        finally:
+            with self._cond:
+                self._leave(ticket)
+
+    async def acquire_async(self, priority: int, tokens: float, deadline: float):
+        """acquire() for the event loop. Requests behind others poll every ASYNC_POLL seconds."""
+        t0 = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    first, _ = self._turn(ticket)
+                wait = await self._offload(self._take, tokens) if first else None
+                with self._cond:
+                    if wait == 0:
+                        self._took(ticket, t0)
+                        return
+                    now = time.monotonic()
+                    if now >= deadline:
+                        raise self._exhausted(t0, deadline)
+                await asyncio.sleep(min(wait if wait is not None else ASYNC_POLL, deadline - now))
+        finally:
+            with self._cond:
+                self._leave(ticket)
+
+    # --- learning ------------------------------------------------------
+
+    def observe(self, headers, rate_limited: bool = False):
+        """Adjust to what the server told us (x-ratelimit-* headers, 429s)."""
+        headers = headers or {}
+        with self._buckets() as b:
+            limit = headers.get("x-ratelimit-limit-tokens")
+            if limit:
+                b["tpm"] = float(limit)
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if remaining:
+                # requests still in flight aren't in our count yet, so never trust a higher figure
+                b["tokens"] = min(b["tokens"], float(remaining))
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                # the daily request quota is gone until its reset
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    b["paused_until"] = max(b["paused_until"], time.time() + reset)
+
+            if rate_limited:
+                b["rpm"] = max(1.0, b["rpm"] * 0.75)
+                b["requests"] = min(b["requests"], 0.0)
+            else:
+                b["rpm"] = min(self.max_rpm, b["rpm"] + self.max_rpm * 0.02)
+        with self._cond:
+            if rate_limited:
+                self._stats["rate_limited"] += 1
+            self._notify()
+
+    def pause(self, seconds: float):
+        with self._buckets() as b:
+            b["paused_until"] = max(b["paused_until"], time.time() + seconds)
+
+    # --- calls ---------------------------------------------------------
+
+    def _retry_delay(self, e: Exception, attempt: int, deadline: float) -> float:
+        """
+        Called with the failure of attempt `attempt`: re-raises it when it can't
+        be retried in time, else returns how long this caller should sleep
+        (0 after a 429, which pauses the whole queue instead).
+        """
+        if not _is_retryable(e) or attempt == LLM_MAX_RETRIES:
+            raise e
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        limited = getattr(e, "status_code", None) == 429
+        self.observe(headers, rate_limited=limited)
+        delay = parse_duration(headers.get("retry-after")) \
+            or min(MAX_BACKOFF, 2 ** attempt) * random.uniform(0.5, 1.0)
+        if time.monotonic() + delay > deadline:
+            raise e
+        with self._cond:
+            self._stats["retries"] += 1
+        logger.warning(f"LLM call failed ({e}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+        if limited:
+            # the quota is shared: hold back everyone, not just this request
+            self.pause(delay)
+            return 0.0
+        return delay
+
+    def _deadline(self, priority: int, max_wait: Optional[float]) -> float:
+        if max_wait is None:
+            max_wait = LLM_INTERACTIVE_MAX_WAIT if priority < PRIORITY_BATCH else LLM_BATCH_MAX_WAIT
+        return time.monotonic() + max_wait
+
+    def run(self, call: Callable[[], Tuple[Any, Dict[str, str]]], priority: int = PRIORITY_BATCH,
+            tokens: float = 0, max_wait: Optional[float] = None):
+        """
+        call() makes the API request and returns (result, response headers).
+        Retries rate limits, 5xx and connection errors within max_wait.
+        """
+        deadline = self._deadline(priority, max_wait)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.acquire(priority, tokens, deadline)
+            try:
+                result, headers = call()
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt, deadline))
+                continue
+            self.observe(headers)
+            return result
+
+    async def run_async(self, call: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]],
+                        priority: int = PRIORITY_BATCH, tokens: float = 0, max_wait: Optional[float] = None):
+        """run() for coroutines: call() is async and waiting for quota doesn't hold a thread."""
+        deadline = self._deadline(priority, max_wait)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self.acquire_async(priority, tokens, deadline)
+            try:
+                result, headers = await call()
+            except Exception as e:
+                await asyncio.sleep(await self._offload(self._retry_delay, e, attempt, deadline))
+                continue
+            await self._offload(self.observe, headers)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Shared buckets are reported as this process last saw them (no transaction per scrape)."""
+        with self._cond:
+            b = dict(self._b)
+            _refill(b, time.time())
+            out = dict(self._stats)
+            out.update(queued=len(self._queue), rpm=round(b["rpm"], 1), tpm=round(b["tpm"]),
+                       tokens_available=round(b["tokens"]))
+        out["wait_ms"] = round(out["wait_ms"], 1)
+        return out
+
+
+def _refill(b: Dict[str, float], now: float):
+    elapsed = max(0.0, now - b["refilled_at"])
+    b["refilled_at"] = now
+    b["requests"] = min(b["rpm"], b["requests"] + elapsed * b["rpm"] / LIMIT_WINDOW)
+    b["tokens"] = min(b["tpm"], b["tokens"] + elapsed * b["tpm"] / LIMIT_WINDOW)
+
+
+def _wait_for(b: Dict[str, float], now: float, tokens: float) -> float:
+    """Seconds until a request costing `tokens` fits in both buckets (0 = now)."""
+    waits = [b["paused_until"] - now]
+    if b["requests"] < 1:
+        waits.append((1 - b["requests"]) * LIMIT_WINDOW / max(b["rpm"], 1e-9))
+    # a request bigger than the whole budget goes through on a full bucket
+    need = min(tokens, b["tpm"])
+    if b["tokens"] < need:
+        waits.append((need - b["tokens"]) * LIMIT_WINDOW / max(b["tpm"], 1e-9))
+    return max(0.0, *waits)
+
+
+_scheduler = LLMScheduler(LLM_MAX_RPM, LLM_MAX_TPM, shared=WEB_CONCURRENCY > 1)
+
+
+def run(call, priority: int = PRIORITY_BATCH, tokens: float = 0, max_wait: Optional[float] = None):
+    return _scheduler.run(call, priority, tokens, max_wait)
+
+
+async def run_async(call, priority: int = PRIORITY_BATCH, tokens: float = 0, max_wait: Optional[float] = None):
+    return await _scheduler.run_async(call, priority, tokens, max_wait)
+
+
+def stats() -> Dict[str, Any]:
+    return _scheduler.stats()
+
+
+def _collect():
+    s = stats()
+    return [
+        ("invoice_llm_scheduler_queued", "gauge", "LLM requests waiting for quota", [({}, s["queued"])]),
+        ("invoice_llm_scheduler_rpm", "gauge", "Current requests-per-minute budget", [({}, s["rpm"])]),
+        ("invoice_llm_scheduler_tpm", "gauge", "Current tokens-per-minute budget", [({}, s["tpm"])]),
+        ("invoice_llm_scheduler_events_total", "counter", "Rate limiter retries, 429s and requests given up",
+         [({"event": name}, s[name]) for name in ("retries", "rate_limited", "quota_exhausted")]),
+    ]
+
+
+register_collector(_collect)
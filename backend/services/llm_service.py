@@ -7,51 +7,129 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-from groq import Groq
+from backend.services.llm_gateway import (
+    get_client, get_async_client, complete, complete_async, request_key, normalize_for_key,
+)
+from backend.services.llm_scheduler import PRIORITY_BATCH
+from backend.services import llm_scheduler
+from backend.services.field_extractor import prompt_excerpt
+from backend.utils.text_utils import estimate_tokens
+from backend.core.config import LLM_MODEL, LLM_PROMPT_TOKENS
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
 
 # Configure
 api_key = os.getenv("GROQ_API_KEY")
 
-def extract_invoice_data_with_llm(ocr_text: str) -> dict:
+# Part of every response cache key: bump it whenever the prompt, FIELD_SPECS
+# or the model settings change, so answers to the old prompt aren't served.
+PROMPT_VERSION = "1"
+SYSTEM_PROMPT = "You are a helpful data extraction assistant that outputs only valid JSON."
+
+# Room for the JSON answer in the token budget
+RESPONSE_TOKENS = 100
+
+FIELD_SPECS = {
+    "vendor": "vendor (store name)",
+    "date": "date (format YYYY_MM_DD, use today's year if missing)",
+    "amount": "amount (the final total paid, validation: number with up to 2 decimal places, no currency symbols)",
+}
+
+def _build_request(ocr_text: str, known_vendor: str = None):
+    """(cache key, create() kwargs, estimated tokens) for one extraction."""
+    # With a known vendor, only ask for what we still need
+    keys = ["date", "amount"] if known_vendor else ["vendor", "date", "amount"]
+    # Long statements: header, date and total regions only (see prompt_excerpt)
+    document = prompt_excerpt(ocr_text, LLM_PROMPT_TOKENS)
+    wanted = "\n        ".join(f"- {FIELD_SPECS[k]}" for k in keys)
+    prompt = f"""
+        Extract the following fields from the invoice/receipt text below:
+        {wanted}
+
+        Return ONLY a JSON object with keys: {", ".join(f'"{k}"' for k in keys)}.
+        If a field is not found, use "UNKNOWN".
+
+        Text:
+        {document}
+        """
+
+    kwargs = dict(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+    key = request_key(PROMPT_VERSION, LLM_MODEL, ",".join(keys), normalize_for_key(document))
+    tokens = estimate_tokens(SYSTEM_PROMPT + prompt) + RESPONSE_TOKENS
+    return key, kwargs, tokens
+
+
+def _result(raw: str, known_vendor: str = None) -> dict:
+    data = json.loads(raw)
+    if known_vendor:
+        data["vendor"] = known_vendor
+    return data
+
+
+def extract_invoice_data_with_llm(ocr_text: str, known_vendor: str = None, priority: int = PRIORITY_BATCH) -> dict:
     """
     Uses Groq (Llama 3) to extract structured data from raw OCR text.
+    known_vendor: already identified (services/vendor_index.py), so only date
+    and amount are asked for and the result carries this vendor.
+    priority: place in the rate limiter's queue (llm_scheduler.PRIORITY_*).
     Returns None if extraction fails or API is not configured.
     """
     if not api_key:
-        print("Groq API Key missing")
+        logger.warning("Groq API Key missing")
         return None
 
     try:
-        client = Groq(api_key=api_key)
-        
-        prompt = f"""
-        Extract the following fields from the invoice/receipt text below:
-        - vendor (store name)
-        - date (format YYYY_MM_DD, use today's year if missing)
-        - amount (the final total paid, validation: number with up to 2 decimal places, no currency symbols)
+        client = get_client()
+        key, kwargs, tokens = _build_request(ocr_text, known_vendor)
 
-        Return ONLY a JSON object with keys: "vendor", "date", "amount".
-        If a field is not found, use "UNKNOWN".
-
-        Text:
-        {ocr_text}
-        """
+        def request():
+            response = client.chat.completions.with_raw_response.create(**kwargs)
+            return response.parse().choices[0].message.content, response.headers
 
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a helpful data extraction assistant that outputs only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
+        def call():
+            raw = llm_scheduler.run(request, priority=priority, tokens=tokens)
+            json.loads(raw)  # never cache an answer we can't parse
+            return raw
 
-        raw = completion.choices[0].message.content
-        data = json.loads(raw)
-        return data
+        return _result(complete(key, call), known_vendor)
 
     except Exception as e:
-        print(f"LLM Extraction failed: {e}")
+        logger.warning(f"LLM Extraction failed: {e}")
         # Propagate rate limit or connection errors
         raise e
+
+
+async def extract_invoice_data_with_llm_async(ocr_text: str, known_vendor: str = None,
+                                              priority: int = PRIORITY_BATCH) -> dict:
+    """extract_invoice_data_with_llm on the event loop (AsyncGroq); same cache, quota and errors."""
+    if not api_key:
+        logger.warning("Groq API Key missing")
+        return None
+
+    try:
+        client = get_async_client()
+        key, kwargs, tokens = _build_request(ocr_text, known_vendor)
+
+        async def request():
+            response = await client.chat.completions.with_raw_response.create(**kwargs)
+            return response.parse().choices[0].message.content, response.headers
+
+        async def call():
+            raw = await llm_scheduler.run_async(request, priority=priority, tokens=tokens)
+            json.loads(raw)  # never cache an answer we can't parse
+            return raw
+
+        return _result(await complete_async(key, call), known_vendor)
+
+    except Exception as e:
+        logger.warning(f"LLM Extraction failed: {e}")
+        raise e
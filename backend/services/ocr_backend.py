@@ -0,0 +1,85 @@
+# backend/services/ocr_backend.py
+"""
+OCR backends. Each OCR worker process creates one backend at startup and
+keeps it for its whole life, so the Tesseract engine (and eng.traineddata)
+is loaded once per worker instead of once per page.
+
+  - TesserocrBackend: Tesseract C-API via tesserocr, engine stays initialized,
+    images go straight from memory to the engine.
+  - PytesseractBackend: fallback, spawns the tesseract binary per call.
+"""
+import os
+import pytesseract
+
+from backend.utils.logging_utils import get_logger
+
+OCR_LANG = "eng"
+TESS_CONFIG = "--oem 3 --psm 6"
+
+
+class OcrBackend:
+    name = "base"
+
+    def image_to_string(self, image) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OcrBackend):
+    name = "pytesseract"
+
+    def __init__(self):
+        # Configurable path via env, or default/system path
+        tess_env = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+        if os.path.exists(tess_env):
+            pytesseract.pytesseract.tesseract_cmd = tess_env
+
+    def image_to_string(self, image) -> str:
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config=TESS_CONFIG)
+
+
+class TesserocrBackend(OcrBackend):
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr  # optional dependency
+
+        # Same settings as TESS_CONFIG: --oem 3 (default engine), --psm 6 (single block)
+        self._api = tesserocr.PyTessBaseAPI(
+            lang=OCR_LANG,
+            oem=tesserocr.OEM.DEFAULT,
+            psm=tesserocr.PSM.SINGLE_BLOCK,
+        )
+
+    def image_to_string(self, image) -> str:
+        self._api.SetImage(image)
+        try:
+            return self._api.GetUTF8Text()
+        finally:
+            self._api.Clear()
+
+    def close(self):
+        self._api.End()
+
+
+BACKENDS = {
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+
+
+def create_backend(name: str = "auto") -> OcrBackend:
+    """
+    name: "auto" | "tesserocr" | "pytesseract".
+    "auto" prefers tesserocr and falls back to pytesseract if it isn't installed.
+    """
+    if name != "auto":
+        return BACKENDS[name]()
+
+    try:
+        return TesserocrBackend()
+    except Exception as e:
+        get_logger().warning(f"tesserocr unavailable ({e}), using pytesseract")
+        return PytesseractBackend()
@@ -1,49 +1,330 @@
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_path
+from PIL import Image, ImageFilter
 
-import os
+import io
+import math
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-# Configurable path via env, or default/system path
-tess_env = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
-if os.path.exists(tess_env):
-    pytesseract.pytesseract.tesseract_cmd = tess_env
-# On Linux/Cloud, if "tesseract" is in PATH, we might not need to set this at all, 
-# or we set TESSERACT_CMD=/usr/bin/tesseract
+from backend.core.config import (
+    OCR_BACKEND, OCR_WORKERS, OCR_MAX_INFLIGHT_PAGES, OCR_PDF_DEADLINE, OCR_PREPROCESS, OCR_TARGET_LINE_PX,
+    OCR_MAX_PIXELS,
+)
+from backend.services.ocr_backend import create_backend
+from backend.utils.logging_utils import get_logger
+
+import numpy as np
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+logger = get_logger()
+
+# --- OCR worker pool ---
+# One process pool for the whole app, created on first use. "spawn" avoids
+# forking a multi-threaded server process. Each worker builds its OCR
+# backend once (see ocr_backend.py) and reuses it for every image.
+_pool = None
+_pool_lock = threading.Lock()
+
+# Set inside each worker process by _init_worker
+_backend = None
+
+
+def _init_worker(backend_name: str):
+    global _backend
+    _backend = create_backend(backend_name)
+    logger.info(f"OCR worker ready (backend={_backend.name})")
+
+
+class _InlineExecutor:
+    """Executor-shaped stand-in that runs OCR in the calling process."""
+
+    def submit(self, fn, *args):
+        fut = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+
+def run_inline():
+    """
+    OCR in this process instead of the shared pool. Used by processes that
+    are themselves pool workers (e.g. search_backfill's) so we don't nest
+    process pools.
+    """
+    global _pool
+    with _pool_lock:
+        _pool = _InlineExecutor()
+    _init_worker(OCR_BACKEND)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        # a worker that died takes the whole executor with it: start a new one
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(OCR_BACKEND,),
+            )
+        return _pool
+
+
+def _ocr_page(pil_image) -> str:
+    """Runs inside a pool worker."""
+    if OCR_PREPROCESS:
+        pil_image = preprocess(pil_image)
+    try:
+        return _backend.image_to_string(pil_image)
+    except Exception as e:
+        # pytesseract's errors can't be unpickled in the parent, which would break the pool
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def _ocr_image_bytes(data: bytes) -> str:
+    """Runs inside a pool worker."""
+    with Image.open(io.BytesIO(data)) as img:
+        if OCR_PREPROCESS and img.format == "JPEG":
+            # let libjpeg decode a phone photo at 1/2, 1/4 or 1/8 size when that's all the text needs
+            factor = _photo_factor(data, img.width, img.height)
+            if factor < 0.5:
+                img.draft("L", (math.ceil(img.width * factor), math.ceil(img.height * factor)))
+        img.load()
+        return _ocr_page(img)
+
+
+# --- preprocessing ---
+# Tesseract's speed goes with the pixel count and its accuracy with the
+# text size, best at text lines of a few tens of pixels. So: measure the
+# line height on a thumbnail, scale the image to OCR_TARGET_LINE_PX (PDF
+# pages are rendered at that scale, photos are shrunk to it), straighten
+# it and binarize it against the local background.
+
+# Thumbnail size for the measurements, and the skew angles tried (degrees)
+_THUMB_PX = 1000
+_MAX_SKEW = 5.0
+
+
+def preprocess(img: Image.Image) -> Image.Image:
+    """Grayscale, downscale to the target text size, deskew, binarize."""
+    img = img.convert("L")
+    thumb = img.copy()
+    thumb.thumbnail((_THUMB_PX, _THUMB_PX))
+    angle, line_px = measure_page(np.asarray(thumb))
+
+    factor = 1.0
+    if line_px:
+        factor = min(1.0, OCR_TARGET_LINE_PX / (line_px * img.width / thumb.width))
+    factor = min(factor, math.sqrt(OCR_MAX_PIXELS / (img.width * img.height)))
+    if factor < 0.9:
+        img = img.resize((max(1, round(img.width * factor)), max(1, round(img.height * factor))),
+                         Image.BILINEAR, reducing_gap=2.0)
+    if abs(angle) >= 0.2:
+        img = img.rotate(-angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    return _binarize(img)
+
+
+def _photo_factor(data: bytes, width: int, height: int) -> float:
+    """preprocess()'s scale factor for a JPEG, measured on a 1/8 size decode."""
+    if width * height <= 4 * _THUMB_PX ** 2:
+        return 1.0
+    with Image.open(io.BytesIO(data)) as probe:
+        probe.draft("L", (width // 8, height // 8))
+        probe = probe.convert("L")
+        _, line_px = measure_page(np.asarray(probe))
+    factor = OCR_TARGET_LINE_PX / (line_px * width / probe.width) if line_px else 1.0
+    return min(1.0, factor, math.sqrt(OCR_MAX_PIXELS / (width * height)))
+
+
+def measure_page(gray: np.ndarray):
+    """
+    (skew in degrees counter-clockwise, text line height in pixels or None)
+    of a grayscale page. Every angle's row profile of the ink pixels is
+    built at once; the straight angle is the one whose profile is peakiest
+    (lines fall into few rows), and its runs of inked rows are the lines.
+    """
+    ink = gray < otsu_threshold(gray)
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0, None
+    if len(ys) > 50_000:
+        keep = np.random.default_rng(0).choice(len(ys), 50_000, replace=False)
+        ys, xs = ys[keep], xs[keep]
+
+    def profiles(angles):
+        rows = np.rint(ys[None, :] - xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+        rows -= rows.min()
+        height = int(rows.max()) + 1
+        rows += np.arange(len(angles))[:, None] * height
+        return np.bincount(rows.ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+
+    def best(angles):
+        counts = profiles(angles)
+        i = int(np.argmax((counts.astype(np.float64) ** 2).sum(axis=1)))
+        return angles[i], counts[i]
+
+    coarse, _ = best(np.arange(-_MAX_SKEW, _MAX_SKEW + 1e-9, 0.5))
+    angle, profile = best(np.arange(coarse - 0.5, coarse + 0.5 + 1e-9, 0.1))
+
+    # text rows: well above the speckle noise every row has
+    inked = profile > max(profile.max() * 0.1, 1)
+    edges = np.diff(np.concatenate(([0], inked.astype(np.int8), [0])))
+    heights = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    heights = heights[heights >= 2]
+    # rows = y - x*tan(a) lines up text turned counter-clockwise by -a
+    return -float(angle), (float(np.median(heights)) if len(heights) >= 3 else None)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / hist.sum()
+    mu = np.cumsum(hist * np.arange(256)) / hist.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.argmax(np.nan_to_num(between)))
+
+
+def _binarize(img: Image.Image, darker: float = 0.15) -> Image.Image:
+    """
+    Black where a pixel is `darker` below its neighbourhood's mean (Bradley):
+    copes with shadows and uneven lighting, unlike one global threshold.
+    """
+    local_mean = img.filter(ImageFilter.BoxBlur(max(8, img.width // 32)))
+    gray = np.asarray(img, dtype=np.uint16)
+    ink = gray * 100 < np.asarray(local_mean, dtype=np.uint16) * int(100 * (1 - darker))
+    return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
 
 
 def ocr_image(image_path: str) -> str:
-    img = Image.open(image_path)
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return get_pool().submit(_ocr_image_bytes, data).result()
 
-    text = pytesseract.image_to_string(
-        img,
-        lang="eng",
-        config="--oem 3 --psm 6"
-    )
-    return text
 
+# pdfium is not thread-safe, and /jobs and the text endpoint call it from
+# threads: every pdfium call (open, text layer, render) goes through this.
+pdfium_lock = threading.RLock()
+
+
+def _render_page(pdf, index: int):
+    with pdfium_lock:
+        page = pdf[index]
+        try:
+            scale = _render_scale(page) if OCR_PREPROCESS else 3
+            return _render(page, scale)
+        finally:
+            page.close()
 
-import pypdfium2 as pdfium
 
-def ocr_pdf(pdf_path: str) -> str:
+def _render(page, scale: float):
+    bitmap = page.render(scale=scale)
     try:
-        pdf = pdfium.PdfDocument(pdf_path)
-        full_text = []
-        for i in range(len(pdf)):
-            page = pdf[i]
-            # Render to image (scale=3 is roughly 200-300dpi, good for OCR)
-            bitmap = page.render(scale=3)
-            pil_image = bitmap.to_pil()
-            
-            text = pytesseract.image_to_string(
-                pil_image,
-                lang="eng",
-                config="--oem 3 --psm 6"
-            )
-            full_text.append(text)
-        
-        pdf.close() # Explicit close
-        return "\n".join(full_text)
+        # Grayscale is all Tesseract uses, and it's 3x smaller to ship to a worker
+        return bitmap.to_pil().convert("L")
+    finally:
+        bitmap.close()
+
+
+def _render_scale(page) -> float:
+    """
+    Render scale that puts text lines at OCR_TARGET_LINE_PX, from a 72 dpi
+    preview, within 1-4 (72-288 dpi) and OCR_MAX_PIXELS; 3 if there's no
+    measurable text. Never above the resolution of the page's scanned
+    image: that only adds pixels, not detail.
+    """
+    _, line_px = measure_page(np.asarray(_render(page, 1)))
+    scale = min(4.0, max(1.0, OCR_TARGET_LINE_PX / line_px)) if line_px else 3.0
+    width, height = page.get_size()
+    scale = min(scale, math.sqrt(OCR_MAX_PIXELS / (width * height)))
+    native = 0.0
+    for obj in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_IMAGE,)):
+        left, _, right, _ = obj.get_bounds()
+        if right - left > width / 2:
+            native = max(native, obj.get_px_size()[0] / (right - left))
+    return min(scale, max(native, 1.0)) if native else scale
+
+
+def ocr_pdf_pages(pdf, indices, deadline: float = None, results: dict = None) -> dict:
+    """
+    OCR the given pages of an open pypdfium2 document on the process pool;
+    returns {page index: text}, filled into `results` if given (so the caller
+    keeps the pages read before anything goes wrong).
+      - pages are rendered lazily, one at a time
+      - at most OCR_MAX_INFLIGHT_PAGES bitmaps exist at once
+      - a page that fails to render or OCR is logged and comes back as ""
+      - after `deadline` seconds (default OCR_PDF_DEADLINE) we stop; pages
+        that didn't finish are missing from the result
+    """
+    deadline = OCR_PDF_DEADLINE if deadline is None else deadline
+    stop_at = time.monotonic() + deadline
+    pool = get_pool()
+    results = {} if results is None else results
+    inflight = {}  # future -> page index
+    timed_out = False
+
+    def collect(timeout):
+        done, _ = wait(list(inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in done:
+            i = inflight.pop(fut)
+            try:
+                results[i] = fut.result()
+            except Exception as e:
+                logger.warning(f"OCR failed on page {i + 1}: {e}")
+                results[i] = ""
+        return bool(done)
+
+    try:
+        for i in indices:
+            # Backpressure: don't render ahead of the workers
+            while len(inflight) >= OCR_MAX_INFLIGHT_PAGES:
+                if not collect(max(0, stop_at - time.monotonic())):
+                    timed_out = True
+                    break
+            if timed_out or time.monotonic() >= stop_at:
+                timed_out = True
+                break
+            try:
+                image = _render_page(pdf, i)
+            except Exception as e:
+                logger.warning(f"Rendering page {i + 1} for OCR failed: {e}")
+                results[i] = ""
+                continue
+            inflight[pool.submit(_ocr_page, image)] = i
+
+        while inflight and not timed_out:
+            if not collect(max(0, stop_at - time.monotonic())):
+                timed_out = True
+    finally:
+        # On the deadline or an error: keep what already finished and drop the
+        # queued pages. A page running in a worker can't be stopped; it
+        # finishes there, unread.
+        if inflight:
+            collect(0)
+        for fut in inflight:
+            fut.cancel()
+
+    if timed_out:
+        logger.warning(f"OCR PDF deadline ({deadline}s) hit after {len(results)}/{len(indices)} pages")
+    return results
+
+
+def ocr_pdf(pdf_path: str, deadline: float = None) -> str:
+    """OCR every page of a scanned PDF (see ocr_pdf_pages); output keeps page order."""
+    results, n_pages = {}, 0
+    try:
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_path)
+            n_pages = len(pdf)
+        try:
+            ocr_pdf_pages(pdf, range(n_pages), deadline, results)
+        finally:
+            with pdfium_lock:
+                pdf.close() # Explicit close
     except Exception as e:
-        print(f"OCR PDF failed: {e}")
-        return ""
+        logger.warning(f"OCR PDF failed: {e}")
+    return "\n".join(results.get(i, "") for i in range(n_pages))
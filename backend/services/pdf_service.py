@@ -1,40 +1,210 @@
+import itertools
+from contextlib import contextmanager
+
+from backend.core.config import (
+    PAGE_TEXT_MIN_CHARS, OCR_MAX_INFLIGHT_PAGES, PDF_EARLY_EXIT_PAGES, PDF_MAX_PAGES, PDF_MAX_TEXT_CHARS,
+)
+from backend.core.metrics import PDF_PAGES
 from backend.utils.text_utils import normalize_text
-from backend.services.ocr_service import ocr_pdf
+from backend.utils.logging_utils import get_logger
+from backend.services.field_extractor import extract_fields
+from backend.services.ocr_service import ocr_pdf_pages, pdfium_lock
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+logger = get_logger()
+
+# Page objects that can hold printed text without a text layer (scans, outlined fonts)
+_GRAPHIC_OBJECTS = (pdfium_c.FPDF_PAGEOBJ_IMAGE, pdfium_c.FPDF_PAGEOBJ_PATH, pdfium_c.FPDF_PAGEOBJ_SHADING)
+
+# Long PDFs: read these first (vendor and date sit on the first page, the total on the last),
+# then the middle in steps of _CHECK_EVERY pages until the fields are found
+_HEAD_PAGES = 2
+_TAIL_PAGES = 2
+_CHECK_EVERY = 4
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
-    text_parts = []
+    return extract_text_from_pdf_with_method(pdf_path)[0]
+
+
+def extract_text_from_pdf_with_method(pdf_path: str):
+    """
+    (text, method): method is "text" (text layer only), "ocr" (every page
+    OCR'd), "hybrid" (some of each), "empty", or "pypdf" when pdfium can't
+    read the file.
+
+    PDFs over PDF_EARLY_EXIT_PAGES pages are read head and tail first and
+    stop once the regex extractor finds vendor, date and amount (or the
+    page / text budget runs out), so the text is only part of the document;
+    pdf_full_text() reads all of it.
+    """
+    try:
+        with _open_pdf(pdf_path) as pdf:
+            n_pages = len(pdf)
+            if n_pages > PDF_EARLY_EXIT_PAGES:
+                pages = _read_until_fields(pdf, n_pages)
+            else:
+                pages = [(t, m) for _, t, m in _read_pages(pdf, range(n_pages))]
+    except Exception as e:
+        logger.warning(f"pdfium could not read the PDF ({e}); trying pypdf")
+        return _extract_with_pypdf(pdf_path), "pypdf"
+
+    methods = {m for _, m in pages if m != "empty"}
+    method = methods.pop() if len(methods) == 1 else ("hybrid" if methods else "empty")
+    if method == "hybrid":
+        n_ocr = sum(1 for _, m in pages if m == "ocr")
+        logger.info(f"PDF has {n_ocr} image-only page(s) of {len(pages)}; OCR'd those only")
+    text = "\n\n".join(t for t, _ in pages if t.strip())
+    return normalize_text(text), method
 
-    # 1) pdfplumber first (best for structured PDFs)
+
+def extract_pdf_pages(pdf_path: str):
+    """[(text, method)] for every page (see _read_pages)."""
+    with _open_pdf(pdf_path) as pdf:
+        return [(t, m) for _, t, m in _read_pages(pdf, range(len(pdf)))]
+
+
+def iter_pdf_text(pdf_path: str):
+    """
+    Every page's text in order, read lazily: only OCR_MAX_INFLIGHT_PAGES
+    pages are held at a time. For the search index of long documents.
+    """
+    with _open_pdf(pdf_path) as pdf:
+        for _, text, _ in iter_pdf_pages(pdf, range(len(pdf))):
+            yield normalize_text(text)
+
+
+def pdf_full_text(pdf_path: str) -> str:
+    return "\n\n".join(t for t in iter_pdf_text(pdf_path) if t.strip())
+
+
+def is_long_pdf(pdf_path: str) -> bool:
+    """Whether extract_text_from_pdf_with_method reads only part of this PDF."""
     try:
-        import pdfplumber
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
-                if t.strip():
-                    text_parts.append(t)
-        joined = "\n\n".join(text_parts).strip()
-        if len(joined) > 30:
-            return normalize_text(joined)
+        with _open_pdf(pdf_path) as pdf:
+            return len(pdf) > PDF_EARLY_EXIT_PAGES
     except Exception:
-        pass
+        return False  # read whole by the pypdf fallback
+
+
+def iter_pdf_pages(pdf, indices, chunk: int = OCR_MAX_INFLIGHT_PAGES):
+    """(index, text, method) for the given pages of an open document, `chunk` pages at a time."""
+    indices = iter(indices)
+    while True:
+        batch = list(itertools.islice(indices, chunk))
+        if not batch:
+            return
+        yield from _read_pages(pdf, batch)
+
 
-    # 2) pypdf fallback
+@contextmanager
+def _open_pdf(pdf_path: str):
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        yield pdf
+    finally:
+        with pdfium_lock:
+            pdf.close()
+
+
+def _read_pages(pdf, indices):
+    """
+    [(index, text, method)] for the given pages of an open document:
+      text   the page's text layer has at least PAGE_TEXT_MIN_CHARS characters
+      ocr    it doesn't, but the page has images or drawings: OCR'd on the pool
+      empty  nothing on the page
+    OCR'd pages that fail or miss the deadline come back with "" as text.
+    """
+    pages, to_ocr = [], []
+    with pdfium_lock:
+        for i in indices:
+            text, method = _classify_page(pdf[i])
+            pages.append((i, text, method))
+            if method == "ocr":
+                to_ocr.append(i)
+
+    if to_ocr:
+        ocr_text = {}
+        try:
+            ocr_pdf_pages(pdf, to_ocr, results=ocr_text)
+        except Exception as e:
+            # keep the text-layer pages, and the pages OCR'd before the failure
+            logger.warning(f"OCR PDF failed: {e}")
+        pages = [(i, ocr_text.get(i, ""), m) if m == "ocr" else (i, t, m) for i, t, m in pages]
+
+    for _, _, method in pages:
+        PDF_PAGES.inc(method=method)
+    return pages
+
+
+def _read_until_fields(pdf, n_pages: int):
+    """
+    [(text, method)] for the pages of a long PDF that were read, in page
+    order: head and tail pages, then middle pages until vendor, date and
+    amount are found or PDF_MAX_PAGES / PDF_MAX_TEXT_CHARS is reached.
+    """
+    head = list(range(min(_HEAD_PAGES, n_pages)))
+    tail = list(range(max(len(head), n_pages - _TAIL_PAGES), n_pages))
+    middle = iter(range(len(head), n_pages - len(tail)))
+    read = {}
+    chars = 0
+
+    def over_budget():
+        return len(read) >= PDF_MAX_PAGES or chars >= PDF_MAX_TEXT_CHARS
+
+    indices = head + tail
+    reason = "end of document"
+    while indices:
+        for i, text, method in iter_pdf_pages(pdf, indices):
+            read[i] = (text, method)
+            chars += len(text)
+            if over_budget():
+                break
+        if _has_all_fields(read):
+            reason = "fields found"
+            break
+        if over_budget():
+            reason = "page/text budget"
+            break
+        indices = list(itertools.islice(middle, _CHECK_EVERY))
+
+    skipped = n_pages - len(read)
+    if skipped:
+        PDF_PAGES.inc(skipped, method="skipped")
+        logger.info(f"Read {len(read)}/{n_pages} pages of a long PDF ({reason})")
+    return [read[i] for i in sorted(read)]
+
+
+def _has_all_fields(read) -> bool:
+    fields = extract_fields("\n\n".join(read[i][0] for i in sorted(read)))
+    return all(fields[k] != "UNKNOWN" for k in ("vendor", "date", "amount"))
+
+
+def _classify_page(page):
+    """(text layer, method) for one page; the caller holds pdfium_lock."""
+    try:
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_range()
+        finally:
+            textpage.close()
+        if len(text.strip()) >= PAGE_TEXT_MIN_CHARS:
+            return text, "text"
+        if any(True for _ in page.get_objects(filter=_GRAPHIC_OBJECTS)):
+            return "", "ocr"
+        return text, ("text" if text.strip() else "empty")
+    finally:
+        page.close()
+
+
+def _extract_with_pypdf(pdf_path: str) -> str:
     try:
         from pypdf import PdfReader
         reader = PdfReader(pdf_path)
-        for p in reader.pages:
-            t = p.extract_text() or ""
-            if t.strip():
-                text_parts.append(t)
-        
-        candidate = normalize_text("\n\n".join(text_parts).strip())
-        # If we found substantial text, return it. Otherwise fall through.
-        if len(candidate) > 20:
-            return candidate
-    except Exception:
-        pass
-        
-    # 3) Fallback to OCR for scanned PDFs
-    return ocr_pdf(pdf_path)
-
+        return normalize_text("\n\n".join(t for t in (p.extract_text() or "" for p in reader.pages) if t.strip()))
+    except Exception as e:
+        logger.warning(f"pypdf could not read the PDF either: {e}")
+        return ""
@@ -0,0 +1,446 @@
+# backend/services/pipeline.py
+"""
+The upload pipeline, split into stages so /upload, /jobs and the batch
+endpoint all run the same logic:
+
+  1. extract_text     - PDF text / OCR (with extraction cache)
+  2. extract_fields   - LLM first, regex fallback (or user-provided fields);
+                        extract_fields_async for the event loop
+  3. build_naming     - normalize date, folder parts, final filename
+  4. store_file       - move into STORAGE_ROOT/year/month
+  5. upload_file_to_drive
+"""
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from backend.services.pdf_service import extract_text_from_pdf_with_method, is_long_pdf, pdf_full_text
+from backend.services.ocr_service import ocr_image
+from backend.services.llm_service import extract_invoice_data_with_llm, extract_invoice_data_with_llm_async
+from backend.services.llm_scheduler import PRIORITY_BATCH, is_rate_limit
+from backend.services.field_extractor import extract_fields as regex_extract_fields
+from backend.services.drive_service import upload_to_drive, upload_many_to_drive
+from backend.services.extraction_cache import get_cached, put_cached
+from backend.services.vendor_index import match_vendor
+from backend.services.workers import io_pool, full_text_pool
+from backend.utils.text_utils import normalize_text, normalize_date, safe_filename
+from backend.core.config import STORAGE_ROOT, VENDOR_SKIP_LLM
+from backend.core.storage import finalize
+from backend.db import insert_invoice, insert_invoices, index_invoice_texts
+from backend.core.metrics import (
+    STAGE_SECONDS, EXTRACT_SECONDS, REGEX_SECONDS, CACHE_LOOKUPS, FIELD_SOURCES, FALLBACKS,
+)
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
+
+ALLOWED_EXTENSIONS = [".pdf", ".png", ".jpg", ".jpeg"]
+
+
+class StageTimer:
+    """
+    Collects per-stage wall time in ms: `with timer.stage("extract_text"): ...`
+    (also observed in the invoice_stage_duration_seconds histogram).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.timings[name] = round(elapsed * 1000, 1)
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+
+class InvalidDocument(Exception):
+    """The file has no usable text (not an invoice, or unreadable)."""
+
+
+class RateLimited(Exception):
+    """The LLM quota was hit during a dry run, where we don't fall back to regex."""
+
+
+def extract_text(path: str, ext: str, content_hash: str):
+    """
+    Returns (text, cached) where cached is the extraction cache entry (or None).
+    Raises InvalidDocument if there's no usable text.
+    """
+    cached = get_cached(content_hash)
+    CACHE_LOOKUPS.inc(cache="extraction", result="hit" if cached else "miss")
+    if cached:
+        logger.info("Extraction cache hit, skipping text extraction.")
+        text = cached["text"]
+    else:
+        t0 = time.perf_counter()
+        if ext == ".pdf":
+            text, method = extract_text_from_pdf_with_method(path)
+        else:
+            text, method = ocr_image(path), "image_ocr"
+        EXTRACT_SECONDS.observe(time.perf_counter() - t0, method=method)
+
+        text = normalize_text(text)
+
+    if not text or len(text.strip()) < 10:
+        # loose check for images which might have less text
+        raise InvalidDocument("Invalid Image/PDF File")
+
+    if not cached:
+        put_cached(content_hash, text)
+
+    return text, cached
+
+
+def _fields_without_llm(text: str, cached: Optional[Dict[str, Any]], provided: Optional[Dict[str, str]]):
+    """
+    (fields, known_vendor): fields when no LLM call is needed (user-provided,
+    cached, or known vendor + regex with VENDOR_SKIP_LLM), else None and the
+    known vendor (or None) to tell the LLM about.
+    """
+    if provided and provided.get("vendor") and provided.get("date") and provided.get("amount"):
+        logger.info("Using provided fields from frontend, skipping LLM.")
+        FIELD_SOURCES.inc(source="provided")
+        return dict(provided), None
+
+    if cached and cached["fields"]:
+        logger.info("Extraction cache hit, skipping LLM.")
+        FIELD_SOURCES.inc(source="cache")
+        return cached["fields"], None
+
+    # A vendor we've seen before? Then the LLM only has to find date and amount
+    known = match_vendor(text)
+    known_vendor = known["vendor"] if known else None
+    if known:
+        logger.info(f"Known vendor {known_vendor!r} ({known['method']} match)")
+        if VENDOR_SKIP_LLM:
+            with REGEX_SECONDS.time(reason="known_vendor"):
+                fields = regex_extract_fields(text)
+            if fields["date"] != "UNKNOWN" and fields["amount"] != "UNKNOWN":
+                logger.info("Regex found date and amount, skipping LLM.")
+                FIELD_SOURCES.inc(source="known_vendor")
+                return {**fields, "vendor": known_vendor}, known_vendor
+    return None, known_vendor
+
+
+def _fields_after_llm(text: str, content_hash: str, fields: Optional[Dict[str, Any]],
+                      error: Optional[Exception], known_vendor: Optional[str], dry_run: bool) -> Dict[str, Any]:
+    """LLM result (or its error) -> fields: regex fallback, RateLimited for dry runs, cache write."""
+    rate_limited = False
+    if error is not None:
+        if is_rate_limit(error):
+            rate_limited = True
+            logger.warning("Rate limit hit, returning specific status.")
+        fields = None
+
+    if not fields:
+        if rate_limited and dry_run:
+            # We can't fallback because fallback sucks and confuses user
+            FALLBACKS.inc(kind="rate_limited")
+            raise RateLimited("AI Service Quota Exceeded. Please wait a moment.")
+
+        logger.warning("LLM failed or unconfigured, using Regex fallback")
+        FALLBACKS.inc(kind="regex")
+        FIELD_SOURCES.inc(source="regex_fallback")
+        with REGEX_SECONDS.time(reason="fallback"):
+            fields = regex_extract_fields(text)
+        if known_vendor:
+            fields["vendor"] = known_vendor
+        return fields
+
+    logger.info(f"LLM Extraction Success! {fields}")
+    FIELD_SOURCES.inc(source="llm")
+    put_cached(content_hash, text, fields)
+    return fields
+
+
+def extract_fields(text: str, content_hash: str, cached: Optional[Dict[str, Any]] = None,
+                   provided: Optional[Dict[str, str]] = None, dry_run: bool = False,
+                   priority: int = PRIORITY_BATCH) -> Dict[str, Any]:
+    """
+    provided: {"vendor", "date", "amount"} confirmed by the user, skips the LLM.
+    priority: llm_scheduler.PRIORITY_*, interactive requests get LLM quota first.
+    Raises RateLimited for dry runs that hit the LLM quota (after the
+    scheduler's retries).
+    """
+    fields, known_vendor = _fields_without_llm(text, cached, provided)
+    if fields:
+        return fields
+
+    # LLM First, Regex Fallback
+    error = None
+    try:
+        fields = extract_invoice_data_with_llm(text, known_vendor=known_vendor, priority=priority)
+    except Exception as e:
+        error = e
+    return _fields_after_llm(text, content_hash, fields, error, known_vendor, dry_run)
+
+
+async def extract_fields_async(text: str, content_hash: str, cached: Optional[Dict[str, Any]] = None,
+                               provided: Optional[Dict[str, str]] = None, dry_run: bool = False,
+                               priority: int = PRIORITY_BATCH) -> Dict[str, Any]:
+    """
+    extract_fields for the event loop: no thread is held while the LLM call
+    (or its quota) is awaited. The work before and after it (vendor index,
+    regex, cache) runs on the io pool.
+    """
+    loop = asyncio.get_running_loop()
+    fields, known_vendor = await loop.run_in_executor(
+        io_pool(), contextvars.copy_context().run, _fields_without_llm, text, cached, provided
+    )
+    if fields:
+        return fields
+
+    error = None
+    try:
+        fields = await extract_invoice_data_with_llm_async(text, known_vendor=known_vendor, priority=priority)
+    except Exception as e:
+        error = e
+    return await loop.run_in_executor(
+        io_pool(), contextvars.copy_context().run,
+        _fields_after_llm, text, content_hash, fields, error, known_vendor, dry_run
+    )
+
+
+def build_naming(fields: Dict[str, Any], ext: str, original_filename: str,
+                 use_custom_name: bool = False) -> Dict[str, str]:
+    vendor_raw = str(fields.get("vendor", "UNKNOWN"))
+    date_raw = str(fields.get("date", "UNKNOWN"))
+    amount_raw = str(fields.get("amount", "UNKNOWN"))
+
+    # Normalize date (ALWAYS safe)
+    date_norm = date_raw
+    if date_norm != "UNKNOWN":
+        if not (len(date_norm) == 10 and date_norm[4] == "_" and date_norm[7] == "_"):
+            date_norm = normalize_date(date_raw)
+    else:
+        date_norm = "UNKNOWN"
+
+    # Folder parts from date_norm
+    date_pretty = date_raw
+    if date_norm != "UNKNOWN":
+        try:
+            parsed = datetime.strptime(date_norm, "%Y_%m_%d")
+            year = parsed.strftime("%Y")
+            month = parsed.strftime("%B")  # Use full month name (e.g., "January")
+            day = parsed.strftime("%d")
+            date_pretty = parsed.strftime("%d %B %Y")
+        except Exception:
+            year = month = "unknown"
+            day = "unknown"
+            date_norm = "UNKNOWN"
+    else:
+        year = month = day = "unknown"
+
+    # Auto-generated name: dd Month YYYY_Vendor_Amount.pdf
+    safe_vendor = safe_filename(vendor_raw)
+    safe_amount = safe_filename(amount_raw)
+    date_part = date_pretty if date_norm != "UNKNOWN" else "UNKNOWN"
+    auto_filename = f"{date_part}_{safe_vendor}_{safe_amount}{ext}"
+
+    if use_custom_name:
+        # Respect user's custom name, minus any path components
+        final_filename = os.path.basename(original_filename)
+    else:
+        final_filename = auto_filename
+
+    return {
+        "vendor_raw": vendor_raw,
+        "date_raw": date_raw,
+        "amount_raw": amount_raw,
+        "date_norm": date_norm,
+        "date_pretty": date_pretty,
+        "year": year,
+        "month": month,
+        "day": day,
+        "safe_vendor": safe_vendor,
+        "safe_amount": safe_amount,
+        "final_filename": final_filename,
+        "predicted_filename": auto_filename,  # Always suggest the auto-name in dry run
+    }
+
+
+def store_file(temp_path: str, naming: Dict[str, str]) -> str:
+    final_path = os.path.join(STORAGE_ROOT, naming["year"], naming["month"], naming["final_filename"])
+    return finalize(temp_path, final_path)
+
+
+def upload_file_to_drive(final_path: str, naming: Dict[str, str], creds_json) -> Optional[Dict[str, str]]:
+    """Drive failures are not fatal, the file is already stored locally."""
+    try:
+        return upload_to_drive(
+            local_path=final_path,
+            year=naming["year"],
+            month=naming["month"],
+            day=naming["day"],
+            creds_json=creds_json
+        )
+    except Exception as e:
+        logger.warning(f"Drive upload failed: {e}")
+        FALLBACKS.inc(kind="drive")
+        return None
+
+
+def upload_files_to_drive(entries, creds_json):
+    """
+    Bulk version of upload_file_to_drive for several stored files.
+    entries: [(final_path, naming)]. Returns drive links (or None) per entry.
+    """
+    outcomes = upload_many_to_drive([{
+        "local_path": final_path,
+        "year": naming["year"],
+        "month": naming["month"],
+        "day": naming["day"],
+    } for final_path, naming in entries], creds_json)
+
+    links = []
+    for (final_path, _), outcome in zip(entries, outcomes):
+        if outcome["status"] == "success":
+            links.append({"file_link": outcome["file_link"], "folder_link": outcome["folder_link"]})
+        else:
+            logger.warning(f"Drive upload failed for {final_path}: {outcome['error']}")
+            FALLBACKS.inc(kind="drive")
+            links.append(None)
+    return links
+
+
+def invoice_record(original_filename: str, content_hash: str, timer: StageTimer,
+                   naming: Optional[Dict[str, str]] = None, final_path: Optional[str] = None,
+                   drive_links: Optional[Dict[str, str]] = None, error: Optional[str] = None,
+                   text: Optional[str] = None, image_hash: Optional[Dict[str, Any]] = None,
+                   owner: Optional[str] = None, vendor_confirmed: bool = False) -> Dict[str, Any]:
+    """
+    Row for db.insert_invoice(s) describing one processed upload; text feeds
+    the search index, image_hash (duplicates.check_file) the photo index.
+    owner is drive_service.account_key of the uploader; vendor_confirmed says
+    the user supplied or reviewed the vendor, so the vendor index may learn it.
+    """
+    naming = naming or {}
+    return {
+        "original_filename": original_filename,
+        "stored_path": final_path,
+        "drive_link": drive_links.get("file_link") if drive_links else None,
+        "vendor_raw": naming.get("vendor_raw"),
+        "vendor_norm": naming.get("safe_vendor"),
+        "date_raw": naming.get("date_raw"),
+        "date_norm": naming.get("date_norm"),
+        "amount_raw": naming.get("amount_raw"),
+        "amount_norm": naming.get("safe_amount"),
+        "status": "failed" if error else "success",
+        "error": error,
+        "content_hash": content_hash,
+        "timings": timer.timings,
+        "total_ms": timer.total_ms(),
+        "text": text,
+        "image_hash": image_hash,
+        "owner": owner,
+        "vendor_confirmed": vendor_confirmed,
+    }
+
+
+def _partial_text(record: Dict[str, Any]) -> bool:
+    """Whether the row's text is only the pages its upload read (a long PDF, see pdf_service)."""
+    path = record.get("stored_path")
+    return bool(record.get("text") and path and path.lower().endswith(".pdf") and is_long_pdf(path))
+
+
+def insert_records(records: List[Dict[str, Any]]):
+    """
+    db.insert_invoices for invoice_record rows. A long PDF's row goes in
+    without its partial text, and index_full_text indexes every page in the
+    background. If that's cut short (a restart), the row has no search
+    entry, which is what search_backfill picks up.
+    """
+    full, partial = [], []
+    for r in records:
+        (partial if _partial_text(r) else full).append(r)
+    insert_invoices(full)
+    for r in partial:
+        invoice_id = insert_invoice({**r, "text": None})
+        full_text_pool().submit(contextvars.copy_context().run, index_full_text,
+                                invoice_id, r["stored_path"], r.get("vendor_raw"), r.get("original_filename"))
+
+
+def index_full_text(invoice_id: int, path: str, vendor_raw: Optional[str], original_filename: Optional[str]):
+    """Search-index every page of a stored PDF (see insert_records)."""
+    try:
+        text = pdf_full_text(path)
+        index_invoice_texts([{"id": invoice_id, "vendor_raw": vendor_raw,
+                              "original_filename": original_filename, "text": text}])
+    except Exception as e:
+        logger.warning(f"Full-text indexing of {path} failed, search_backfill will retry it: {e}")
+
+
+def dry_run_response(naming: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "status": "dry_run",
+        "fields": {
+            "vendor": naming["vendor_raw"],
+            "date": naming["date_pretty"],
+            "amount": naming["amount_raw"]
+        },
+        "predicted_filename": naming["predicted_filename"],
+        "detail": "Analysis complete. File not saved."
+    }
+
+
+def success_response(naming: Dict[str, str], final_path: str, drive_links: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "fields": {
+            "vendor": naming["vendor_raw"],
+            "date": naming["date_pretty"],
+            "amount": naming["amount_raw"]
+        },
+        "normalized": {
+            "vendor": naming["safe_vendor"],
+            "date": naming["date_norm"],
+            "amount": naming["safe_amount"]
+        },
+        "stored_at": final_path,
+        "drive_link": drive_links.get("folder_link") if drive_links else None,
+        "file_link": drive_links.get("file_link") if drive_links else None,
+        "drive_link_clickable": drive_links.get("folder_link") if drive_links else None
+    }
+
+
+def duplicate_response(duplicate: Dict[str, Any]) -> Dict[str, Any]:
+    """The upload matched an earlier one (duplicates.check_file / check_fields)."""
+    inv = duplicate["invoice"]
+    return {
+        "status": "duplicate",
+        "match": duplicate["match"],
+        "fields": {
+            "vendor": inv["vendor_raw"],
+            "date": inv["date_raw"],
+            "amount": inv["amount_raw"]
+        },
+        "duplicate_of": {
+            "id": inv["id"],
+            "uploaded_at": inv["created_at"],
+            "original_filename": inv["original_filename"],
+            "stored_at": inv["stored_path"],
+            "file_link": inv["drive_link"],
+        },
+        "detail": f"Already uploaded as {os.path.basename(inv['stored_path'] or inv['original_filename'] or '')} "
+                  f"on {(inv['created_at'] or '')[:10]}"
+    }
+
+
+def rate_limit_response(original_filename: str) -> Dict[str, Any]:
+    return {
+        "status": "rate_limit",
+        "detail": "AI Service Quota Exceeded. Please wait a moment.",
+        "predicted_filename": f"WAIT_RETRY_{original_filename}"
+    }
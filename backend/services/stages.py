@@ -0,0 +1,156 @@
+# backend/services/stages.py
+"""
+The stages /upload and /upload/batch run on the event loop, each with its
+own concurrency limit and executor, so a slow stage queues on its own
+instead of taking threads from the others:
+
+  save            request body -> temp file       io threads
+  fingerprint     photo hash for duplicates       OCR processes
+  extract_text    PDF text / OCR                  extraction threads, OCR pool
+  extract_fields  LLM (async HTTP), regex         event loop
+  store           move into STORAGE_ROOT          io threads
+  drive           Drive upload                    drive threads
+  record          invoices row, duplicate lookups io threads
+
+Every stage keeps counters and recent queue-wait / run-time samples;
+stats() reports them (GET /pipeline/stats, and as gauges on GET /metrics).
+
+Work handed to threads runs in a copy of the caller's context, so the
+request id stays on its log lines; work sent to a process pool gets the
+request id passed along and sends back the metrics it recorded.
+"""
+import time
+import asyncio
+import weakref
+import functools
+import traceback
+import contextvars
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Dict, Any
+
+from backend.services.workers import extract_pool, io_pool, drive_pool
+from backend.services.ocr_service import get_pool as ocr_pool
+from backend.core import metrics
+from backend.core.config import EXTRACT_WORKERS, IO_WORKERS, DRIVE_WORKERS, LLM_CONCURRENCY, OCR_WORKERS
+from backend.utils.logging_utils import request_id_var
+
+# Latency samples kept per stage for the percentiles
+STAGE_SAMPLES = 1000
+
+
+def _percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 1)
+
+
+def _in_worker(request_id: str, fn, args, kwargs):
+    """Runs in a pool process: (ok, result or exception, metrics recorded meanwhile)."""
+    request_id_var.set(request_id)
+    try:
+        out = True, fn(*args, **kwargs)
+    except Exception as e:
+        e.add_note(traceback.format_exc())  # the worker-side traceback, for the parent's logs
+        out = False, e
+    return out + (metrics.drain(),)
+
+
+class Stage:
+    def __init__(self, name: str, limit: int, executor: Optional[Callable] = None):
+        """executor: returns the pool sync functions run on; coroutine functions run on the loop."""
+        self.name = name
+        self.limit = limit
+        self.executor = executor
+        # asyncio primitives belong to one loop (tests start a loop per request)
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.queued = self.active = self.done = self.errors = 0
+        self._waits = deque(maxlen=STAGE_SAMPLES)
+        self._runs = deque(maxlen=STAGE_SAMPLES)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return sem
+
+    async def run(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        self.queued += 1
+        async with self._semaphore():
+            self.queued -= 1
+            self.active += 1
+            t1 = time.perf_counter()
+            metrics.STAGE_QUEUE_SECONDS.observe(t1 - t0, stage=self.name)
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    return await fn(*args, **kwargs)
+                loop = asyncio.get_running_loop()
+                executor = self.executor()
+                if isinstance(executor, ProcessPoolExecutor):
+                    ok, result, recorded = await loop.run_in_executor(
+                        executor, _in_worker, request_id_var.get(), fn, args, kwargs
+                    )
+                    metrics.merge(recorded)
+                    if not ok:
+                        raise result
+                    return result
+                call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+                return await loop.run_in_executor(executor, call)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.active -= 1
+                self.done += 1
+                self._waits.append(t1 - t0)
+                self._runs.append(time.perf_counter() - t1)
+
+    def stats(self) -> Dict[str, Any]:
+        waits, runs = list(self._waits), list(self._runs)
+        return {
+            "limit": self.limit,
+            "queued": self.queued,
+            "active": self.active,
+            "done": self.done,
+            "errors": self.errors,
+            "wait_p50_ms": _percentile(waits, 0.5),
+            "wait_p99_ms": _percentile(waits, 0.99),
+            "run_p50_ms": _percentile(runs, 0.5),
+            "run_p99_ms": _percentile(runs, 0.99),
+        }
+
+
+STAGES = {
+    "save": Stage("save", IO_WORKERS, io_pool),
+    "fingerprint": Stage("fingerprint", OCR_WORKERS, ocr_pool),
+    "extract_text": Stage("extract_text", EXTRACT_WORKERS, extract_pool),
+    "extract_fields": Stage("extract_fields", LLM_CONCURRENCY),
+    "store": Stage("store", IO_WORKERS, io_pool),
+    "drive": Stage("drive", DRIVE_WORKERS, drive_pool),
+    "record": Stage("record", IO_WORKERS, io_pool),
+}
+
+
+def stage(name: str) -> Stage:
+    return STAGES[name]
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: s.stats() for name, s in STAGES.items()}
+
+
+def _collect():
+    return [
+        ("invoice_stage_queued", "gauge", "Documents waiting for a pipeline stage",
+         [({"stage": name}, s.queued) for name, s in STAGES.items()]),
+        ("invoice_stage_active", "gauge", "Documents in a pipeline stage",
+         [({"stage": name}, s.active) for name, s in STAGES.items()]),
+        ("invoice_stage_errors_total", "counter", "Pipeline stage calls that raised",
+         [({"stage": name}, s.errors) for name, s in STAGES.items()]),
+    ]
+
+
+metrics.register_collector(_collect)
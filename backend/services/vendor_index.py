@@ -0,0 +1,159 @@
+# backend/services/vendor_index.py
+"""
+Learned vendor dictionary. Every successful upload whose vendor the user
+confirmed counts it in the `vendors` table (db._learn_vendors); this module
+keeps those vendors in memory and looks for one of them in the header of a
+new document:
+
+  - exact:  a header line, or a run of words at the start of one, is a
+            known vendor key (token trie, longest match)
+  - fuzzy:  a header line is close to a known key (OCR typos), found via
+            a character-trigram index and confirmed with difflib
+
+A match lets extract_fields skip the vendor part of the LLM prompt (or the
+LLM altogether, with VENDOR_SKIP_LLM). The index is rebuilt from SQLite
+every VENDOR_INDEX_REFRESH seconds, so vendors learned by other workers
+show up too.
+"""
+import re
+import time
+import difflib
+import threading
+from collections import defaultdict
+from typing import Optional, Dict, Any, List
+
+from backend.db import load_vendors
+from backend.utils.text_utils import normalize_text, vendor_key, LEGAL_SUFFIXES
+from backend.services.field_extractor import STOP_VENDOR_WORDS
+from backend.core.config import VENDOR_INDEX_REFRESH, VENDOR_MIN_USES, VENDOR_FUZZY_RATIO
+
+# Vendor names are printed at the top
+VENDOR_HEADER_LINES = 8
+HEADER_CHARS = 4000
+
+# Fuzzy matching only looks at this many best trigram candidates
+FUZZY_CANDIDATES = 5
+
+# A prefix match must cover this much of its line ("Cafe" on a long line doesn't count)
+MIN_LINE_COVERAGE = 0.5
+
+_LEGAL_SUFFIX = "|".join(sorted(LEGAL_SUFFIXES))
+
+
+def _name_ends_after(line: str, key: str) -> bool:
+    """
+    Whether the vendor name on `line` stops after `key`: "Swiggy - HSR Layout",
+    "Swiggy Pvt. Ltd., MG Road" or "Swiggy #42" do, "Swiggy Instamart" doesn't
+    (that may well be a vendor we haven't seen yet).
+    """
+    words = r"[\W_]+".join(re.escape(w) for w in key.split())
+    pattern = rf"[\W_]*{words}(?:[\s.]+(?:{_LEGAL_SUFFIX})\b\.?)*\s*(?:$|[-,|(:#/@]|\d)"
+    return re.match(pattern, line.lower()) is not None
+
+
+def _trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VendorIndex:
+    def __init__(self, vendors: List[Dict[str, Any]]):
+        self._trie = {}
+        self._names = {}
+        self._by_trigram = defaultdict(list)
+        for v in vendors:
+            key = v["key"]
+            # "TAX INVOICE" once came back as a vendor; never match on words like that
+            if len(key) < 3 or all(w in STOP_VENDOR_WORDS for w in key.split()):
+                continue
+            self._names[key] = v["name"]
+            node = self._trie
+            for word in key.split():
+                node = node.setdefault(word, {})
+            node[""] = key  # "" marks the end of a key; words are never empty
+            for gram in _trigrams(key):
+                self._by_trigram[gram].append(key)
+
+    def _longest_prefix(self, words: List[str]) -> Optional[str]:
+        node, found = self._trie, None
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                break
+            found = node.get("", found)
+        return found
+
+    def _fuzzy(self, key: str):
+        counts = defaultdict(int)
+        for gram in _trigrams(key):
+            for cand in self._by_trigram.get(gram, ()):
+                counts[cand] += 1
+        best, best_ratio = None, 0.0
+        for cand in sorted(counts, key=counts.get, reverse=True)[:FUZZY_CANDIDATES]:
+            ratio = difflib.SequenceMatcher(None, key, cand).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = cand, ratio
+        return best, best_ratio
+
+    def match(self, header_lines: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        header_lines: the first non-empty lines of the document.
+        Returns {"vendor", "key", "method", "score"} for a confident match, else None.
+        """
+        if not self._names:
+            return None
+        fuzzy = None
+        for line in _with_label_values(header_lines):
+            key = vendor_key(line)
+            if not key:
+                continue
+            words = key.split()
+            found = self._longest_prefix(words)
+            if found == key:
+                return {"vendor": self._names[found], "key": found, "method": "exact", "score": 1.0}
+            if found and len(found) / len(key) >= MIN_LINE_COVERAGE and _name_ends_after(line, found):
+                return {"vendor": self._names[found], "key": found,
+                        "method": "prefix", "score": round(len(found) / len(key), 3)}
+            if fuzzy is None and len(key) >= 4:
+                cand, ratio = self._fuzzy(key)
+                if cand and ratio >= VENDOR_FUZZY_RATIO:
+                    fuzzy = {"vendor": self._names[cand], "key": cand, "method": "fuzzy", "score": round(ratio, 3)}
+        # an exact hit further down beats a fuzzy one near the top
+        return fuzzy
+
+
+def _with_label_values(lines: List[str]):
+    # "Merchant: Blue Tokai" -> also try "Blue Tokai"
+    for line in lines:
+        yield line
+        if ":" in line:
+            yield line.split(":", 1)[1]
+
+
+_index = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index() -> VendorIndex:
+    global _index, _loaded_at
+    if _index is None or time.monotonic() - _loaded_at > VENDOR_INDEX_REFRESH:
+        with _lock:
+            if _index is None or time.monotonic() - _loaded_at > VENDOR_INDEX_REFRESH:
+                _index = VendorIndex(load_vendors(VENDOR_MIN_USES))
+                _loaded_at = time.monotonic()
+    return _index
+
+
+def match_vendor(text: str) -> Optional[Dict[str, Any]]:
+    """Known vendor in the document header, or None."""
+    if not text:
+        return None
+    header = []
+    for ln in normalize_text(text[:HEADER_CHARS]).splitlines():
+        ln = ln.strip()
+        if ln:
+            header.append(ln)
+            if len(header) == VENDOR_HEADER_LINES:
+                break
+    return get_index().match(header)
@@ -0,0 +1,135 @@
+# backend/services/web_workers.py
+"""
+What the uvicorn worker processes (WEB_CONCURRENCY) know about each other,
+kept in SQLite since that is the one thing they all open.
+
+Every worker has a row in web_workers that its heartbeat thread refreshes
+every WORKER_HEARTBEAT seconds; with several workers the row also carries
+the worker's metrics snapshot, and GET /metrics sums them, so a scrape
+that lands on any worker sees the whole server. Collector gauges (stage
+queues, the LLM limiter) stay per worker, with a worker label.
+
+A worker silent for WORKER_TIMEOUT is taken as gone: its counters are
+folded into the "retired" row, so totals never go backwards, and the job
+items it was running become claimable again (job_queue).
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from typing import Callable, Iterable, List
+
+from backend.core import metrics
+from backend.core.config import WEB_CONCURRENCY, WORKER_HEARTBEAT, WORKER_TIMEOUT
+from backend.db import get_conn
+from backend.utils.logging_utils import get_logger
+
+logger = get_logger()
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+RETIRED = "retired"
+
+# Only worth publishing when there is more than one worker to add up
+SHARE_METRICS = WEB_CONCURRENCY > 1
+
+_started_at = time.time()
+_hooks: List[Callable] = []
+_thread = None
+
+
+def start(on_beat: Iterable[Callable] = ()):
+    """Register this worker and start its heartbeat; on_beat functions run after every beat."""
+    global _thread
+    _hooks.extend(on_beat)
+    if _thread is None:
+        beat()
+        _thread = threading.Thread(target=_loop, name="heartbeat", daemon=True)
+        _thread.start()
+        logger.info(f"Web worker {WORKER_ID} started ({WEB_CONCURRENCY} configured)")
+
+
+def _loop():
+    while True:
+        time.sleep(WORKER_HEARTBEAT)
+        for fn in [beat] + _hooks:
+            try:
+                fn()
+            except Exception as e:
+                logger.warning(f"Heartbeat task {getattr(fn, '__name__', fn)} failed: {e}")
+
+
+def live_cutoff() -> float:
+    """Workers with a heartbeat at or after this time are alive."""
+    return time.time() - WORKER_TIMEOUT
+
+
+def beat():
+    """Refresh this worker's row (and metrics snapshot), and retire workers that have gone quiet."""
+    now = time.time()
+    snapshot = None
+    if SHARE_METRICS:
+        families, _ = metrics.collect()
+        snapshot = json.dumps({"values": metrics.snapshot(), "families": families})
+    conn = get_conn()
+    try:
+        conn.execute("""
+        INSERT INTO web_workers (id, pid, started_at, heartbeat_at, metrics) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, metrics = excluded.metrics
+        """, (WORKER_ID, os.getpid(), _started_at, now, snapshot))
+        conn.commit()
+        _retire(conn, live_cutoff())
+    finally:
+        conn.close()
+
+
+def _retire(conn, cutoff: float):
+    conn.execute("BEGIN IMMEDIATE")
+    dead = conn.execute(
+        "SELECT id, metrics FROM web_workers WHERE id != ? AND heartbeat_at < ?", (RETIRED, cutoff)
+    ).fetchall()
+    if not dead:
+        conn.rollback()
+        return
+    retired = conn.execute("SELECT metrics FROM web_workers WHERE id = ?", (RETIRED,)).fetchone()
+    values = metrics.combine(json.loads(r["metrics"])["values"] for r in [retired, *dead] if r and r["metrics"])
+    snapshot = json.dumps({"values": {name: [[list(k), v] for k, v in vals.items()] for name, vals in values.items()}})
+    conn.execute("""
+    INSERT INTO web_workers (id, started_at, metrics) VALUES (?, 0, ?)
+    ON CONFLICT(id) DO UPDATE SET metrics = excluded.metrics
+    """, (RETIRED, snapshot))
+    conn.executemany("DELETE FROM web_workers WHERE id = ?", [(r["id"],) for r in dead])
+    conn.commit()
+    logger.info(f"Retired {len(dead)} silent web worker(s): {', '.join(r['id'] for r in dead)}")
+
+
+def render_metrics() -> str:
+    """
+    GET /metrics for the whole server: counters and histograms summed over
+    every worker, live or retired; collector families per live worker.
+    """
+    if not SHARE_METRICS:
+        return metrics.render()
+    beat()  # this worker's figures as of now
+    conn = get_conn()
+    try:
+        rows = conn.execute("SELECT id, pid, heartbeat_at, metrics FROM web_workers").fetchall()
+    finally:
+        conn.close()
+
+    cutoff = live_cutoff()
+    snapshots, families, live = [], {}, 0
+    for r in rows:
+        if not r["metrics"]:
+            continue
+        data = json.loads(r["metrics"])
+        snapshots.append(data["values"])
+        if r["id"] == RETIRED or r["heartbeat_at"] < cutoff:
+            continue
+        live += 1
+        for name, kind, help, samples in data["families"]:
+            family = families.setdefault(name, (name, kind, help, []))
+            family[3].extend(({**labels, "worker": str(r["pid"])}, value) for labels, value in samples)
+    families["invoice_web_workers"] = ("invoice_web_workers", "gauge", "Live web worker processes", [({}, live)])
+    return metrics.render(metrics.combine(snapshots), list(families.values()))
@@ -0,0 +1,54 @@
+# backend/services/workers.py
+"""
+Shared executors:
+  - extraction pool: threads that read PDFs with pdfium and hand OCR to
+    the OCR process pool (ocr_service), which spreads a scan's pages
+    over its workers
+  - io pool: threads for file moves and SQLite writes
+  - drive pool: threads for Drive uploads
+  - full-text pool: background threads reading long PDFs in full for the
+    search index
+All are created on first use.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.core.config import EXTRACT_WORKERS, IO_WORKERS, DRIVE_WORKERS, FULL_TEXT_WORKERS
+
+_lock = threading.Lock()
+_extract_pool = None
+_io_pool = None
+_drive_pool = None
+_full_text_pool = None
+
+
+def extract_pool() -> ThreadPoolExecutor:
+    global _extract_pool
+    with _lock:
+        if _extract_pool is None:
+            _extract_pool = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS, thread_name_prefix="extract")
+        return _extract_pool
+
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+        return _io_pool
+
+
+def drive_pool() -> ThreadPoolExecutor:
+    global _drive_pool
+    with _lock:
+        if _drive_pool is None:
+            _drive_pool = ThreadPoolExecutor(max_workers=DRIVE_WORKERS, thread_name_prefix="drive")
+        return _drive_pool
+
+
+def full_text_pool() -> ThreadPoolExecutor:
+    global _full_text_pool
+    with _lock:
+        if _full_text_pool is None:
+            _full_text_pool = ThreadPoolExecutor(max_workers=FULL_TEXT_WORKERS, thread_name_prefix="full-text")
+        return _full_text_pool
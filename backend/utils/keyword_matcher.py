@@ -0,0 +1,106 @@
+# backend/utils/keyword_matcher.py
+"""
+Aho–Corasick keyword matching. A KeywordMatcher is built once from
+{category: [keywords]} and then tells, in a single pass over a line, which
+categories have at least one keyword occurring in it as a substring (the
+same test as `any(k in line for k in keywords)`, for every category at once).
+
+The automaton is expanded into a full transition table over the keywords'
+alphabet, so a scan is one dict lookup per character however many keywords
+(or locale packs) are loaded.
+
+Keyword packs are JSON files {category: [keywords]}, loaded by name from
+KEYWORD_PACK_DIR (e.g. "hi" -> hi.json) or by path.
+"""
+import os
+import json
+from collections import deque
+from typing import Dict, Iterable, List
+
+from backend.utils.logging_utils import get_logger
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        self._flags = {}
+        goto, fail, out = [{}], [0], [0]
+
+        # 1) trie of all keywords, each end state flagged with its categories
+        for category, words in keywords.items():
+            bit = self._flags.setdefault(category, 1 << len(self._flags))
+            for word in words:
+                word = word.lower()
+                if not word:
+                    continue
+                state = 0
+                for ch in word:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        goto.append({})
+                        fail.append(0)
+                        out.append(0)
+                        nxt = goto[state][ch] = len(goto) - 1
+                    state = nxt
+                out[state] |= bit
+
+        # 2) failure links, breadth first; a state also reports what its
+        # failure state reports (keywords that are suffixes of its path)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        # 3) full transition table, built in BFS order so delta[fail[s]] is ready.
+        # Characters outside the keywords' alphabet always lead back to the root.
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            queue.extend(goto[state].values())
+
+        # 4) states as (transitions, categories) nodes whose transitions point
+        # straight at the next node: one dict lookup per character in scan()
+        nodes = [({}, found) for found in out]
+        for state, moves in enumerate(delta):
+            nodes[state][0].update((ch, nodes[nxt]) for ch, nxt in moves.items())
+        self._root = nodes[0]
+
+    def flag(self, category: str) -> int:
+        """Bit for `category` in the masks returned by scan()."""
+        return self._flags.get(category, 0)
+
+    def scan(self, text: str) -> int:
+        """Bitmask of the categories with a keyword in `text` (pass it lowercased)."""
+        root = node = self._root
+        found = 0
+        for ch in text:
+            node = node[0].get(ch, root)
+            found |= node[1]
+        return found
+
+    def categories(self, text: str) -> set:
+        found = self.scan(text)
+        return {c for c, bit in self._flags.items() if found & bit}
+
+
+def load_keyword_packs(names: Iterable[str], pack_dir: str) -> Dict[str, List[str]]:
+    """Merge packs into {category: [keywords]}. Missing packs are reported and skipped."""
+    merged: Dict[str, List[str]] = {}
+    for name in names:
+        path = name if name.endswith(".json") else os.path.join(pack_dir, f"{name}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                pack = json.load(f)
+        except (OSError, ValueError) as e:
+            get_logger().warning(f"Keyword pack {name!r} not loaded: {e}")
+            continue
+        for category, words in pack.items():
+            merged.setdefault(category, []).extend(words)
+    return merged
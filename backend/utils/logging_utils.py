@@ -1,14 +1,16 @@
 import logging
 import uuid
+from contextvars import ContextVar
+
+# The id of the request (or job item) being handled, "-" outside one. Set by
+# the HTTP middleware, carried into stage threads and extraction processes,
+# and added to every log record as %(request_id)s.
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
 
 def get_logger():
-    logger = logging.getLogger("invoice")
-    if not logger.handlers:
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s | %(levelname)s | %(message)s"
-        )
-    return logger
+    from backend.logging_setup import setup_logging
+    setup_logging()
+    return logging.getLogger("invoice")
 
 def new_request_id():
     return str(uuid.uuid4())[:8]
@@ -19,6 +19,16 @@ _MONTHS = {
 
 CURRENCY_RE = re.compile(r"(₹|rs\.?|inr|\$|usd|eur|gbp)", re.IGNORECASE)
 
+_HSPACE_RE = re.compile(r"[ \t]+")
+_CRLF_RE = re.compile(r"\r\n?")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+_DIGIT_RE = re.compile(r"\d")
+_DATE_NORM_RE = re.compile(r"\d{4}_\d{2}_\d{2}")
+_DATE_YMD_RE = re.compile(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})")
+_DATE_DMY_RE = re.compile(r"(\d{1,2})[-/](\d{1,2})[-/](\d{4})")
+_DATE_D_MON_Y_RE = re.compile(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})")
+
 def normalize_text(text: str) -> str:
     """Normalize PDF extracted text for robust regex parsing."""
     if not text:
@@ -26,10 +36,10 @@ def normalize_text(text: str) -> str:
     text = unicodedata.normalize("NFKC", text)
     # common pdf artifacts
     text = text.replace("\u00a0", " ")
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\r\n?", "\n", text)
+    text = _HSPACE_RE.sub(" ", text)
+    text = _CRLF_RE.sub("\n", text)
     # collapse too many blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
     return text.strip()
 
 def safe_filename(s: str, max_len: int = 60) -> str:
@@ -44,6 +54,25 @@ def safe_filename(s: str, max_len: int = 60) -> str:
         return "UNKNOWN"
     return s[:max_len]
 
+def estimate_tokens(s: str) -> int:
+    """
+    Rough LLM token count without a tokenizer: ~3 characters per token, on the
+    safe side for receipt text (digits and short words split into many tokens).
+    """
+    return (len(s) + 2) // 3
+
+# Company-form words that don't tell vendors apart ("Swiggy Ltd" == "SWIGGY LIMITED")
+LEGAL_SUFFIXES = {"pvt", "private", "ltd", "limited", "llp", "inc", "co", "corp", "the"}
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+def vendor_key(name: str) -> str:
+    """Matching key for a vendor name: lowercase alphanumeric words, legal suffixes dropped."""
+    if not name:
+        return ""
+    words = _NON_ALNUM_RE.sub(" ", normalize_text(name).lower()).split()
+    return " ".join(w for w in words if w not in LEGAL_SUFFIXES)
+
 def _to_int(x: str, default=None):
     try:
         return int(x)
@@ -56,24 +85,28 @@ def normalize_date(raw: str) -> str:
 
     s = raw.strip()
 
+    # every format below has digits; most lines handed to us don't
+    if not _DIGIT_RE.search(s):
+        return "UNKNOWN"
+
     # already normalized
-    if re.fullmatch(r"\d{4}_\d{2}_\d{2}", s):
+    if _DATE_NORM_RE.fullmatch(s):
         return s
 
     # try formats like 2025-12-18 or 2025/12/18
-    m = re.search(r"(\d{4})[-/](\d{1,2})[-/](\d{1,2})", s)
+    m = _DATE_YMD_RE.search(s)
     if m:
         y, mo, d = int(m.group(1)), int(m.group(2)), int(m.group(3))
         return f"{y:04d}_{mo:02d}_{d:02d}"
 
     # try formats like 18/12/2025 or 18-12-2025
-    m = re.search(r"(\d{1,2})[-/](\d{1,2})[-/](\d{4})", s)
+    m = _DATE_DMY_RE.search(s)
     if m:
         d, mo, y = int(m.group(1)), int(m.group(2)), int(m.group(3))
         return f"{y:04d}_{mo:02d}_{d:02d}"
 
     # try "18 November 2025" / "28 Nov 2025"
-    m = re.search(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})", s)
+    m = _DATE_D_MON_Y_RE.search(s)
     if m:
         d = int(m.group(1))
         mon_txt = m.group(2).strip().lower()
@@ -84,6 +117,44 @@ def normalize_date(raw: str) -> str:
 
     return "UNKNOWN"
 
+def parse_amount(raw: str):
+    """'₹1,234.50' / 'Rs 719' / '719.35' -> float, or None if there's no number."""
+    if not raw:
+        return None
+    m = re.search(r"\d[\d,]*(?:\.\d+)?", raw)
+    if not m:
+        return None
+    try:
+        return float(m.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+# money regex (allow commas)
+MONEY_RE = re.compile(r"(?:(₹|rs\.?|inr|\$)\s*)?(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)", re.IGNORECASE)
+# plain numbers only count as money on lines like these
+MONEY_CONTEXT_RE = re.compile(r"\b(total|amount|paid|grand|net|balance)\b", re.IGNORECASE)
+
+def line_money_candidates(ln: str):
+    """extract_money_candidates for one already normalized and stripped line."""
+    candidates = []
+    has_context = None
+    for m in MONEY_RE.finditer(ln):
+        sym = m.group(1) or ""
+        amt = m.group(2)
+        # ignore short plain numbers unless currency symbol exists or line has total keyword
+        if not sym:
+            if has_context is None:
+                has_context = MONEY_CONTEXT_RE.search(ln) is not None
+            if not has_context:
+                continue
+
+        num = float(amt.replace(",", ""))
+        # ignore tiny numbers that are likely item qty or taxes percentages
+        if num < 1:
+            continue
+        candidates.append((num, (sym + amt).strip(), ln))
+    return candidates
+
 def extract_money_candidates(text: str):
     """
     Returns list of tuples (value_float, raw_match, context_line)
@@ -93,22 +164,8 @@ def extract_money_candidates(text: str):
         return []
 
     candidates = []
-    lines = [ln.strip() for ln in normalize_text(text).splitlines() if ln.strip()]
-
-    # money regex (allow commas)
-    money_re = re.compile(r"(?:(₹|rs\.?|inr|\$)\s*)?(\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)", re.IGNORECASE)
-
-    for ln in lines:
-        for m in money_re.finditer(ln):
-            sym = m.group(1) or ""
-            amt = m.group(2)
-            # ignore short plain numbers unless currency symbol exists or line has total keyword
-            if not sym and not re.search(r"\b(total|amount|paid|grand|net|balance)\b", ln, re.I):
-                continue
-
-            num = float(amt.replace(",", ""))
-            # ignore tiny numbers that are likely item qty or taxes percentages
-            if num < 1:
-                continue
-            candidates.append((num, (sym + amt).strip(), ln))
+    for ln in normalize_text(text).splitlines():
+        ln = ln.strip()
+        if ln:
+            candidates += line_money_candidates(ln)
     return candidates
@@ -0,0 +1,87 @@
+# benchmarks/bench_db_inserts.py
+"""
+Invoice inserts/second under concurrent writers:
+  legacy  - a fresh sqlite3.connect per insert, default rollback journal (old get_conn)
+  pooled  - db.insert_invoice through the WAL connection pool
+  bulk    - db.insert_invoices (executemany, one transaction per writer)
+
+    python -m benchmarks.bench_db_inserts --writers 4 --n 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Point the app at a scratch database before backend.db is imported
+_tmp = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_PATH"] = os.path.join(_tmp, "pooled.db")
+
+from backend import db  # noqa: E402
+from benchmarks.common import Timer  # noqa: E402
+
+
+def row(i: int) -> dict:
+    return {
+        "original_filename": f"receipt_{i}.pdf",
+        "stored_path": f"storage/2025/January/receipt_{i}.pdf",
+        "vendor_raw": "California Burrito",
+        "vendor_norm": "California_Burrito",
+        "date_raw": "2025_01_15",
+        "date_norm": "2025_01_15",
+        "amount_raw": f"{100 + i % 900}.00",
+        "amount_norm": f"{100 + i % 900}.00",
+        "status": "success",
+        "timings": {"extract_text": 12.5, "extract_fields": 340.0},
+        "total_ms": 400.0,
+    }
+
+
+def run_writers(writers: int, per_writer: int, fn):
+    def work(w):
+        fn(w, per_writer)
+    threads = [threading.Thread(target=work, args=(w,)) for w in range(writers)]
+    with Timer() as t:
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    return writers * per_writer / t.elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--n", type=int, default=2000, help="inserts per writer")
+    args = ap.parse_args()
+
+    db.init_db()
+
+    # Legacy: same schema, new connection per insert, default journal mode
+    legacy_path = os.path.join(_tmp, "legacy.db")
+    conn = sqlite3.connect(legacy_path)
+    schema = db.get_conn().execute("SELECT sql FROM sqlite_master WHERE name='invoices'").fetchone()[0]
+    conn.execute(schema)
+    conn.close()
+
+    def legacy(w, n):
+        for i in range(n):
+            c = sqlite3.connect(legacy_path, timeout=30)
+            c.execute(db.INSERT_INVOICE_SQL, db._invoice_params(row(i)))
+            c.commit()
+            c.close()
+
+    def pooled(w, n):
+        for i in range(n):
+            db.insert_invoice(row(i))
+
+    def bulk(w, n):
+        db.insert_invoices([row(i) for i in range(n)])
+
+    print(f"writers={args.writers} inserts/writer={args.n}")
+    for name, fn in [("legacy", legacy), ("pooled", pooled), ("bulk", bulk)]:
+        print(f"{name:8s} {run_writers(args.writers, args.n, fn):10.0f} inserts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# benchmarks/bench_duplicates.py
+"""
+Duplicate checks (services/duplicates.py) on a large invoices table:
+
+  lookups   p50/p99 of the exact (content hash), image (hash bands) and
+            fields (vendor, date, amount) lookups, and the query plans
+  photos    of --photos receipts uploaded once, how many re-takes (new
+            skew, blur, speckle, scale and JPEG quality) are caught, and
+            how many never-seen receipts are wrongly flagged
+
+The table gets --rows random invoices (a quarter with random photo hashes)
+spread over OWNERS users, plus the photo receipts of one of them; lookups
+are per owner, as in the app. It is built once and reused with --db.
+
+    python -m benchmarks.bench_duplicates --rows 1000000 --photos 100
+"""
+import argparse
+import hashlib
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import VENDORS, summarize
+from benchmarks.corpus import invoice_lines, render_page, scanned
+
+# Duplicate checks only look at the uploader's own invoices; the rows are spread over this many owners
+OWNERS = 4
+
+
+def build(rows: int):
+    from backend import db
+    db.init_db()
+    with db.connection() as conn:
+        have = conn.execute("SELECT COUNT(*) FROM invoices WHERE owner IS NOT NULL").fetchone()[0]
+    rng = random.Random(42)
+    vendors = VENDORS + [f"Vendor {i:04d}" for i in range(2000)]
+    batch = []
+    for i in range(have, rows):
+        vendor = rng.choice(vendors)
+        amount = f"{rng.randint(50, 50000)}.{rng.randint(0, 99):02d}"
+        row = {
+            "original_filename": f"r{i}.jpg", "status": "success",
+            "content_hash": hashlib.sha256(str(i).encode()).hexdigest(),
+            "vendor_raw": vendor, "vendor_norm": vendor.replace(" ", "_"),
+            "date_raw": "", "date_norm": f"{rng.randint(2019, 2025)}_{rng.randint(1, 12):02d}_{rng.randint(1, 28):02d}",
+            "amount_raw": amount, "amount_norm": amount, "owner": f"owner{rng.randrange(OWNERS)}",
+        }
+        if i % 4 == 0:
+            row["image_hash"] = {"bands": [(b << 16) | rng.getrandbits(16) for b in range(4)],
+                                 "dhash": rng.randbytes(32)}
+        batch.append(row)
+        if len(batch) == 50_000:
+            db.insert_invoices(batch)
+            batch = []
+    db.insert_invoices(batch)
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+
+def receipt(seed: int):
+    """The printed receipt (before it is photographed) and its fields."""
+    rng = random.Random(seed)
+    vendor = rng.choice(VENDORS)
+    day = date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))
+    amount = rng.randint(5000, 900000) / 100
+    page = render_page(invoice_lines(rng, vendor, day, amount, rng.randint(4, 12)),
+                       width=700, font_size=24, margin=40, a4=False)
+    return page, vendor, day, amount
+
+
+def photograph(page, path: str, seed: int):
+    rng = random.Random(seed)
+    img = scanned(page, rng, max_angle=3).convert("RGB")
+    f = rng.uniform(0.7, 2.5)
+    img = img.resize((round(img.width * f), round(img.height * f)))
+    img.save(path, "JPEG", quality=rng.randint(60, 95))
+
+
+def photos(n: int, tmp: str):
+    """Uploads n receipt photos; returns (fingerprint ms, retake results, unseen results)."""
+    from backend import db
+    from backend.services.duplicates import check_file, image_fingerprint
+    fp_times, retakes, unseen = [], [], []
+    rows = []
+    for i in range(n):
+        page, vendor, day, amount = receipt(i)
+        path = os.path.join(tmp, f"first_{i}.jpg")
+        photograph(page, path, seed=i)
+        t0 = time.perf_counter()
+        image_hash = image_fingerprint(path)
+        fp_times.append(time.perf_counter() - t0)
+        rows.append({"original_filename": f"first_{i}.jpg", "status": "success",
+                     "content_hash": f"photo-{i}", "vendor_raw": vendor, "image_hash": image_hash,
+                     "owner": "owner0"})
+    db.insert_invoices(rows)
+    with db.connection() as conn:
+        first_id = conn.execute("SELECT MAX(id) FROM invoices WHERE content_hash = 'photo-0'").fetchone()[0]
+
+    for i in range(n):
+        page, *_ = receipt(i)
+        path = os.path.join(tmp, f"retake_{i}.jpg")
+        photograph(page, path, seed=10_000 + i)
+        dup = check_file("retake", "owner0", image_fingerprint(path))
+        retakes.append(bool(dup) and dup["invoice"]["id"] == first_id + i)
+
+        page, *_ = receipt(20_000 + i)
+        path = os.path.join(tmp, f"unseen_{i}.jpg")
+        photograph(page, path, seed=30_000 + i)
+        dup = check_file("unseen", "owner0", image_fingerprint(path))
+        unseen.append(bool(dup))
+    return fp_times, retakes, unseen
+
+
+def lookups(repeat: int):
+    from backend import db
+    from backend.services.duplicates import _closest_image
+    with db.connection() as conn:
+        n = conn.execute("SELECT MAX(id) FROM invoices").fetchone()[0]
+        sample = [dict(r) for r in conn.execute(
+            "SELECT i.content_hash, i.vendor_norm, i.date_norm, i.amount_value, i.owner, h.dhash FROM invoices i "
+            "LEFT JOIN image_hashes h ON h.invoice_id = i.id WHERE i.id IN (%s)"
+            % ",".join(str(random.randint(1, n)) for _ in range(repeat * 4))
+        )]
+        bands = {}
+        for band, invoice_id in conn.execute("SELECT band, invoice_id FROM image_hash_bands"):
+            bands.setdefault(invoice_id, []).append(band)
+        image_ids = list(bands)
+
+    cases = {
+        "exact": lambda r: db.find_invoice_by_hash(r["content_hash"], r["owner"]),
+        "fields": lambda r: db.find_invoice_by_fields(r["vendor_norm"], r["date_norm"], r["amount_value"], r["owner"]),
+        "image": lambda r: _closest_image(r["image_hash"], r["owner"]),
+    }
+    for r in sample:
+        i = random.choice(image_ids)
+        r["image_hash"] = {"bands": bands[i], "dhash": r["dhash"] or random.randbytes(32)}
+    results = {}
+    for name, fn in cases.items():
+        latencies = []
+        for r in sample[:repeat]:
+            t0 = time.perf_counter()
+            fn(r)
+            latencies.append(time.perf_counter() - t0)
+        results[name] = summarize(latencies)
+    return results
+
+
+def plans():
+    from backend import db
+    queries = {
+        "exact": ("SELECT id FROM invoices WHERE owner = ? AND content_hash = ? AND status = 'success' "
+                  "ORDER BY id DESC LIMIT 1", ("x", "x")),
+        "fields": ("SELECT id FROM invoices WHERE owner = ? AND vendor_norm = ? COLLATE NOCASE AND date_norm = ? "
+                   "AND amount_value = ? AND status = 'success' ORDER BY id DESC LIMIT 1", ("x", "x", "x", 1.0)),
+        "image": ("SELECT DISTINCT invoice_id FROM image_hash_bands WHERE band IN (?, ?, ?, ?)", (1, 2, 3, 4)),
+    }
+    with db.connection() as conn:
+        return {name: " / ".join(r[-1] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+                for name, (sql, args) in queries.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--photos", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=500)
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_duplicates.db"))
+    args = ap.parse_args()
+
+    os.environ["DB_PATH"] = args.db
+    logging.getLogger("invoice").setLevel(logging.ERROR)
+    random.seed(0)
+
+    t0 = time.perf_counter()
+    build(args.rows)
+    print(f"{args.rows} invoices at {args.db} ({time.perf_counter() - t0:.0f} s to build)")
+    with tempfile.TemporaryDirectory() as tmp:
+        fp_times, retakes, unseen = photos(args.photos, tmp)
+    print(f"photo fingerprint  {summarize(fp_times)}")
+    print(f"re-takes caught    {sum(retakes)}/{len(retakes)}")
+    print(f"unseen flagged     {sum(unseen)}/{len(unseen)}")
+    for name, row in lookups(args.repeat).items():
+        print(f"lookup {name:7s}     {row}")
+    for name, plan in plans().items():
+        print(f"plan {name:7s}       {plan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# benchmarks/bench_field_extractor.py
+"""
+Regex field extractor (services/field_extractor.py): golden-corpus check
+and per-document timings for extract_fields and each single-field helper,
+then per-line keyword classification as the keyword tables grow:
+  any()      - `any(k in line for k in table)` per category (the original)
+  regex      - one alternation per category
+  automaton  - utils/keyword_matcher.KeywordMatcher, all categories at once
+
+    python -m benchmarks.bench_field_extractor               # check + time
+    python -m benchmarks.bench_field_extractor --repeat 20
+    python -m benchmarks.bench_field_extractor --write-golden
+
+The golden file holds the corpus texts and the fields the extractor gave
+for them. Only regenerate it when an output change is intended.
+"""
+import argparse
+import json
+import os
+import random
+import re
+
+from backend.services import field_extractor
+from backend.utils.keyword_matcher import KeywordMatcher
+from benchmarks.common import VENDORS, Timer, summarize
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "field_extractor_golden.json")
+
+# Hand-written documents for the corner cases of the rules
+EDGE_CASES = [
+    "",
+    "   \n\n  ",
+    "Merchant: Blue Tokai Coffee\nBilled From: Somewhere Else\nTotal 250",
+    "Billed from: Xy Traders merchant: Chai Point\nDate: 03/04/2024\nAmount Paid Rs 90",
+    "Sold by : ab\nStore: Big Bazaar Retail\nGrand Total ₹1,299.00",
+    "Invoice\nTax Invoice\nRECEIPT SUMMARY\nOrder Time: 2024-07-09 19:32\nNet Payable 410.5",
+    "record card shopping\nREAL STORE PVT LTD\nSubtotal Rs 500\nDelivery fee Rs 40\nTotal Rs 540",
+    "CAFE\nBill Date 31 Dec 2023\nTotal 12\nTotal Rs 0.50\nGrand Total Rs 1,200.00\nTotal INR 999",
+    "Hotel Paradise\nGST 18%: 54.00\nTip: 20\nTotals 380\nBalance Due: $ 380.00",
+    " Swiggy Limited\t\tOrder\r\nOrder date:\t28 Nov 2025\r\n\r\n\r\n\r\nTotal\tRs. 719.35",
+    "1234567890\n+91 98450 12345\nACME Inc\nno dates here\nqty 2 x 30\nRs 60 Rs 45",
+    "Date: sometime\nInvoice Date: 2025/1/7\nTotal: 77",
+    "Restaurant Name: Mg\nBlue Tokai Coffee Roasters\nDate: 7-1-2025",
+    "mostly lowercase vendor name\nRandom Line Here\n5 September 2024\nTotal amount inr 5,000",
+    "zomato\nCGST 2.5% 10.00\nSGST 2.5% 10.00\nPlatform fee 5\nPackaging charge 15\nItem total 400\nTotal 440",
+]
+
+ITEMS = ["Burrito Bowl", "Cold Brew", "Paneer Wrap", "Masala Dosa", "Veg Thali", "Cappuccino",
+         "Brown Bread", "Milk 1L", "Eggs (12)", "Detergent", "Notebook", "USB Cable"]
+CUSTOMERS = ["Customer Name: Priya Sharma", "Bill To: Rahul K", "Name: A. Kumar", "Deliver to: Flat 4B"]
+ADDRESSES = ["12 MG Road, Bengaluru 560001", "3rd Floor, Prestige Building", "HSR Layout, Sector 2",
+             "Koramangala, Bangalore - 560034", "Indiranagar 100ft Road", "Pincode 560038, India"]
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%d %B %Y", "%d %b %Y", "%d-%m-%Y", "%Y/%m/%d", "%b %d, %Y"]
+DATE_LABELS = ["Invoice Date", "Bill Date", "Date", "Order Date", "Order Time", "Dated", ""]
+TOTAL_LABELS = ["Grand Total", "Total Amount", "Amount Paid", "Total Paid", "Net Payable",
+                "Net Amount", "TOTAL", "Balance Due", "Amount", "To Pay"]
+CURRENCIES = ["Rs ", "Rs.", "₹", "INR ", "$", "", "rs "]
+VENDOR_SUFFIXES = ["", " Pvt Ltd", " Restaurant", " Store", " Cafe", " LLP", " Inc"]
+
+
+def _money(rng, value):
+    s = f"{value:,.2f}" if rng.random() < 0.6 else f"{value:.2f}"
+    if rng.random() < 0.2:
+        s = s.split(".")[0]
+    return rng.choice(CURRENCIES) + s
+
+
+def make_document(rng: random.Random) -> str:
+    """A synthetic receipt in the shape PDF text / OCR output tends to have."""
+    import datetime as dt
+
+    lines = []
+    vendor = rng.choice(VENDORS) + rng.choice(VENDOR_SUFFIXES)
+    if rng.random() < 0.3:
+        vendor = vendor.upper()
+    if rng.random() < 0.15:
+        lines.append(rng.choice(["TAX INVOICE", "Invoice", "Order Summary", "RECEIPT"]))
+    if rng.random() < 0.2:
+        lines.append(f"{rng.choice(['Merchant', 'Sold By', 'Vendor', 'Billed From', 'Restaurant Name'])}: {vendor}")
+    else:
+        lines.append(vendor)
+    lines += rng.sample(ADDRESSES, rng.randint(0, 2))
+    if rng.random() < 0.5:
+        lines.append(f"GSTIN: 29ABCDE{rng.randint(1000, 9999)}F1Z5")
+    if rng.random() < 0.6:
+        lines.append(rng.choice(CUSTOMERS))
+
+    date = dt.date(2023, 1, 1) + dt.timedelta(days=rng.randint(0, 1000))
+    label = rng.choice(DATE_LABELS)
+    date_s = date.strftime(rng.choice(DATE_FORMATS))
+    if rng.random() < 0.2:
+        date_s += f" {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    if rng.random() < 0.9:
+        lines.append(f"{label}: {date_s}" if label else date_s)
+    lines.append(f"Order #{rng.randint(100000, 999999)}")
+
+    if rng.random() < 0.5:
+        lines.append("")
+    subtotal = 0.0
+    for _ in range(rng.randint(1, 12)):
+        price = rng.randint(20, 900) + rng.choice([0, 0.5, 0.25, 0.99])
+        qty = rng.randint(1, 3)
+        subtotal += price * qty
+        sep = rng.choice([" ", "  ", "\t"])
+        lines.append(f"{rng.choice(ITEMS)}{sep}{qty} x {price:.2f}  {price * qty:.2f}")
+
+    tax = round(subtotal * 0.05, 2)
+    total = subtotal + tax
+    lines.append(f"Subtotal {_money(rng, subtotal)}")
+    for name in rng.sample(["CGST 2.5%", "SGST 2.5%", "Delivery Fee", "Platform fee", "Tip", "Discount", "Packaging"],
+                           rng.randint(0, 4)):
+        lines.append(f"{name} {_money(rng, rng.randint(1, 60))}")
+    lines.append(f"{tax:.2f}")
+    lines.append(f"{rng.choice(TOTAL_LABELS)}{rng.choice([': ', ' ', '  '])}{_money(rng, total)}")
+    if rng.random() < 0.3:
+        lines.append(f"Paid via UPI {_money(rng, total)}")
+    if rng.random() < 0.3:
+        lines.append("Thank you for ordering! Visit again")
+    if rng.random() < 0.1:
+        # long statements push dates/totals past the scan windows
+        lines += [f"Line {i} {rng.randint(1, 99)}" for i in range(rng.randint(80, 160))]
+
+    # extraction noise: nbsp, runs of spaces/tabs, CRLF, blank lines
+    text = "\n".join(lines)
+    if rng.random() < 0.3:
+        text = text.replace(" ", "\u00a0", rng.randint(1, 5))
+    if rng.random() < 0.3:
+        text = text.replace("\n", "\r\n")
+    if rng.random() < 0.3:
+        text = text.replace("\n\n", "\n\n\n\n")
+    return text
+
+
+def corpus(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    return EDGE_CASES + [make_document(rng) for _ in range(n)]
+
+
+def check(golden) -> int:
+    mismatches = 0
+    for i, case in enumerate(golden):
+        got = field_extractor.extract_fields(case["text"])
+        if got != case["fields"]:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"  case {i}: expected {case['fields']}, got {got}")
+    return mismatches
+
+
+def bench_keywords(texts, repeat: int):
+    lines = [ln.lower() for t in texts for ln in field_extractor._split_lines(t)]
+    base = {
+        "address": list(field_extractor.ADDRESS_HINTS),
+        "date": field_extractor.DATE_KEYS,
+        "total": field_extractor.TOTAL_KEYS,
+        "bad_total": field_extractor.BAD_TOTAL_CONTEXT,
+    }
+    rng = random.Random(0)
+    print(f"keyword scan, us/line over {len(lines)} lines")
+    for extra in [0, 20, 100, 300]:
+        # extra made-up keywords per category, standing in for locale packs
+        tables = {c: words + ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+                              for _ in range(extra)]
+                  for c, words in base.items()}
+        regexes = [re.compile("|".join(re.escape(w) for w in words)) for words in tables.values()]
+        matcher = KeywordMatcher(tables)
+        scanners = {
+            "any()": lambda ln: [any(w in ln for w in words) for words in tables.values()],
+            "regex": lambda ln: [r.search(ln) for r in regexes],
+            "automaton": matcher.scan,
+        }
+        row = []
+        for name, fn in scanners.items():
+            with Timer() as timer:
+                for _ in range(repeat):
+                    for ln in lines:
+                        fn(ln)
+            row.append(f"{name} {timer.elapsed / repeat / len(lines) * 1e6:6.2f}")
+        print(f"  +{extra:<4d} keywords/category  " + "   ".join(row))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5, help="passes over the corpus per timing")
+    ap.add_argument("--write-golden", action="store_true", help="record current outputs as the golden file")
+    ap.add_argument("--n", type=int, default=300, help="generated documents (with --write-golden)")
+    args = ap.parse_args()
+
+    if args.write_golden:
+        golden = [{"text": t, "fields": field_extractor.extract_fields(t)} for t in corpus(args.n)]
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=0)
+        print(f"Wrote {len(golden)} cases to {GOLDEN_PATH}")
+        return
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    texts = [c["text"] for c in golden]
+
+    bad = check(golden)
+    print(f"golden: {len(golden) - bad}/{len(golden)} match")
+
+    for name in ["extract_fields", "extract_vendor", "extract_date", "extract_amount"]:
+        fn = getattr(field_extractor, name)
+        latencies = []
+        for _ in range(args.repeat):
+            for t in texts:
+                with Timer() as timer:
+                    fn(t)
+                latencies.append(timer.elapsed)
+        s = summarize(latencies)
+        print(f"{name:15s} mean {s['mean_ms']:7.3f} ms  p50 {s['p50_ms']:7.3f} ms  p99 {s['p99_ms']:7.3f} ms")
+
+    bench_keywords(texts, args.repeat)
+
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_history.py
+"""
+History query latency on a large invoices table (default 1M rows).
+
+    python -m benchmarks.bench_history --rows 1000000
+
+The database is built once in a scratch folder (reused if --db points at an
+existing file), then each query shape is run repeatedly, walking a few
+pages with the cursor, as one of OWNERS users. Target: p99 under ~10 ms.
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.common import VENDORS, summarize
+import time
+
+# History is per user; the rows are spread over this many owners
+OWNERS = 4
+
+
+def build(rows: int):
+    from backend import db
+    db.init_db()
+    with db.connection() as conn:
+        have = conn.execute("SELECT COUNT(*) FROM invoices WHERE owner IS NOT NULL").fetchone()[0]
+    if have >= rows:
+        return
+
+    rng = random.Random(42)
+    statuses = ["success"] * 18 + ["failed"]
+    vendors = VENDORS + [f"Vendor {i:04d}" for i in range(2000)]
+    batch = []
+    for i in range(have, rows):
+        amount = f"{rng.randint(50, 50000)}.{rng.randint(0, 99):02d}"
+        vendor = rng.choice(vendors)
+        batch.append({
+            "original_filename": f"r{i}.pdf",
+            "vendor_raw": vendor,
+            "vendor_norm": vendor.replace(" ", "_"),
+            "date_raw": "", "date_norm": f"{rng.randint(2019, 2025)}_{rng.randint(1, 12):02d}_{rng.randint(1, 28):02d}",
+            "amount_raw": amount, "amount_norm": amount,
+            "status": rng.choice(statuses),
+            "owner": f"owner{rng.randrange(OWNERS)}",
+        })
+        if len(batch) == 50_000:
+            db.insert_invoices(batch)
+            batch = []
+    db.insert_invoices(batch)
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_history.db"))
+    args = ap.parse_args()
+
+    os.environ["DB_PATH"] = args.db
+    from backend import db
+
+    t0 = time.perf_counter()
+    build(args.rows)
+    print(f"table ready ({args.rows} rows) in {time.perf_counter() - t0:.1f}s: {args.db}")
+
+    cases = {
+        "latest page": {},
+        "status=failed": {"status": "failed"},
+        "vendor prefix": {"vendor": "Swiggy"},
+        "date month": {"date_from": "2024_03_01", "date_to": "2024_03_31"},
+        "amount range": {"amount_min": 1000, "amount_max": 1200},
+        "vendor+date+amount": {"vendor": "Vendor_01", "date_from": "2023_01_01", "date_to": "2023_12_31",
+                               "amount_min": 100, "amount_max": 20000},
+        "projection": {"fields": ["vendor_norm", "date_norm", "amount_value"]},
+    }
+    for name, filters in cases.items():
+        lat = []
+        for _ in range(args.repeat):
+            cursor = None
+            for _page in range(3):
+                t = time.perf_counter()
+                rows, cursor = db.query_invoices("owner0", cursor=cursor, limit=50, **filters)
+                lat.append(time.perf_counter() - t)
+                if cursor is None:
+                    break
+        print(f"{name:20s} {summarize(lat)}")
+
+
+if __name__ == "__main__":
+    main()
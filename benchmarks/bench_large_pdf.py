@@ -0,0 +1,97 @@
+# benchmarks/bench_large_pdf.py
+"""
+Time and peak memory of extracting one long vendor statement (text PDF:
+vendor and date on page one, the total on the last page). Each mode runs
+in a fresh process so peak RSS is its own:
+
+  pdfplumber  the old extract_text_from_pdf: every page through pdfplumber,
+              all text accumulated
+  full        pdf_service.pdf_full_text: every page, a few at a time
+  early_exit  pdf_service.extract_text_from_pdf: head and tail pages,
+              stops once vendor, date and amount are found
+
+    python -m benchmarks.bench_large_pdf --pages 150
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_text_pdf
+
+MODES = ["pdfplumber", "full", "early_exit"]
+
+
+def make_statement(path: str, pages: int, seed: int = 0):
+    rng = random.Random(seed)
+    doc = [["Blue Tokai Coffee", "Statement of account", "Statement Date: 14/03/2025", ""]]
+    for p in range(pages):
+        rows = [f"{rng.randint(1, 28):02d}/02 Order {rng.randint(10 ** 5, 10 ** 6)} Filter Coffee "
+                f"{rng.randint(1, 9)} x {rng.randint(100, 900)}.00" for _ in range(55)]
+        if p == 0:
+            doc[0] += rows[:50]
+        else:
+            doc.append(rows)
+    doc[-1] += ["", "Grand Total Rs 184,220.00"]
+    with open(path, "wb") as f:
+        f.write(make_text_pdf(doc))
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def child(mode: str, path: str):
+    from backend.services.field_extractor import extract_fields
+    from backend.services import pdf_service
+    import pdfplumber
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    if mode == "pdfplumber":
+        parts = []
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                parts.append(page.extract_text(x_tolerance=2, y_tolerance=2) or "")
+        text = "\n\n".join(parts)
+    elif mode == "full":
+        text = pdf_service.pdf_full_text(path)
+    else:
+        text = pdf_service.extract_text_from_pdf(path)
+    elapsed = time.perf_counter() - t0
+    fields = extract_fields(text)
+    print(json.dumps({"ms": round(elapsed * 1000, 1), "base_rss_mb": round(base, 1), "peak_rss_mb": round(_rss_mb(), 1),
+                      "chars": len(text), "fields": fields}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=150)
+    ap.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        import logging
+        logging.getLogger("invoice").setLevel(logging.ERROR)
+        return child(args.child, args.path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.pdf")
+        make_statement(path, args.pages)
+        print(f"{args.pages}-page statement, {os.path.getsize(path) / 1e6:.1f} MB")
+        for mode in MODES:
+            out = subprocess.run([sys.executable, "-m", "benchmarks.bench_large_pdf", "--child", mode, "--path", path],
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            f = r["fields"]
+            print(f"{mode:11s} {r['ms']:8.1f} ms  peak RSS {r['peak_rss_mb']:6.1f} MB "
+                  f"(+{r['peak_rss_mb'] - r['base_rss_mb']:5.1f} over imports)  {r['chars']:8d} chars  "
+                  f"{f['vendor']} / {f['date']} / {f['amount']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_llm_gateway.py
+"""
+LLM gateway (services/llm_gateway.py): API calls and wall time for an
+upload stream with the duplicates seen in practice: re-uploads of the same
+file, re-scans of the same receipt (same text, different whitespace) and
+copies of one file submitted together in a batch (concurrent, so they all
+miss the cache at once and have to be coalesced).
+
+The Groq client is a stand-in that sleeps --llm-ms per call, with no quota.
+Each mode runs on a fresh database, with IO_WORKERS threads like the batch
+endpoint:
+  direct   - every document is an API call (the old behaviour)
+  gateway  - response cache + in-flight coalescing
+
+    python -m benchmarks.bench_llm_gateway --docs 400 --llm-ms 50
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmp = tempfile.mkdtemp(prefix="bench_llm_")
+os.environ["DB_PATH"] = os.path.join(_tmp, "llm.db")
+
+from backend import db  # noqa: E402
+from backend.core.config import IO_WORKERS  # noqa: E402
+from backend.services import llm_gateway, llm_scheduler, llm_service  # noqa: E402
+from benchmarks.common import VENDORS, Timer  # noqa: E402
+
+
+class FakeGroq:
+    """Answers like the real API after `latency` seconds; counts requests."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = self.completions = self.with_raw_response = self
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self
+
+    # raw response: headers + parse()
+    headers = {}
+
+    def parse(self):
+        content = json.dumps({"vendor": "Bench Vendor", "date": "2025_01_01", "amount": "100.00"})
+        message = type("Message", (), {"content": content})
+        return type("Completion", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+def make_stream(n: int, rng: random.Random):
+    """n document texts, ~35% of them duplicates of an earlier one."""
+    docs = []
+    while len(docs) < n:
+        roll = rng.random()
+        if docs and roll < 0.15:
+            docs.append(rng.choice(docs))  # re-upload
+        elif docs and roll < 0.25:
+            docs.append(rng.choice(docs).replace("\n", "\n\n").replace(" ", "  ", 3))  # re-scan
+        elif roll < 0.35:
+            text = _receipt(rng)
+            docs += [text] * rng.randint(2, 4)  # same file several times in one batch
+        else:
+            docs.append(_receipt(rng))
+    return docs[:n]
+
+
+def _receipt(rng: random.Random) -> str:
+    return "\n".join([
+        rng.choice(VENDORS), f"Bill No: {rng.randint(1, 10 ** 9)}",
+        f"Invoice Date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        f"Grand Total Rs {rng.randint(50, 5000)}.00",
+    ])
+
+
+def run(docs, mode: str, latency: float):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db.DB_PATH + suffix):
+            os.remove(db.DB_PATH + suffix)
+    db._pool.queue.clear()
+    db.init_db()
+    for k in llm_gateway._stats:
+        llm_gateway._stats[k] = 0
+
+    fake = FakeGroq(latency)
+    llm_service.api_key = "bench"
+    # no quota in this benchmark (see bench_llm_scheduler)
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(rpm=1e9, tpm=1e12)
+    llm_service.get_client = lambda: fake
+    llm_service.complete = llm_gateway.complete if mode == "gateway" else (lambda key, call: call())
+
+    with Timer() as t:
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as pool:
+            list(pool.map(llm_service.extract_invoice_data_with_llm, docs))
+
+    s = llm_gateway.stats()
+    print(f"{mode:8s} api calls {fake.calls:4d}/{len(docs)}  wall {t.elapsed:6.2f} s  "
+          f"hits {s['hits']:4d}  coalesced {s['coalesced']:4d}  hit rate {s['hit_rate']:.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--llm-ms", type=float, default=50.0, help="latency of one (fake) API call")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    docs = make_stream(args.docs, random.Random(args.seed))
+    print(f"docs={len(docs)} distinct texts={len({llm_gateway.normalize_for_key(d) for d in docs})} "
+          f"workers={IO_WORKERS} llm_ms={args.llm_ms:g}")
+    for mode in ["direct", "gateway"]:
+        run(docs, mode, args.llm_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
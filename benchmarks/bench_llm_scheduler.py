@@ -0,0 +1,147 @@
+# benchmarks/bench_llm_scheduler.py
+"""
+LLM rate limiter (services/llm_scheduler.py) against a stand-in Groq that
+enforces a request and token quota, answering 429 + Retry-After beyond it
+and sending x-ratelimit-* headers like the real API.
+
+A burst of batch documents arrives at once on --threads threads, and a
+trickle of interactive dry runs arrives while the burst is being worked off:
+  naive      - call straight away, a 429 is a failure (what uploads did:
+               dry runs returned "rate_limit", others fell back to regex)
+  scheduler  - token buckets + priority queue + retries. It starts from a
+               deliberately wrong guess (request rate too high, token budget
+               too low), so it has to learn both from the server.
+
+Time is compressed: the quota window is --window seconds instead of a minute.
+
+    python -m benchmarks.bench_llm_scheduler --batch 300 --rps 40 --tps 20000
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services import llm_scheduler
+from backend.services.llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from benchmarks.common import Timer, summarize
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Error code: 429 - rate limit, retry after {retry_after:.2f}s")
+        self.response = type("Response", (), {"headers": {"retry-after": f"{retry_after:.3f}"}})
+
+
+class FakeGroqServer:
+    """Requests and tokens per `window` seconds, as continuously refilled buckets."""
+
+    def __init__(self, requests: float, tokens: float, window: float, latency: float):
+        self.limits = (requests, tokens)
+        self.window = window
+        self.latency = latency
+        self.levels = [requests, tokens]
+        self.at = time.monotonic()
+        self.lock = threading.Lock()
+        self.ok = self.rejected = 0
+
+    def handle(self, tokens: int):
+        with self.lock:
+            now = time.monotonic()
+            for i, limit in enumerate(self.limits):
+                self.levels[i] = min(limit, self.levels[i] + (now - self.at) * limit / self.window)
+            self.at = now
+            short = max((1 - self.levels[0]) / self.limits[0], (tokens - self.levels[1]) / self.limits[1])
+            if short > 0:
+                self.rejected += 1
+                raise RateLimitError(short * self.window)
+            self.levels[0] -= 1
+            self.levels[1] -= tokens
+            self.ok += 1
+            headers = {
+                "x-ratelimit-limit-tokens": str(self.limits[1]),
+                "x-ratelimit-remaining-tokens": str(int(self.levels[1])),
+                "x-ratelimit-limit-requests": "14400",
+                "x-ratelimit-remaining-requests": "10000",
+            }
+        time.sleep(self.latency)
+        return '{"vendor": "X", "date": "2025_01_01", "amount": "1.00"}', headers
+
+
+def run(mode: str, args):
+    server = FakeGroqServer(args.rps * args.window, args.tps * args.window, args.window, args.llm_ms / 1000)
+    scheduler = LLMScheduler(rpm=args.rps * args.window * 2, tpm=args.tps * args.window / 4)
+    rng = random.Random(args.seed)
+    costs = [rng.randint(300, 900) for _ in range(args.batch + args.interactive)]
+    latencies = {PRIORITY_INTERACTIVE: [], PRIORITY_BATCH: []}
+    failed = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+    lock = threading.Lock()
+
+    def one(i: int, priority: int, t0: float):
+        try:
+            if mode == "naive":
+                server.handle(costs[i])
+            else:
+                scheduler.run(lambda: server.handle(costs[i]), priority=priority, tokens=costs[i],
+                              max_wait=args.max_wait)
+            with lock:
+                latencies[priority].append(time.perf_counter() - t0)
+        except Exception:
+            with lock:
+                failed[priority] += 1
+
+    with Timer() as t:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for i in range(args.batch):
+                pool.submit(one, i, PRIORITY_BATCH, time.perf_counter())
+            # interactive requests: their own threads, like concurrent /upload requests
+            users = []
+            for j in range(args.interactive):
+                time.sleep(args.window / 4)
+                th = threading.Thread(target=one, args=(args.batch + j, PRIORITY_INTERACTIVE, time.perf_counter()))
+                th.start()
+                users.append(th)
+            for th in users:
+                th.join()
+
+    ok = server.ok
+    quota = min(args.rps, args.tps / (sum(costs) / len(costs)))
+    print(f"{mode:9s} ok {ok:4d}  failed {sum(failed.values()):4d}  server 429s {server.rejected:5d}  "
+          f"throughput {ok / t.elapsed:5.1f}/s (quota ~{quota:.1f}/s)  wall {t.elapsed:5.1f} s")
+    for priority, name in [(PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BATCH, "batch")]:
+        if latencies[priority]:
+            s = summarize(latencies[priority])
+            print(f"    {name:11s} ok {len(latencies[priority]):4d} failed {failed[priority]:4d}  "
+                  f"latency since arrival p50 {s['p50_ms'] / 1000:5.2f} s  p99 {s['p99_ms'] / 1000:5.2f} s")
+        else:
+            print(f"    {name:11s} ok    0 failed {failed[priority]:4d}")
+    if mode == "scheduler":
+        st = scheduler.stats()
+        print(f"    learned tpm {st['tpm']} (server {args.tps * args.window:g}), rpm {st['rpm']} "
+              f"(server {args.rps * args.window:g}), retries {st['retries']}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=300)
+    ap.add_argument("--interactive", type=int, default=12)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--rps", type=float, default=40, help="server request quota per second")
+    ap.add_argument("--tps", type=float, default=20000, help="server token quota per second")
+    ap.add_argument("--window", type=float, default=1.0, help="quota window in seconds (Groq: 60)")
+    ap.add_argument("--llm-ms", type=float, default=30.0)
+    ap.add_argument("--max-wait", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    llm_scheduler.LIMIT_WINDOW = args.window
+    logging.getLogger("invoice").setLevel(logging.ERROR)  # retry messages
+    for mode in ["naive", "scheduler"]:
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_ocr_backends.py
+"""
+Receipts/second: the old in-process pytesseract path (one tesseract process
+per image) vs the persistent OCR worker pool.
+
+    python -m benchmarks.bench_ocr_backends --n 40
+    OCR_BACKEND=pytesseract python -m benchmarks.bench_ocr_backends
+"""
+import argparse
+import os
+import tempfile
+
+from PIL import Image
+
+from backend.services import ocr_service
+from backend.services.ocr_backend import PytesseractBackend
+from benchmarks.common import VENDORS, Timer, make_receipt_image
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_ocr_")
+    paths = []
+    for i in range(args.n):
+        p = os.path.join(tmp, f"receipt_{i}.png")
+        make_receipt_image(VENDORS[i % len(VENDORS)], "2025-01-15", f"{100 + i}.00", seed=i).save(p)
+        paths.append(p)
+
+    # Baseline: what ocr_image used to do, in-process pytesseract
+    old = PytesseractBackend()
+    with Timer() as t_old:
+        for p in paths:
+            old.image_to_string(Image.open(p))
+
+    # Warm the pool so worker start-up isn't billed to the first receipts
+    ocr_service.ocr_image(paths[0])
+    with Timer() as t_new:
+        futures = [ocr_service.get_pool().submit(ocr_service._ocr_image_bytes, open(p, "rb").read()) for p in paths]
+        for f in futures:
+            f.result()
+
+    print(f"receipts:            {args.n}")
+    print(f"pytesseract (old):   {args.n / t_old.elapsed:8.2f} receipts/s")
+    print(f"worker pool ({os.getenv('OCR_BACKEND', 'auto')}): {args.n / t_new.elapsed:8.2f} receipts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_ocr_preprocess.py
+"""
+OCR time and accuracy with and without the preprocessing in ocr_service
+(adaptive render scale, photo downscaling, deskew, binarization), on the
+synthetic corpus: scanned PDFs and JPG receipts, the JPGs blown up to
+--photo-mp megapixels like a phone camera's.
+
+  before  OCR_PREPROCESS=0: pages rendered at scale 3, photos as they come
+  after   OCR_PREPROCESS=1
+
+OCR runs in this process (ocr_service.run_inline) so the time splits into
+prep (render / decode / preprocess) and Tesseract. Without tesseract only
+prep time and the pixels Tesseract would get are reported.
+
+    python -m benchmarks.bench_ocr_preprocess --n 30 --photo-mp 12
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from benchmarks import corpus
+from benchmarks.common import summarize
+from benchmarks.suite import accuracy, score, tesseract_missing
+
+
+class RecordingBackend:
+    """Wraps the real backend (or none): pixels and time of every Tesseract call."""
+    name = "recording"
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.pixels = []
+        self.ocr_seconds = 0.0
+
+    def image_to_string(self, image) -> str:
+        self.pixels.append(image.width * image.height)
+        if self.backend is None:
+            return ""
+        t0 = time.perf_counter()
+        try:
+            return self.backend.image_to_string(image)
+        finally:
+            self.ocr_seconds += time.perf_counter() - t0
+
+
+def as_phone_photos(docs, corpus_dir: str, megapixels: float):
+    for d in docs:
+        if d["kind"] != "jpg":
+            continue
+        path = os.path.join(corpus_dir, d["file"])
+        with Image.open(path) as img:
+            f = math.sqrt(megapixels * 1e6 / (img.width * img.height))
+            big = img.resize((round(img.width * f), round(img.height * f)), Image.BICUBIC)
+        big.save(path, "JPEG", quality=90)
+
+
+def run(mode: str, docs, backend):
+    from backend.services import ocr_service
+    from backend.services.field_extractor import extract_fields
+    ocr_service.OCR_PREPROCESS = mode == "after"
+    rows = {}
+    for kind, fn in (("scan_pdf", ocr_service.ocr_pdf), ("jpg", ocr_service.ocr_image)):
+        subset = [d for d in docs if d["kind"] == kind]
+        if not subset:
+            continue
+        rec = ocr_service._backend = RecordingBackend(backend)
+        fn(subset[0]["path"])  # warm-up
+        rec.pixels.clear()
+        rec.ocr_seconds = 0.0
+        latencies, texts = [], []
+        for d in subset:
+            t0 = time.perf_counter()
+            texts.append(fn(d["path"]))
+            latencies.append(time.perf_counter() - t0)
+        total = sum(latencies)
+        row = {**summarize(latencies), "prep_ms": round((total - rec.ocr_seconds) / len(subset) * 1000, 1),
+               "ocr_ms": round(rec.ocr_seconds / len(subset) * 1000, 1),
+               "mpix": round(sum(rec.pixels) / len(rec.pixels) / 1e6, 2)}
+        if backend is not None:
+            row.update(accuracy([score(extract_fields(t), d) for t, d in zip(texts, subset)]))
+        rows[kind] = row
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=30, help="documents, scanned PDFs and JPGs in turn")
+    ap.add_argument("--photo-mp", type=float, default=12.0, help="JPG receipts are enlarged to this many megapixels")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    logging.getLogger("invoice").setLevel(logging.ERROR)
+
+    from backend.services import ocr_service
+    ocr_service.run_inline()
+    missing = tesseract_missing()
+    backend = None if missing else ocr_service._backend
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        docs = corpus.generate(corpus_dir, args.n, args.seed, kinds=("scan_pdf", "jpg"))
+        as_phone_photos(docs, corpus_dir, args.photo_mp)
+        for d in docs:
+            d["path"] = os.path.join(corpus_dir, d["file"])
+
+        print(f"{args.n} documents, photos {args.photo_mp:g} MP, cpus {os.cpu_count()}")
+        if missing:
+            print(f"OCR skipped ({missing}): prep time and pixels only")
+        for mode in ("before", "after"):
+            for kind, row in run(mode, docs, backend).items():
+                print(f"{mode:6s} {kind:8s} " + "  ".join(f"{k} {v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
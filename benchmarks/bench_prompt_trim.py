@@ -0,0 +1,91 @@
+# benchmarks/bench_prompt_trim.py
+"""
+Prompt trimming (field_extractor.prompt_excerpt): tokens sent to the LLM
+per document, with and without the LLM_PROMPT_TOKENS budget, and whether
+the excerpt still holds what the model has to find.
+
+Sample set: the field extractor golden corpus (short receipts, which pass
+through unchanged) plus generated multi-page statements with known vendor,
+date and grand total, 20-600 line items and per-page "Page total" lines.
+
+Accuracy, measured without calling the LLM:
+  kept    - the true vendor, date and total strings all appear in the excerpt
+  regex   - the regex extractor gives the same fields on the excerpt as on
+            the full text (the LLM sees what the regex rules rely on)
+
+    python -m benchmarks.bench_prompt_trim --statements 200 --budget 1500
+"""
+import argparse
+import json
+import random
+
+from backend.core.config import LLM_PROMPT_TOKENS
+from backend.services.field_extractor import prompt_excerpt, extract_fields
+from backend.utils.text_utils import estimate_tokens
+from benchmarks.bench_field_extractor import GOLDEN_PATH, ITEMS, ADDRESSES
+from benchmarks.common import VENDORS, Timer, summarize
+
+
+def make_statement(rng: random.Random):
+    """(text, truth) for a long multi-page statement."""
+    vendor = rng.choice(VENDORS) + rng.choice(["", " Pvt Ltd", " Wholesale"])
+    date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025"
+    header = [vendor, rng.choice(ADDRESSES), f"GSTIN: 29ABCDE{rng.randint(1000, 9999)}F1Z5"]
+    lines = header + [f"Invoice Date: {date}", f"Statement No: {rng.randint(10000, 99999)}",
+                      "Customer Name: Priya Sharma", ""]
+    n_items, per_page = rng.randint(20, 600), 40
+    subtotal = page_total = 0.0
+    for i in range(n_items):
+        price = rng.randint(20, 900) + rng.choice([0, 0.5, 0.25])
+        qty = rng.randint(1, 5)
+        subtotal += price * qty
+        page_total += price * qty
+        lines.append(f"{i + 1:4d} {rng.choice(ITEMS):<14} {qty} x {price:8.2f} {price * qty:10.2f}")
+        if (i + 1) % per_page == 0 and i + 1 < n_items:
+            page = (i + 1) // per_page
+            lines += [f"Page total Rs {page_total:,.2f}", f"Page {page} of {n_items // per_page + 1}",
+                      f"{vendor} - continued", ""]
+            page_total = 0.0
+    tax = round(subtotal * 0.05, 2)
+    total = f"{subtotal + tax:,.2f}"
+    lines += [f"Subtotal Rs {subtotal:,.2f}", f"CGST 2.5% Rs {tax / 2:,.2f}", f"SGST 2.5% Rs {tax / 2:,.2f}",
+              f"Grand Total Rs {total}", "Amount in words: rupees only", "Thank you for your business!"]
+    return "\n".join(lines), {"vendor": vendor, "date": date, "amount": total}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--statements", type=int, default=200)
+    ap.add_argument("--budget", type=int, default=LLM_PROMPT_TOKENS, help="LLM_PROMPT_TOKENS")
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        receipts = [c["text"] for c in json.load(f)]
+    statements = [make_statement(rng) for _ in range(args.statements)]
+
+    for name, docs in [("receipts", [(t, None) for t in receipts]), ("statements", statements)]:
+        full_tokens, trimmed_tokens, latencies = [], [], []
+        kept = regex_same = changed = 0
+        for text, truth in docs:
+            with Timer() as t:
+                excerpt = prompt_excerpt(text, args.budget)
+            latencies.append(t.elapsed)
+            full_tokens.append(estimate_tokens(text))
+            trimmed_tokens.append(estimate_tokens(excerpt))
+            changed += excerpt != text
+            if truth is None or all(v in excerpt for v in truth.values()):
+                kept += 1
+            regex_same += extract_fields(excerpt) == extract_fields(text)
+
+        n = len(docs)
+        full, trimmed = sum(full_tokens), sum(trimmed_tokens)
+        s = summarize(latencies)
+        print(f"{name:10s} n={n:4d} trimmed {changed:4d}  tokens/doc {full / n:7.0f} -> {trimmed / n:6.0f} "
+              f"(max {max(full_tokens):6d} -> {max(trimmed_tokens):5d}, {1 - trimmed / full:5.1%} saved)  "
+              f"kept {kept / n:6.1%}  regex same {regex_same / n:6.1%}  trim {s['mean_ms']:.2f} ms/doc")
+
+
+if __name__ == "__main__":
+    main()
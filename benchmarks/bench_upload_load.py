@@ -0,0 +1,133 @@
+# benchmarks/bench_upload_load.py
+"""
+Load test for POST /upload (confirm uploads, in-process over ASGI):
+--clients concurrent users, each uploading distinct text PDFs back to back.
+pdfium reads the real text layer; the LLM (--llm-ms) and Drive
+(--drive-ms) are stand-ins that only wait, with no quota.
+
+  threadpool - the old handler: every stage hops onto Starlette's shared
+               thread pool (40 threads) and the LLM call holds its thread
+  staged     - the real /upload (services/stages.py): extraction on its
+               own threads, LLM awaited on the loop, per-stage limits
+
+    python -m benchmarks.bench_upload_load --uploads 300 --clients 128 --llm-ms 1500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+from benchmarks.common import FakeAsyncGroq, FakeGroq, make_pdfs, scratch_env, session_cookie, summarize
+
+_tmp = scratch_env("bench_upload_")
+os.environ["LLM_CACHE_TTL"] = "0"
+
+import httpx  # noqa: E402
+from fastapi import File, Form, HTTPException, Request, UploadFile  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+import backend.main as app_main  # noqa: E402
+from backend.core.storage import discard, ingest  # noqa: E402
+from backend.db import insert_invoice  # noqa: E402
+from backend.services import llm_scheduler, llm_service, pipeline, stages  # noqa: E402
+from backend.services.llm_scheduler import PRIORITY_UPLOAD  # noqa: E402
+from backend.services.pipeline import (  # noqa: E402
+    StageTimer, build_naming, extract_fields, extract_text, invoice_record, store_file, success_response,
+    upload_file_to_drive,
+)
+
+
+async def threadpool_upload(request: Request, file: UploadFile = File(...), provided_vendor: str = Form(None)):
+    """/upload before the stages: the same steps, each one run_in_threadpool."""
+    creds_json = request.session.get("user_creds")
+    ext = os.path.splitext(file.filename)[1].lower()
+    timer = StageTimer()
+    temp_path, content_hash = await run_in_threadpool(ingest, file.file, ext)
+    try:
+        text, cached = await run_in_threadpool(extract_text, temp_path, ext, content_hash)
+        fields = await run_in_threadpool(extract_fields, text, content_hash, cached, None, False,
+                                         priority=PRIORITY_UPLOAD)
+        naming = build_naming(fields, ext, file.filename, False)
+        final_path = store_file(temp_path, naming)
+        drive_links = await run_in_threadpool(upload_file_to_drive, final_path, naming, creds_json)
+        await run_in_threadpool(
+            insert_invoice, invoice_record(file.filename, content_hash, timer, naming, final_path, drive_links, text=text)
+        )
+        return success_response(naming, final_path, drive_links)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        discard(temp_path)
+
+
+# ahead of the frontend's catch-all route
+app_main.app.post("/bench/threadpool-upload")(threadpool_upload)
+app_main.app.router.routes.insert(0, app_main.app.router.routes.pop())
+
+
+async def run(mode: str, pdfs, args):
+    path = "/upload" if mode == "staged" else "/bench/threadpool-upload"
+    for s in stages.STAGES.values():
+        s._waits.clear()
+        s._runs.clear()
+    queue = asyncio.Queue()
+    for i, pdf in enumerate(pdfs):
+        queue.put_nowait((i, pdf))
+    latencies, failed = [], 0
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600,
+                                 cookies={"invoice_session": session_cookie()}) as client:
+        async def user():
+            nonlocal failed
+            while not queue.empty():
+                i, pdf = queue.get_nowait()
+                t0 = time.perf_counter()
+                r = await client.post(path, files={"file": (f"{mode}_{i}.pdf", pdf, "application/pdf")})
+                if r.status_code == 200:
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    failed += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[user() for _ in range(args.clients)])
+        elapsed = time.perf_counter() - t0
+
+    s = summarize(latencies or [0.0])
+    print(f"{mode:10s} ok {len(latencies):4d} failed {failed:3d}  {len(latencies) / elapsed:5.1f} uploads/s  "
+          f"p50 {s['p50_ms']:7.1f} ms  p99 {s['p99_ms']:7.1f} ms")
+    if mode == "staged":
+        for name, st in stages.stats().items():
+            if st["done"]:
+                print(f"    {name:14s} limit {st['limit']:3d}  wait p50/p99 {st['wait_p50_ms']:7.1f} /"
+                      f"{st['wait_p99_ms']:7.1f} ms  run p50/p99 {st['run_p50_ms']:7.1f} /{st['run_p99_ms']:7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=300)
+    ap.add_argument("--clients", type=int, default=128)
+    ap.add_argument("--llm-ms", type=float, default=1500.0)
+    ap.add_argument("--drive-ms", type=float, default=150.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    llm_service.api_key = "bench"
+    logging.getLogger("invoice").setLevel(logging.ERROR)  # per-document log lines
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    llm_service.get_client = lambda: FakeGroq(args.llm_ms / 1000)
+    llm_service.get_async_client = lambda: FakeAsyncGroq(args.llm_ms / 1000)
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(rpm=1e9, tpm=1e12)
+    pipeline.upload_to_drive = lambda **kw: time.sleep(args.drive_ms / 1000) or {"file_link": "f", "folder_link": "d"}
+
+    print(f"uploads={args.uploads} clients={args.clients} llm_ms={args.llm_ms:g} drive_ms={args.drive_ms:g} "
+          f"cpus={os.cpu_count()}")
+    for mode in ["threadpool", "staged"]:
+        pdfs = make_pdfs(args.uploads, random.Random(f"{args.seed}-{mode}"))
+        asyncio.run(run(mode, pdfs, args))
+
+
+if __name__ == "__main__":
+    main()
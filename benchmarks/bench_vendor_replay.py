@@ -0,0 +1,148 @@
+# benchmarks/bench_vendor_replay.py
+"""
+Replays a synthetic upload history through pipeline.extract_fields with the
+learned vendor dictionary off, on (shorter LLM prompt for known vendors) and
+on with VENDOR_SKIP_LLM. Vendor popularity is Zipf-like, as in real use:
+a few hundred vendors, a handful of them on most invoices. After each
+document the true fields are "confirmed" (insert_invoice), which is what
+teaches the dictionary.
+
+The LLM is a stand-in that returns the true fields; its latency is modelled
+as --llm-ms per call rather than slept, so the run stays fast:
+modelled ms/doc = measured local time + LLM calls * llm_ms / docs.
+
+    python -m benchmarks.bench_vendor_replay --docs 3000 --vendors 300
+"""
+import argparse
+import os
+import random
+import tempfile
+
+# Scratch database before backend imports
+_tmp = tempfile.mkdtemp(prefix="bench_vendor_")
+os.environ["DB_PATH"] = os.path.join(_tmp, "replay.db")
+
+from backend import db  # noqa: E402
+from backend.services import pipeline, vendor_index  # noqa: E402
+from backend.services.field_extractor import extract_vendor  # noqa: E402
+from backend.utils.text_utils import vendor_key  # noqa: E402
+from benchmarks.common import Timer  # noqa: E402
+
+WORDS_A = ["Blue", "Golden", "Royal", "Green", "Urban", "Fresh", "Happy", "Silver", "Spice", "Sunrise",
+           "Little", "Grand", "Coastal", "Mountain", "Classic", "Modern", "Lucky", "Daily", "Prime", "Metro"]
+WORDS_B = ["Tokai", "Bakery", "Kitchen", "Mart", "Pharmacy", "Dhaba", "Books", "Electronics", "Bistro",
+           "Garage", "Tailors", "Opticals", "Stores", "Sweets", "Brewery", "Salon", "Traders", "Foods", "Cafe", "Tech"]
+SUFFIXES = ["", " Pvt Ltd", " Private Limited", " LLP", " Inc"]
+
+
+def make_vendors(n: int, rng: random.Random):
+    names = set()
+    while len(names) < n:
+        names.add(f"{rng.choice(WORDS_A)} {rng.choice(WORDS_B)}{rng.choice(['', ' ' + rng.choice(WORDS_B)])}")
+    return sorted(names)
+
+
+def ocr_typo(s: str, rng: random.Random) -> str:
+    i = rng.randrange(len(s))
+    return s[:i] + rng.choice("lI1oO0e") + s[i + 1:]
+
+
+def make_upload(vendor: str, rng: random.Random):
+    """(text, truth) for one invoice from `vendor`, with the header variations seen in practice."""
+    header = vendor + rng.choice(SUFFIXES)
+    roll = rng.random()
+    if roll < 0.25:
+        header = header.upper()
+    elif roll < 0.35:
+        header = f"Merchant: {header}"
+    elif roll < 0.45:
+        header = ocr_typo(header, rng)
+    elif roll < 0.55:
+        header = f"{header} - {rng.choice(['Koramangala', 'Indiranagar', 'HSR Layout'])}"
+
+    date = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    amount = f"{rng.randint(50, 5000)}.{rng.randint(0, 99):02d}"
+    lines = [header, "12 MG Road, Bengaluru 560001", f"GSTIN: 29ABCDE{rng.randint(1000, 9999)}F1Z5",
+             f"Invoice Date: {date}", f"Bill No: {rng.randint(1000, 99999)}"]
+    for i in range(rng.randint(2, 10)):
+        lines.append(f"Item {i + 1} x{rng.randint(1, 3)} {rng.randint(20, 400)}.00")
+    lines += [f"CGST 2.5% {rng.randint(1, 50)}.00", f"Grand Total Rs {amount}", "Thank you, visit again!"]
+    return "\n".join(lines), {"vendor": vendor, "date": date.replace("-", "_"), "amount": amount}
+
+
+def replay(uploads, mode: str, llm_ms: float):
+    # fresh dictionary for every mode
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db.DB_PATH + suffix):
+            os.remove(db.DB_PATH + suffix)
+    db._pool.queue.clear()
+    db.init_db()
+
+    stats = {"calls": 0, "short_prompts": 0, "prompt_chars": 0}
+    truth_by_text = {}
+
+    def fake_llm(text, known_vendor=None):
+        stats["calls"] += 1
+        stats["short_prompts"] += bool(known_vendor)
+        # the vendor spec line is ~25 chars of the ~330-char instructions
+        stats["prompt_chars"] += len(text) + (300 if known_vendor else 330)
+        truth = truth_by_text[text]
+        return {**truth, "vendor": known_vendor or truth["vendor"]}
+
+    pipeline.extract_invoice_data_with_llm = fake_llm
+    pipeline.VENDOR_SKIP_LLM = mode == "dictionary+skip"
+    match_vendor = pipeline.match_vendor
+    if mode == "off":
+        pipeline.match_vendor = lambda text: None
+
+    correct = {"vendor": 0, "date": 0, "amount": 0}
+    elapsed = 0.0
+    for i, (text, truth) in enumerate(uploads):
+        truth_by_text[text] = truth
+        # every upload sees everything confirmed before it (the app reloads every
+        # VENDOR_INDEX_REFRESH seconds instead); the rebuild is not timed
+        vendor_index._loaded_at = float("-inf")
+        vendor_index.get_index()
+        with Timer() as t:
+            fields = pipeline.extract_fields(text, f"replay-{i}")
+        elapsed += t.elapsed
+        correct["vendor"] += vendor_key(fields["vendor"]) == vendor_key(truth["vendor"])
+        correct["date"] += fields["date"] == truth["date"]
+        correct["amount"] += str(fields["amount"]).replace("Rs", "").strip() == truth["amount"]
+        db.insert_invoice({"vendor_raw": truth["vendor"], "vendor_norm": truth["vendor"], "status": "success",
+                          "vendor_confirmed": True})
+    pipeline.match_vendor = match_vendor
+
+    n = len(uploads)
+    local_ms = elapsed * 1000 / n
+    print(f"{mode:16s} llm calls {stats['calls']:5d} ({stats['short_prompts']:5d} short)  "
+          f"prompt chars {stats['prompt_chars'] / n:6.0f}/doc  "
+          f"local {local_ms:5.2f} ms/doc  modelled {local_ms + stats['calls'] * llm_ms / n:6.1f} ms/doc  "
+          f"correct vendor {correct['vendor'] / n:.1%} date {correct['date'] / n:.1%} amount {correct['amount'] / n:.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=3000)
+    ap.add_argument("--vendors", type=int, default=300)
+    ap.add_argument("--llm-ms", type=float, default=400.0, help="modelled latency of one LLM call")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    vendors = make_vendors(args.vendors, rng)
+    weights = [1 / (rank + 1) for rank in range(len(vendors))]
+    uploads = [make_upload(v, rng) for v in rng.choices(vendors, weights=weights, k=args.docs)]
+
+    # the regex extractor is what runs when the LLM is down; for reference
+    with Timer() as t:
+        regex_ok = sum(vendor_key(extract_vendor(text)) == vendor_key(truth["vendor"]) for text, truth in uploads)
+    print(f"docs={args.docs} vendors={args.vendors} llm_ms={args.llm_ms:g}")
+    print(f"regex extract_vendor: correct {regex_ok / len(uploads):.1%}, {t.elapsed * 1000 / len(uploads):.2f} ms/doc")
+
+    for mode in ["off", "dictionary", "dictionary+skip"]:
+        replay(uploads, mode, args.llm_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_web_workers.py
+"""
+Throughput of a real server (uvicorn over HTTP) as WEB_CONCURRENCY grows.
+Each run starts `uvicorn backend.main:app --workers N` on a scratch
+database and storage folder, waits until all N workers have a heartbeat,
+and has --clients concurrent users post dry-run uploads of distinct text
+PDFs: ingest, duplicate check, pdfium on the extraction threads, regex
+fields (no LLM key, so no network). The OCR pool gets the default
+per-worker share of the cores.
+
+After the load, /metrics is scraped from whichever worker answers; its
+upload count must equal the uploads sent, whichever workers served them.
+
+    python -m benchmarks.bench_web_workers --workers 1,2,4 --uploads 400 --clients 32
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import make_pdfs, summarize
+
+HEARTBEAT = 1.0
+
+
+def start_server(workers: int, port: int, tmp: str) -> subprocess.Popen:
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "WORKER_HEARTBEAT": str(HEARTBEAT),
+           "DB_PATH": os.path.join(tmp, "bench.db"), "STORAGE_ROOT": os.path.join(tmp, "storage"),
+           "GROQ_API_KEY": ""}
+    with open(os.path.join(tmp, "server.log"), "w") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+
+def metric(text: str, name: str, **labels) -> float:
+    """Sum of the samples of `name` whose labels include `labels`."""
+    total = 0.0
+    for m in re.finditer(rf"^{name}(?:{{(.*?)}})? (\S+)$", text, re.M):
+        have = dict(re.findall(r'(\w+)="([^"]*)"', m.group(1) or ""))
+        if all(have.get(k) == v for k, v in labels.items()):
+            total += float(m.group(2))
+    return total
+
+
+async def wait_ready(client: httpx.AsyncClient, workers: int, timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            r = await client.get("/metrics")
+            if workers == 1 or metric(r.text, "invoice_web_workers") >= workers:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"server with {workers} worker(s) did not come up")
+
+
+async def load(client: httpx.AsyncClient, pdfs, clients: int):
+    queue = asyncio.Queue()
+    for i, pdf in enumerate(pdfs):
+        queue.put_nowait((i, pdf))
+    latencies, failed = [], 0
+
+    async def user():
+        nonlocal failed
+        while not queue.empty():
+            i, pdf = queue.get_nowait()
+            t0 = time.perf_counter()
+            r = await client.post("/upload?dry_run=true", files={"file": (f"{i}.pdf", pdf, "application/pdf")})
+            if r.status_code == 200 and r.json().get("status") == "dry_run":
+                latencies.append(time.perf_counter() - t0)
+            else:
+                failed += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[user() for _ in range(clients)])
+    return latencies, failed, time.perf_counter() - t0
+
+
+async def run(workers: int, args, port: int):
+    tmp = tempfile.mkdtemp(prefix="bench_web_")
+    server = start_server(workers, port, tmp)
+    rng = random.Random(f"{args.seed}-{workers}")
+    warmup, pdfs = make_pdfs(workers * 4, rng), make_pdfs(args.uploads, rng)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600,
+                                     limits=httpx.Limits(max_connections=args.clients)) as client:
+            try:
+                await wait_ready(client, workers)
+            except RuntimeError:
+                with open(os.path.join(tmp, "server.log")) as f:
+                    print(f.read()[-3000:])
+                raise
+            await load(client, warmup, args.clients)
+            latencies, failed, elapsed = await load(client, pdfs, args.clients)
+
+            await asyncio.sleep(HEARTBEAT * 2)  # other workers' snapshots are up to a heartbeat old
+            counted = [metric((await client.get("/metrics")).text, "invoice_http_requests_total",
+                              route="/upload", status="200") for _ in range(workers * 2)]
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    sent = len(warmup) + len(pdfs)
+    return {"rate": len(latencies) / elapsed, "failed": failed, **summarize(latencies or [0.0]),
+            "metrics_ok": all(c == sent for c in counted), "counted": sorted(set(counted)), "sent": sent}
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default = ",".join(str(n) for n in sorted({1, 2, 4, cpus}) if n <= max(cpus, 2))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default=default, help="comma-separated WEB_CONCURRENCY values")
+    ap.add_argument("--uploads", type=int, default=400)
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"uploads={args.uploads} clients={args.clients} cpus={cpus}")
+    base = None
+    for n in (int(w) for w in args.workers.split(",")):
+        r = asyncio.run(run(n, args, args.port))
+        base = base or r["rate"]
+        print(f"workers {n:2d}  {r['rate']:6.1f} uploads/s  x{r['rate'] / base:4.2f} "
+              f"(efficiency {r['rate'] / base / n:4.0%})  p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+              f"failed {r['failed']}  /metrics uploads {r['counted']} of {r['sent']} "
+              f"{'ok' if r['metrics_ok'] else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/common.py
+"""Shared helpers for the benchmark scripts. Run benchmarks from the repo root,
+e.g. `python -m benchmarks.bench_ocr_backends`."""
+import asyncio
+import base64
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+VENDORS = ["California Burrito", "Swiggy", "Blue Tokai Coffee", "Reliance Fresh", "Cafe Coffee Day"]
+
+
+def make_receipt_image(vendor: str, date: str, amount: str, n_items: int = 6, seed: int = 0) -> Image.Image:
+    """A plain white receipt with the usual header / items / total layout."""
+    rng = random.Random(seed)
+    font = ImageFont.load_default()
+    lines = [vendor, "12 MG Road, Bengaluru", f"Invoice Date: {date}", ""]
+    for i in range(n_items):
+        lines.append(f"Item {i + 1:<20} {rng.randint(20, 400)}.00")
+    lines += ["", f"Grand Total Rs {amount}"]
+
+    img = Image.new("L", (600, 40 + 24 * len(lines)), 255)
+    draw = ImageDraw.Draw(img)
+    for i, ln in enumerate(lines):
+        draw.text((30, 20 + 24 * i), ln, fill=0, font=font)
+    return img
+
+
+def scratch_env(prefix: str) -> str:
+    """
+    Points DB_PATH / STORAGE_ROOT at a scratch directory; call before any
+    backend import. Spawned pool workers re-import the benchmark module and
+    get the parent's directory back instead of a new one.
+    """
+    tmp = os.environ.get("BENCH_SCRATCH") or tempfile.mkdtemp(prefix=prefix)
+    os.environ["BENCH_SCRATCH"] = tmp
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["STORAGE_ROOT"] = os.path.join(tmp, "storage")
+    return tmp
+
+
+def summarize(latencies):
+    """latencies in seconds -> dict of ms stats"""
+    s = sorted(latencies)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "n": len(s),
+        "mean_ms": round(statistics.mean(s) * 1000, 2),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def make_text_pdf(pages) -> bytes:
+    """A PDF with a text layer: pages is a list of lists of lines (Helvetica 10pt)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for ln in lines:
+            esc = ln.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({esc}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+class FakeGroq:
+    """Stand-in for the Groq client: answers `fields` after `latency` seconds (the call holds its thread)."""
+
+    def __init__(self, latency: float, fields=None):
+        self.latency = latency
+        self.fields = fields or {"vendor": "Bench Vendor", "date": "2025_01_01", "amount": "100.00"}
+        self.chat = self.completions = self.with_raw_response = self
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return self
+
+    # raw response: headers + parse()
+    headers = {}
+
+    def parse(self):
+        message = type("Message", (), {"content": json.dumps(self.fields)})
+        return type("Completion", (), {"choices": [type("Choice", (), {"message": message})]})
+
+
+class FakeAsyncGroq(FakeGroq):
+    """FakeGroq for the async path: waits without holding a thread."""
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self
+
+
+def make_pdfs(n: int, rng: random.Random):
+    """n distinct one-page text PDF invoices (vendor, bill number, date, 20-40 items, total)."""
+    pdfs = []
+    for i in range(n):
+        items = [f"Item {j} {rng.choice(['Masala Tea', 'Paneer Roll', 'Cold Coffee', 'Veg Thali'])} "
+                 f"{rng.randint(20, 400)}.00" for j in range(rng.randint(20, 40))]
+        pdfs.append(make_text_pdf([[f"Vendor {i} Traders", f"Bill No: {rng.randint(1, 10 ** 9)}",
+                                    f"Invoice Date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+                                    *items, f"Grand Total Rs {rng.randint(500, 9000)}.00"]]))
+    return pdfs
+
+
+def session_cookie(creds: str = "{}") -> str:
+    """A signed session cookie (invoice_session) that carries Drive credentials, as after OAuth."""
+    import itsdangerous
+    signer = itsdangerous.TimestampSigner(os.getenv("SECRET_KEY", "super-secret-key-change-me"))
+    return signer.sign(base64.b64encode(json.dumps({"user_creds": creds}).encode())).decode()
@@ -0,0 +1,135 @@
+# benchmarks/corpus.py
+"""
+Synthetic invoice corpus with known answers, for the benchmark suite:
+
+  text_pdf   - PDF with a text layer (text-layer path)
+  scan_pdf   - image-only PDF of a slightly rotated, noisy page (OCR path)
+  jpg        - phone-photo style JPG receipt (image OCR path)
+
+generate() writes the files and manifest.json:
+  [{"file", "kind", "vendor", "date": "YYYY_MM_DD", "amount": "1234.00", "pages"}]
+
+    python -m benchmarks.corpus --out /tmp/corpus --n 60
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from benchmarks.common import VENDORS, make_text_pdf
+
+KINDS = ("text_pdf", "scan_pdf", "jpg")
+
+ITEMS = ["Masala Tea", "Paneer Roll", "Cold Coffee", "Veg Thali", "Notebook A4", "USB Cable", "Printer Paper",
+         "Croissant", "Filter Coffee", "Service Charge", "Delivery Fee", "Mineral Water"]
+CITIES = ["MG Road, Bengaluru", "Linking Road, Mumbai", "Park Street, Kolkata", "Anna Salai, Chennai"]
+# How the date is printed, the way real invoices vary
+DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d %b %Y", "%d %B %Y"]
+DATE_LABELS = ["Invoice Date:", "Date:", "Bill Date:", "Dated"]
+TOTAL_LABELS = ["Grand Total Rs", "Total Amount: Rs.", "Amount Payable INR", "TOTAL"]
+
+
+def invoice_lines(rng: random.Random, vendor: str, day: date, amount: float, n_items: int):
+    """Header, line items and total (the total is the known answer, not the sum of the items)."""
+    lines = [vendor, f"{rng.randint(1, 200)} {rng.choice(CITIES)}", f"GSTIN: 29ABCDE{rng.randint(1000, 9999)}F1Z5",
+             f"Bill No: {rng.randint(1, 10 ** 6)}", f"{rng.choice(DATE_LABELS)} {day.strftime(rng.choice(DATE_FORMATS))}",
+             ""]
+    for _ in range(n_items):
+        lines.append(f"{rng.choice(ITEMS):<18} {rng.randint(1, 4)} x {rng.randint(10, 400)}.00")
+    lines += ["", f"{rng.choice(TOTAL_LABELS)} {amount:,.2f}", "Thank you! Visit again"]
+    return lines
+
+
+def render_page(lines, width: int = 1240, font_size: int = 28, margin: int = 80, a4: bool = True) -> Image.Image:
+    """White page at ~150 dpi (A4 width 1240 px) with black text; a4=False fits the height to the text (receipts)."""
+    font = _font(font_size)
+    step = int(font_size * 1.45)
+    height = 2 * margin + step * len(lines)
+    img = Image.new("L", (width, max(int(width * 1.414), height) if a4 else height), 255)
+    draw = ImageDraw.Draw(img)
+    for i, ln in enumerate(lines):
+        draw.text((margin, margin + step * i), ln, fill=0, font=font)
+    return img
+
+
+def scanned(img: Image.Image, rng: random.Random, max_angle: float = 1.5, noise: float = 0.02) -> Image.Image:
+    """What a flatbed scan or phone photo does to a page: skew, blur, speckle, grey background."""
+    img = img.rotate(rng.uniform(-max_angle, max_angle), expand=True, fillcolor=255, resample=Image.BICUBIC)
+    img = img.filter(ImageFilter.GaussianBlur(0.6))
+    px = img.load()
+    w, h = img.size
+    for _ in range(int(w * h * noise)):
+        x, y = rng.randrange(w), rng.randrange(h)
+        px[x, y] = rng.choice((0, 90, 200))
+    return img.point(lambda v: int(40 + v * 0.8))
+
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def generate(out_dir: str, n: int, seed: int = 0, kinds=KINDS, pages: int = 1):
+    """n documents, kinds in rotation; returns the manifest (also written to out_dir/manifest.json)."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        vendor = VENDORS[i % len(VENDORS)] if i < len(VENDORS) else rng.choice(VENDORS)
+        day = date(2024, 1, 1) + timedelta(days=rng.randint(0, 700))
+        amount = rng.randint(5000, 900000) / 100
+        doc_pages = [invoice_lines(rng, vendor, day, amount, rng.randint(4, 12))]
+        # continuation pages carry more items; the total stays on page one
+        for _ in range(pages - 1):
+            doc_pages.append([f"{rng.choice(ITEMS):<18} {rng.randint(1, 4)} x {rng.randint(10, 400)}.00"
+                              for _ in range(30)])
+
+        name = f"{i:04d}_{kind}"
+        if kind == "text_pdf":
+            name += ".pdf"
+            with open(os.path.join(out_dir, name), "wb") as f:
+                f.write(make_text_pdf(doc_pages))
+        elif kind == "scan_pdf":
+            name += ".pdf"
+            images = [scanned(render_page(p), rng) for p in doc_pages]
+            images[0].save(os.path.join(out_dir, name), "PDF", resolution=150, save_all=True,
+                           append_images=images[1:])
+        else:
+            name += ".jpg"
+            img = scanned(render_page(doc_pages[0], width=700, font_size=24, margin=40, a4=False), rng, max_angle=3)
+            img.convert("RGB").save(os.path.join(out_dir, name), "JPEG", quality=80)
+
+        manifest.append({"file": name, "kind": kind, "vendor": vendor, "date": day.strftime("%Y_%m_%d"),
+                         "amount": f"{amount:.2f}", "pages": len(doc_pages)})
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load(out_dir: str):
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--n", type=int, default=60)
+    ap.add_argument("--pages", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--kinds", default=",".join(KINDS))
+    args = ap.parse_args()
+    manifest = generate(args.out, args.n, args.seed, tuple(args.kinds.split(",")), args.pages)
+    counts = {k: sum(1 for m in manifest if m["kind"] == k) for k in KINDS}
+    print(f"{len(manifest)} documents in {args.out}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# benchmarks/suite.py
+"""
+The benchmark suite: latency, throughput and accuracy of each hot path on
+a synthetic corpus with known answers (benchmarks/corpus.py).
+
+  extract_text_from_pdf  text PDFs, in process
+  ocr_image              JPG receipts, OCR worker pool      } skipped when
+  ocr_pdf                scanned PDFs, OCR worker pool      } tesseract is missing
+  extract_fields         pipeline.extract_fields on the PDF texts, LLM off
+                         (regex path), accuracy against the manifest
+  upload                 POST /upload in process over ASGI, LLM and Drive
+                         stubbed (--llm-ms / --drive-ms): one at a time for
+                         latency, then --concurrency at once for throughput
+
+Each case runs --repeat times and reports the median of every metric.
+Results go to benchmarks/results/<UTC time>_<commit>.json. --compare prints
+the change against an earlier run and flags regressions beyond --threshold
+percent (exit status 1 with --fail-on-regression).
+
+    python -m benchmarks.suite --n 60
+    python -m benchmarks.suite --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import FakeAsyncGroq, FakeGroq, Timer, scratch_env, session_cookie, summarize
+
+# Scratch database and storage before backend imports
+_tmp = scratch_env("bench_suite_")
+os.environ["LLM_CACHE_TTL"] = "0"
+
+from backend import db  # noqa: E402
+from benchmarks import corpus  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+CASES = ["extract_text_from_pdf", "ocr_image", "ocr_pdf", "extract_fields", "upload"]
+
+# metric -> True when higher is better
+DIRECTIONS = {"docs_per_s": True, "mean_ms": False, "p50_ms": False, "p99_ms": False,
+              "concurrent_docs_per_s": True, "concurrent_p99_ms": False, "failed": False, "concurrent_failed": False}
+
+
+def tesseract_missing():
+    """Why OCR can't run here (None when it can)."""
+    from backend.services.ocr_backend import PytesseractBackend
+    import pytesseract
+    PytesseractBackend()  # applies TESSERACT_CMD
+    try:
+        pytesseract.get_tesseract_version()
+        return None
+    except Exception as e:
+        return f"tesseract not available ({type(e).__name__})"
+
+
+def _amount(value) -> float:
+    digits = re.sub(r"[^\d.]", "", str(value).replace(",", ""))
+    try:
+        return round(float(digits.strip(".")), 2)
+    except ValueError:
+        return -1.0
+
+
+def score(fields, truth) -> dict:
+    """Which of vendor / date / amount match the known answer."""
+    from backend.utils.text_utils import vendor_key
+    return {
+        "vendor": vendor_key(str(fields.get("vendor", ""))) == vendor_key(truth["vendor"]),
+        "date": fields.get("date") == truth["date"],
+        "amount": _amount(fields.get("amount")) == _amount(truth["amount"]),
+    }
+
+
+def accuracy(scores) -> dict:
+    if not scores:
+        return {}
+    return {f"{k}_accuracy": round(sum(s[k] for s in scores) / len(scores), 3) for k in ("vendor", "date", "amount")}
+
+
+def timed(fn, items):
+    """
+    Calls fn(item) for each item in turn: (outputs, latencies, wall seconds).
+    One untimed call first, for imports and worker start-up.
+    """
+    fn(items[0])
+    outputs, latencies = [], []
+    with Timer() as t:
+        for item in items:
+            t0 = time.perf_counter()
+            outputs.append(fn(item))
+            latencies.append(time.perf_counter() - t0)
+    return outputs, latencies, t.elapsed
+
+
+def median_of(runs) -> dict:
+    """Per-metric median over repeated runs of a case."""
+    out = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[key] = statistics.median(r[key] for r in runs)
+        else:
+            out[key] = value
+    return out
+
+
+def result(latencies, elapsed, **extra) -> dict:
+    return {**summarize(latencies), "docs_per_s": round(len(latencies) / elapsed, 2), **extra}
+
+
+# --- cases -----------------------------------------------------------------
+
+def case_extract_text_from_pdf(docs, args):
+    from backend.services.pdf_service import extract_text_from_pdf
+    from backend.services.field_extractor import extract_fields
+    docs = [d for d in docs if d["kind"] == "text_pdf"]
+    texts, latencies, elapsed = timed(extract_text_from_pdf, [d["path"] for d in docs])
+    return result(latencies, elapsed, **accuracy([score(extract_fields(t), d) for t, d in zip(texts, docs)]))
+
+
+def _ocr_case(docs, kind, fn):
+    from backend.services.field_extractor import extract_fields
+    docs = [d for d in docs if d["kind"] == kind]
+    texts, latencies, elapsed = timed(fn, [d["path"] for d in docs])
+    return result(latencies, elapsed, **accuracy([score(extract_fields(t), d) for t, d in zip(texts, docs)]))
+
+
+def case_ocr_image(docs, args):
+    from backend.services.ocr_service import ocr_image
+    return _ocr_case(docs, "jpg", ocr_image)
+
+
+def case_ocr_pdf(docs, args):
+    from backend.services.ocr_service import ocr_pdf
+    return _ocr_case(docs, "scan_pdf", ocr_pdf)
+
+
+def case_extract_fields(docs, args):
+    from backend.services import llm_service, pipeline
+    from backend.services.pdf_service import extract_text_from_pdf
+    docs = [d for d in docs if d["kind"] == "text_pdf"]
+    texts = [extract_text_from_pdf(d["path"]) for d in docs]
+    llm_service.api_key = None  # regex path: the LLM's own latency is the upload case's --llm-ms
+    fields, latencies, elapsed = timed(
+        lambda i: pipeline.extract_fields(texts[i], f"suite-fields-{i}"), list(range(len(texts)))
+    )
+    return result(latencies, elapsed, **accuracy([score(f, d) for f, d in zip(fields, docs)]))
+
+
+def case_upload(docs, args):
+    import httpx
+    import backend.main as app_main
+    from backend.services import llm_scheduler, llm_service, pipeline
+    from backend.services import ocr_service
+
+    llm_service.api_key = "bench"
+    llm_service.get_client = lambda: FakeGroq(args.llm_ms / 1000)
+    llm_service.get_async_client = lambda: FakeAsyncGroq(args.llm_ms / 1000)
+    llm_scheduler._scheduler = llm_scheduler.LLMScheduler(rpm=1e9, tpm=1e12)
+    pipeline.upload_to_drive = lambda **kw: time.sleep(args.drive_ms / 1000) or {"file_link": "f", "folder_link": "d"}
+    ocr_service.get_pool().submit(os.getpid).result()  # start the OCR processes before the clock does
+
+    uploads = [d for d in docs if d["kind"] == "text_pdf" or not args.ocr_skipped]
+    payloads = []
+    for d in uploads:
+        with open(d["path"], "rb") as f:
+            payloads.append((os.path.basename(d["path"]), f.read()))
+
+    async def run(concurrency: int, tag: bytes, queue=None):
+        latencies, failed = [], 0
+        queue = list(payloads) if queue is None else queue
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600,
+                                     cookies={"invoice_session": session_cookie()}) as client:
+            async def user():
+                nonlocal failed
+                while queue:
+                    name, data = queue.pop()
+                    # trailing bytes: new content hash, so the extraction cache starts cold
+                    body = data + b"\n%" + tag if name.endswith(".pdf") else data + tag
+                    t0 = time.perf_counter()
+                    r = await client.post("/upload", files={"file": (name, body)})
+                    if r.status_code == 200:
+                        latencies.append(time.perf_counter() - t0)
+                    else:
+                        failed += 1
+
+            with Timer() as t:
+                await asyncio.gather(*[user() for _ in range(concurrency)])
+        return latencies, failed, t.elapsed
+
+    # a fresh tag per run, so repeats don't hit the extraction cache either
+    tag = str(time.time_ns()).encode()
+    asyncio.run(run(1, b"warmup" + tag, payloads[:1]))  # first request warms pdfium and the caches
+    latencies, failed, elapsed = asyncio.run(run(1, b"sequential" + tag))
+    out = result(latencies, elapsed, failed=failed)
+    latencies, failed, elapsed = asyncio.run(run(args.concurrency, b"concurrent" + tag))
+    s = summarize(latencies)
+    out.update(concurrency=args.concurrency, concurrent_docs_per_s=round(len(latencies) / elapsed, 2),
+               concurrent_p99_ms=s["p99_ms"], concurrent_failed=failed)
+    return out
+
+
+# --- results ---------------------------------------------------------------
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def compare(old: dict, new: dict, threshold: float) -> int:
+    """Prints old -> new per metric; returns the number of regressions."""
+    print(f"\nvs {old['meta']['commit']} ({old['meta']['time']}):")
+    regressions = 0
+    for case, now in new["cases"].items():
+        before = old["cases"].get(case)
+        if not before or "skipped" in before or "skipped" in now:
+            continue
+        for metric, value in now.items():
+            if metric not in before or not isinstance(value, (int, float)) or metric in ("n", "concurrency"):
+                continue
+            higher_better = DIRECTIONS.get(metric, metric.endswith("_accuracy"))
+            if before[metric]:
+                change = (value - before[metric]) / before[metric] * 100
+            else:
+                change = float("inf") if value > 0 else 0.0
+            worse = -change if higher_better else change
+            flag = ""
+            if metric.endswith("_accuracy") and value < before[metric]:
+                flag = "  REGRESSION"
+            elif not metric.endswith("_accuracy") and metric in DIRECTIONS and worse > threshold:
+                flag = "  REGRESSION"
+            regressions += bool(flag)
+            print(f"  {case:22s} {metric:22s} {before[metric]:>10} -> {value:>10}  {change:+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=60, help="documents in the generated corpus (kinds in rotation)")
+    ap.add_argument("--corpus", help="use an existing corpus directory (python -m benchmarks.corpus)")
+    ap.add_argument("--cases", default=",".join(CASES))
+    ap.add_argument("--llm-ms", type=float, default=0.0)
+    ap.add_argument("--drive-ms", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case; each metric is the median")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="results file (default benchmarks/results/<time>_<commit>.json)")
+    ap.add_argument("--compare", help="an earlier results file")
+    ap.add_argument("--threshold", type=float, default=15.0, help="percent change that counts as a regression")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args()
+    logging.getLogger("invoice").setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    db.init_db()
+
+    corpus_dir = args.corpus or os.path.join(_tmp, "corpus")
+    if not args.corpus:
+        corpus.generate(corpus_dir, args.n, args.seed)
+    docs = corpus.load(corpus_dir)
+    for d in docs:
+        d["path"] = os.path.join(corpus_dir, d["file"])
+
+    ocr_missing = tesseract_missing()
+    args.ocr_skipped = bool(ocr_missing)
+    sha, dirty = git_commit()
+    now = datetime.now(timezone.utc)
+    report = {
+        "meta": {
+            "commit": sha + ("-dirty" if dirty else ""), "time": now.isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "corpus": {k: sum(1 for d in docs if d["kind"] == k) for k in corpus.KINDS},
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "cases": {},
+    }
+
+    print(f"commit {report['meta']['commit']}  corpus {report['meta']['corpus']}  cpus {os.cpu_count()}")
+    for name in args.cases.split(","):
+        if name.startswith("ocr_") and ocr_missing:
+            report["cases"][name] = {"skipped": ocr_missing}
+            print(f"{name:22s} skipped: {ocr_missing}")
+            continue
+        case = globals()[f"case_{name}"]
+        out = report["cases"][name] = median_of([case(docs, args) for _ in range(args.repeat)])
+        print(f"{name:22s} " + "  ".join(f"{k} {v}" for k, v in out.items()))
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{now:%Y%m%dT%H%M%S}_{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results: {out_path}")
+
+    regressions = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+    shutil.rmtree(_tmp, ignore_errors=True)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
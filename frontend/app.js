@@ -21,6 +21,7 @@ const clearBtn = document.getElementById("clearBtn");
 
 let currentFile = null;
 let currentFileFields = null; // Store dry-run results
+let currentFileDuplicate = false; // Dry run found an earlier upload; saving keeps both
 
 async function checkDriveStatus() {
   try {
@@ -169,6 +170,7 @@ async function analyzeFile(file) {
 
   // Show Toast
   const toast = showToast(`Analyzing ${file.name}...`, 'progress');
+  currentFileDuplicate = false;
 
 
 
@@ -221,6 +223,11 @@ async function analyzeFile(file) {
         driveLinkContainer.style.display = "none";
         if (clearBtn) clearBtn.style.display = "none";
       }
+    } else if (data.status === "duplicate") {
+      toast.remove();
+      showToast(`⚠️ ${data.detail}. Save again to keep both.`, "error");
+      currentFileDuplicate = true;
+      filenameInput.value = file.name;
     } else if (data.status === "rate_limit") {
       toast.remove();
       showToast("⚠️ Quota Exceeded. Please wait 1 min.", "error");
@@ -245,6 +252,7 @@ async function analyzeFile(file) {
 function handleDeleteSelection() {
   currentFile = null;
   currentFileFields = null;
+  currentFileDuplicate = false;
   fileInput.value = "";
 
   // UI: Show Dropzone, Hide Preview
@@ -308,7 +316,10 @@ async function handleFileUpload(file, customName) {
 
   try {
     // Use custom name flag if we have a custom name
-    const queryParams = customName ? "?use_custom_name=true" : "";
+    const params = new URLSearchParams();
+    if (customName) params.set("use_custom_name", "true");
+    if (currentFileDuplicate) params.set("allow_duplicate", "true");
+    const queryParams = params.toString() ? `?${params}` : "";
     const res = await fetch(`${BACKEND_URL}/upload${queryParams}`, {
       method: "POST",
       body: formData,
@@ -0,0 +1,41 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Before any backend import: a scratch database and storage folder, never backend/data/invoices.db
+_scratch = tempfile.mkdtemp(prefix="invoice_tests_")
+os.environ["DB_PATH"] = os.path.join(_scratch, "test.db")
+os.environ["STORAGE_ROOT"] = os.path.join(_scratch, "storage")
+# in-memory Drive (services/fake_drive.py)
+os.environ["DRIVE_BACKEND"] = "fake"
+
+from backend.db import init_db  # noqa: E402
+
+init_db()
+
+import pytest  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.middleware.sessions import SessionMiddleware  # noqa: E402
+
+
+@pytest.fixture
+def client_for():
+    """
+    client_for(*routers) -> TestClient over just those routers. GET
+    /test-login?owner=... signs the client in as that owner.
+    """
+    def make(*routers):
+        app = FastAPI()
+        app.add_middleware(SessionMiddleware, secret_key="test")
+        for router in routers:
+            app.include_router(router)
+
+        @app.get("/test-login")
+        def login(request: Request, owner: str):
+            request.session["user_creds"] = '{"token": "test"}'
+            request.session["owner"] = owner
+            return {}
+
+        return TestClient(app)
+    return make
@@ -0,0 +1,57 @@
+# tests/test_duplicates.py
+from PIL import Image, ImageDraw
+
+from backend.db import insert_invoice
+from backend.routers.upload import router
+from backend.services.duplicates import check_fields, check_file, image_fingerprint
+from benchmarks.common import make_text_pdf
+
+NAMING = {"safe_vendor": "Dup_Traders", "date_norm": "2024_04_03", "amount_raw": "1,250.00"}
+
+
+def _receipt(path, lines):
+    img = Image.new("L", (500, 700), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((30, 30 + 40 * i), line, fill=0)
+    img.save(path)
+    return str(path)
+
+
+def _upload(owner, content_hash, **extra):
+    return insert_invoice({"original_filename": f"{content_hash}.pdf", "stored_path": f"/s/{content_hash}.pdf",
+                           "status": "success", "content_hash": content_hash, "owner": owner, **extra})
+
+
+def test_lookups_only_see_the_owners_uploads():
+    first = _upload("dup-a", "dup-bytes", vendor_raw="Dup Traders", vendor_norm="Dup_Traders",
+                    date_norm="2024_04_03", amount_raw="1,250.00")
+    assert check_file("dup-bytes", "dup-a")["invoice"]["id"] == first
+    assert check_fields(NAMING, "dup-a")["invoice"]["id"] == first
+    assert check_file("dup-bytes", "dup-b") is None
+    assert check_fields(NAMING, "dup-b") is None
+    # no owner (a dry run before connecting Drive): no lookup at all
+    assert check_file("dup-bytes", None) is None
+    assert check_fields(NAMING, None) is None
+
+
+def test_photo_matches_are_per_owner(tmp_path):
+    lines = ["Photo Dup Cafe", "Date: 01/02/2024", "Total Rs 300.00"]
+    image_hash = image_fingerprint(_receipt(tmp_path / "a.png", lines))
+    first = _upload("photo-a", "photo-bytes-1", image_hash=image_hash)
+    retake = image_fingerprint(_receipt(tmp_path / "b.png", lines))
+    assert check_file("photo-bytes-2", "photo-a", retake)["invoice"]["id"] == first
+    assert check_file("photo-bytes-2", "photo-b", retake) is None
+
+
+def test_anonymous_dry_run_learns_nothing_about_other_uploads(client_for):
+    pdf = make_text_pdf([["Anon Dup Stores", "Invoice Date: 03/04/2024", "Grand Total Rs 990.00"]])
+    client = client_for(router)
+    client.get("/test-login", params={"owner": "anon-dup-owner"})
+    files = {"file": ("a.pdf", pdf, "application/pdf")}
+    assert client.post("/upload", files=files).json()["status"] == "success"
+    assert client.post("/upload", params={"dry_run": True}, files=files).json()["status"] == "duplicate"
+
+    anonymous = client_for(router)
+    result = anonymous.post("/upload", params={"dry_run": True}, files=files).json()
+    assert result["status"] == "dry_run"
@@ -0,0 +1,40 @@
+# tests/test_extraction_cache.py
+import time
+
+from backend.db import connection
+from backend.services import extraction_cache
+from backend.services.extraction_cache import get_cached, put_cached
+
+
+def test_roundtrip_and_fields_kept_on_text_refresh():
+    put_cached("cache-a", "some text", {"vendor": "Acme"})
+    assert get_cached("cache-a") == {"text": "some text", "fields": {"vendor": "Acme"}}
+    put_cached("cache-a", "some text")
+    assert get_cached("cache-a")["fields"] == {"vendor": "Acme"}
+    assert get_cached("cache-missing") is None
+
+
+def test_other_extractor_version_is_a_miss(monkeypatch):
+    put_cached("cache-b", "old text", {"vendor": "Old"})
+    monkeypatch.setattr(extraction_cache, "EXTRACTOR_VERSION", "next")
+    assert get_cached("cache-b") is None
+    # and its fields don't leak into the new version's entry
+    put_cached("cache-b", "new text")
+    assert get_cached("cache-b") == {"text": "new text", "fields": None}
+
+
+def test_expired_entries_miss_and_lru_evicts(monkeypatch):
+    put_cached("cache-c", "text")
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_TTL", 0.05)
+    time.sleep(0.1)
+    assert get_cached("cache-c") is None
+
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_TTL", 3600)
+    monkeypatch.setattr(extraction_cache, "EXTRACTION_CACHE_MAX_BYTES", 25)
+    put_cached("cache-d", "x" * 10)
+    put_cached("cache-e", "y" * 10)
+    get_cached("cache-d")  # now the most recently used
+    put_cached("cache-f", "z" * 10)
+    with connection() as conn:
+        keys = {r["sha256"] for r in conn.execute("SELECT sha256 FROM extraction_cache")}
+    assert {"cache-d", "cache-f"} <= keys and "cache-e" not in keys
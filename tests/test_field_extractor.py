@@ -0,0 +1,18 @@
+# tests/test_field_extractor.py
+import json
+import os
+
+import pytest
+
+from backend.services import field_extractor
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "data", "field_extractor_golden.json")
+
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[f"golden{i}" for i in range(len(GOLDEN))])
+def test_extractor_matches_golden_corpus(case):
+    # regenerate with `python -m benchmarks.bench_field_extractor --write-golden`, only for intended changes
+    assert field_extractor.extract_fields(case["text"]) == case["fields"]
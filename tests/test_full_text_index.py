@@ -0,0 +1,38 @@
+# tests/test_full_text_index.py
+import time
+
+from backend.core.config import PDF_EARLY_EXIT_PAGES
+from backend.db import search_invoices
+from backend.services.pipeline import StageTimer, extract_text, insert_records, invoice_record
+from benchmarks.common import make_text_pdf
+
+
+def _long_invoice(path):
+    pages = [[f"Page {i + 1} filler line" for _ in range(5)] for i in range(PDF_EARLY_EXIT_PAGES * 3)]
+    pages[0] = ["Longdoc Supplies Pvt Ltd", "Invoice Date: 03/04/2024", "Grand Total Rs 4,500.00"]
+    pages[PDF_EARLY_EXIT_PAGES + 5].append("Annexure: warranty for the quasar flux capacitor")
+    path.write_bytes(make_text_pdf(pages))
+    return str(path)
+
+
+def _search(q, owner, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        items = search_invoices(q, owner)
+        if items or time.monotonic() > deadline:
+            return items
+        time.sleep(0.05)
+
+
+def test_long_pdfs_are_indexed_in_full_after_the_upload(tmp_path):
+    path = _long_invoice(tmp_path / "long.pdf")
+    text, _ = extract_text(path, ".pdf", "full-text-test")
+    assert "quasar" not in text  # the upload stopped reading once the fields were found
+
+    insert_records([invoice_record("long.pdf", "full-text-test", StageTimer(), {"vendor_raw": "Longdoc"},
+                                   final_path=path, text=text, owner="full-text-owner")])
+
+    items = _search("quasar", "full-text-owner")
+    assert [i["original_filename"] for i in items] == ["long.pdf"]
+    # indexed once, from the full text
+    assert len(search_invoices("Longdoc", "full-text-owner")) == 1
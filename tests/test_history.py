@@ -0,0 +1,27 @@
+# tests/test_history.py
+from backend.db import insert_invoices
+from backend.routers.history import router
+
+
+def _row(owner, vendor, amount):
+    return {"original_filename": f"{vendor}.pdf", "vendor_raw": vendor, "vendor_norm": vendor,
+            "date_raw": "", "date_norm": "2024_05_01", "amount_raw": amount, "amount_norm": amount,
+            "status": "success", "owner": owner}
+
+
+def test_history_requires_a_session(client_for):
+    assert client_for(router).get("/history").status_code == 401
+
+
+def test_history_only_lists_the_callers_invoices(client_for):
+    insert_invoices([_row("history-a", "Acme", "10.00"), _row("history-b", "Globex", "20.00"),
+                     _row("history-a", "Initech", "30.00")])
+    client = client_for(router)
+    client.get("/test-login", params={"owner": "history-a"})
+
+    items = client.get("/history").json()["items"]
+    assert sorted(i["vendor_raw"] for i in items) == ["Acme", "Initech"]
+
+    # the filters don't widen the scope either
+    assert client.get("/history", params={"vendor": "Glo"}).json()["items"] == []
+    assert client.get("/history", params={"amount_min": 15, "amount_max": 25}).json()["items"] == []
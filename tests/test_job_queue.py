@@ -0,0 +1,43 @@
+# tests/test_job_queue.py
+import json
+
+from backend.db import connection
+from backend.services import job_queue
+
+
+def _queue_job(monkeypatch, tmp_path, creds_json):
+    monkeypatch.setattr(job_queue, "_submit", lambda item_id: False)
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    path = spool / "invoice.pdf"
+    path.write_bytes(b"%PDF-1.4\n")
+    job_id = job_queue.create_job(
+        [{"filename": "invoice.pdf", "spool_path": str(path), "content_hash": "job-queue-test"}],
+        {"dry_run": False}, creds_json,
+    )
+    with connection() as conn:
+        item_id = conn.execute("SELECT id FROM job_items WHERE job_id = ?", (job_id,)).fetchone()["id"]
+    return job_id, item_id
+
+
+def test_credentials_are_sealed_at_rest(monkeypatch, tmp_path):
+    creds = json.dumps({"token": "secret-token", "refresh_token": "secret-refresh"})
+    job_id, _ = _queue_job(monkeypatch, tmp_path, creds)
+    with connection() as conn:
+        stored = conn.execute("SELECT creds_json FROM jobs WHERE id = ?", (job_id,)).fetchone()["creds_json"]
+    assert "secret" not in stored
+    assert job_queue._unseal(stored) == creds
+
+
+def test_unreadable_credentials_fail_the_item(monkeypatch, tmp_path):
+    job_id, item_id = _queue_job(monkeypatch, tmp_path, json.dumps({"token": "t"}))
+    with connection() as conn:
+        # plaintext, or sealed under another JOB_CREDS_KEY
+        conn.execute("UPDATE jobs SET creds_json = ? WHERE id = ?", ('{"token": "t"}', job_id))
+        conn.commit()
+
+    job_queue._run_item(item_id)
+
+    item = job_queue.get_job(job_id)["items"][0]
+    assert item["status"] == "failed"
+    assert "credentials" in item["error"]
@@ -0,0 +1,38 @@
+# tests/test_keyword_matcher.py
+import json
+import random
+
+from backend.utils.keyword_matcher import KeywordMatcher, load_keyword_packs
+
+KEYWORDS = {
+    "total": ["grand total", "total", "amount paid", "net payable"],
+    "tax": ["gst", "cgst", "sgst", "tax"],
+    "date": ["date", "dated", "order time"],
+}
+
+
+def test_scan_agrees_with_substring_checks():
+    matcher = KeywordMatcher(KEYWORDS)
+    rng = random.Random(7)
+    words = [w for ws in KEYWORDS.values() for w in ws] + ["rs", "inr", "paid", "tot", "ga", "x", "1,200.00"]
+    for _ in range(2000):
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        expected = {c for c, ws in KEYWORDS.items() if any(w in line for w in ws)}
+        assert matcher.categories(line) == expected, line
+
+
+def test_flags_and_overlapping_keywords():
+    matcher = KeywordMatcher(KEYWORDS)
+    # "cgst" contains "gst"; "subtotal" contains "total"
+    mask = matcher.scan("cgst on subtotal")
+    assert mask & matcher.flag("tax") and mask & matcher.flag("total")
+    assert not mask & matcher.flag("date")
+    assert matcher.flag("unknown") == 0
+    assert matcher.scan("") == 0
+
+
+def test_packs_merge_and_missing_packs_are_skipped(tmp_path):
+    (tmp_path / "hi.json").write_text(json.dumps({"total": ["कुल"], "tip": ["टिप"]}), encoding="utf-8")
+    merged = load_keyword_packs(["hi", "missing"], str(tmp_path))
+    assert merged == {"total": ["कुल"], "tip": ["टिप"]}
+    assert KeywordMatcher({**KEYWORDS, "total": KEYWORDS["total"] + merged["total"]}).categories("कुल 500") == {"total"}
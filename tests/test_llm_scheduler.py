@@ -0,0 +1,50 @@
+# tests/test_llm_scheduler.py
+import os
+import time
+import asyncio
+import sqlite3
+
+from backend.services.llm_scheduler import LLMScheduler
+
+HOLD = 1.0  # seconds another worker keeps the database write lock
+
+
+def test_shared_quota_waits_for_the_write_lock_off_the_event_loop():
+    scheduler = LLMScheduler(rpm=60, tpm=100_000, shared=True)
+    other_worker = sqlite3.connect(os.environ["DB_PATH"], isolation_level=None)
+
+    async def call():
+        return "ok", {"x-ratelimit-remaining-tokens": "90000"}
+
+    async def main():
+        gaps, done = [], asyncio.Event()
+
+        async def ticker():
+            last = time.monotonic()
+            while not done.is_set():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        other_worker.execute("BEGIN IMMEDIATE")
+        asyncio.get_running_loop().call_later(HOLD, other_worker.execute, "COMMIT")
+        tick = asyncio.create_task(ticker())
+        t0 = time.monotonic()
+        try:
+            # takes quota and records the headers: two transactions, both behind the lock
+            result = await scheduler.run_async(call, max_wait=10)
+        finally:
+            done.set()
+            await tick
+        return result, time.monotonic() - t0, max(gaps)
+
+    try:
+        result, elapsed, worst_gap = asyncio.run(main())
+    finally:
+        other_worker.close()
+
+    assert result == "ok"
+    assert elapsed >= HOLD * 0.9  # it did wait for the other worker's transaction
+    assert worst_gap < 0.25  # while the loop kept running
+    assert scheduler.stats()["tokens_available"] < 95_000  # the headers were recorded too
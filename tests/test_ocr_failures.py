@@ -0,0 +1,77 @@
+# tests/test_ocr_failures.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+from backend.services import ocr_service
+from backend.services.ocr_backend import OcrBackend
+
+PAGES = 5
+BAD_CALL = 3
+
+
+class _FlakyBackend(OcrBackend):
+    """Numbers the pages it reads; the BAD_CALL-th one raises, like a Tesseract crash."""
+    name = "flaky"
+
+    def __init__(self):
+        self.calls = 0
+
+    def image_to_string(self, image) -> str:
+        self.calls += 1
+        if self.calls == BAD_CALL:
+            raise ValueError("engine crashed")
+        return f"read {self.calls}"
+
+
+def _init_flaky_worker():
+    ocr_service._backend = _FlakyBackend()
+
+
+def _blank_pdf(path: str):
+    pages = [Image.new("L", (300, 400), 255) for _ in range(PAGES)]
+    pages[0].save(path, "PDF", save_all=True, append_images=pages[1:])
+
+
+def test_one_failed_page_keeps_the_others(tmp_path, monkeypatch):
+    # one worker reads the pages in order, so the BAD_CALL-th page is the one that fails
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_flaky_worker)
+    monkeypatch.setattr(ocr_service, "_pool", pool)
+    path = str(tmp_path / "scan.pdf")
+    _blank_pdf(path)
+    pdf = pdfium.PdfDocument(path)
+    try:
+        results = ocr_service.ocr_pdf_pages(pdf, range(PAGES))
+        assert results == {0: "read 1", 1: "read 2", 2: "", 3: "read 4", 4: "read 5"}
+    finally:
+        pdf.close()
+        pool.shutdown()
+
+
+def test_results_read_before_an_error_are_kept(tmp_path, monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_flaky_worker)
+    monkeypatch.setattr(ocr_service, "_pool", pool)
+    render_page = ocr_service._render_page
+
+    def render_until_broken(pdf, index):
+        if index == 3:
+            pool.shutdown(wait=True)  # the next submit raises, as on a broken pool
+        return render_page(pdf, index)
+
+    monkeypatch.setattr(ocr_service, "_render_page", render_until_broken)
+    path = str(tmp_path / "scan.pdf")
+    _blank_pdf(path)
+    pdf = pdfium.PdfDocument(path)
+    results = {}
+    try:
+        try:
+            ocr_service.ocr_pdf_pages(pdf, range(PAGES), results=results)
+        except RuntimeError:
+            pass
+    finally:
+        pdf.close()
+    assert results == {0: "read 1", 1: "read 2", 2: ""}
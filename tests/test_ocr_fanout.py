@@ -0,0 +1,57 @@
+# tests/test_ocr_fanout.py
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw
+
+from backend.services import ocr_service
+from backend.services.ocr_backend import OcrBackend
+from backend.services.pipeline import extract_text
+from backend.services.stages import stage
+
+PAGES = 6
+WORKERS = 3
+
+
+class _PidBackend(OcrBackend):
+    """Reads every page as the id of the worker process that OCR'd it."""
+    name = "pid"
+
+    def image_to_string(self, image) -> str:
+        time.sleep(0.2)  # long enough that one worker can't take every page
+        return f"page read by worker {os.getpid()}"
+
+
+def _init_pid_worker():
+    ocr_service._backend = _PidBackend()
+
+
+def _scanned_pdf(path: str):
+    pages = []
+    for i in range(PAGES):
+        img = Image.new("L", (600, 800), 255)
+        ImageDraw.Draw(img).text((40, 40), f"Scanned page {i}", fill=0)
+        pages.append(img)
+    pages[0].save(path, "PDF", save_all=True, append_images=pages[1:])
+
+
+def test_scanned_pdf_pages_fan_out_across_ocr_workers(tmp_path, monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_pid_worker)
+    monkeypatch.setattr(ocr_service, "_pool", pool)
+    path = str(tmp_path / "scan.pdf")
+    _scanned_pdf(path)
+    try:
+        # the stage /upload and /upload/batch run text extraction on
+        text, _ = asyncio.run(stage("extract_text").run(extract_text, path, ".pdf", "fanout-test"))
+    finally:
+        pool.shutdown()
+
+    lines = [line for line in text.splitlines() if line.startswith("page read by worker")]
+    workers = {line.rsplit(" ", 1)[1] for line in lines}
+    assert len(lines) == PAGES
+    assert str(os.getpid()) not in workers
+    assert len(workers) > 1
@@ -0,0 +1,26 @@
+# tests/test_pipeline.py
+import asyncio
+import threading
+
+from backend.services import pipeline
+
+
+def test_extract_fields_async_keeps_vendor_matching_off_the_loop(monkeypatch):
+    threads = []
+
+    def match(text):
+        threads.append(threading.get_ident())
+        return {"vendor": "Acme Traders", "method": "exact"}
+
+    monkeypatch.setattr(pipeline, "match_vendor", match)
+    monkeypatch.setattr(pipeline, "VENDOR_SKIP_LLM", True)
+
+    async def run():
+        fields = await pipeline.extract_fields_async(
+            "Acme Traders\nInvoice Date: 03/04/2024\nGrand Total Rs 1,250.00", "pipeline-test"
+        )
+        return fields, threading.get_ident()
+
+    fields, loop_thread = asyncio.run(run())
+    assert fields["vendor"] == "Acme Traders"
+    assert threads and loop_thread not in threads
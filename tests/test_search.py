@@ -0,0 +1,24 @@
+# tests/test_search.py
+from backend.db import insert_invoice
+from backend.routers.search import router
+
+
+def _insert(owner, vendor, text):
+    return insert_invoice({"original_filename": f"{vendor}.pdf", "vendor_raw": vendor, "vendor_norm": vendor,
+                           "status": "success", "owner": owner, "text": text})
+
+
+def test_search_requires_a_session(client_for):
+    assert client_for(router).get("/search", params={"q": "invoice"}).status_code == 401
+
+
+def test_search_only_matches_the_callers_invoices(client_for):
+    mine = _insert("search-a", "Acme", "Tax invoice for zeppelin rental")
+    _insert("search-b", "Globex", "Tax invoice for zeppelin parking")
+    client = client_for(router)
+    client.get("/test-login", params={"owner": "search-a"})
+
+    items = client.get("/search", params={"q": "zeppelin"}).json()["items"]
+    assert [i["id"] for i in items] == [mine]
+    assert "<mark>zeppelin</mark>" in items[0]["snippet"]
+    assert client.get("/search", params={"q": "parking"}).json()["items"] == []
@@ -0,0 +1,47 @@
+# tests/test_upload_batch.py
+import json
+
+from backend.db import query_invoices
+from backend.routers.upload import router
+from benchmarks.common import make_text_pdf
+
+
+def _invoice(vendor, date, total):
+    return make_text_pdf([[vendor, "12 MG Road, Bengaluru", f"Invoice Date: {date}", "", f"Grand Total Rs {total}"]])
+
+
+def _post_batch(client, files, **params):
+    resp = client.post("/upload/batch", params=params,
+                       files=[("files", (name, data, "application/pdf")) for name, data in files])
+    assert resp.status_code == 200
+    lines = [json.loads(ln) for ln in resp.text.splitlines()]
+    return sorted(lines[:-1], key=lambda r: r["index"]), lines[-1]
+
+
+def test_dry_run_batch_flags_repeats_within_the_batch(client_for):
+    a = _invoice("Batch Test Traders", "03/04/2024", "1,250.00")
+    same_fields = _invoice("Batch Test Traders", "03/04/2024", "1,250.00") + b"\n% rescanned\n"
+    results, summary = _post_batch(client_for(router), [("a.pdf", a), ("a_copy.pdf", a), ("a_again.pdf", same_fields)],
+                                   dry_run=True)
+
+    assert summary["status"] == "complete" and summary["files"] == 3
+    assert results[1]["status"] == "duplicate" and results[1]["match"] == "exact"
+    # a.pdf and a_again.pdf run concurrently; whichever is read first is the original
+    first, repeat = sorted([results[0], results[2]], key=lambda r: r["status"] == "duplicate")
+    assert first["status"] == "dry_run" and first["fields"]["vendor"] == "Batch Test Traders"
+    assert repeat["status"] == "duplicate" and repeat["match"] == "fields"
+
+
+def test_batch_records_every_stored_file_for_the_caller(client_for):
+    client = client_for(router)
+    assert client.post("/upload/batch", files=[("files", ("x.pdf", b"", "application/pdf"))]).status_code == 401
+    client.get("/test-login", params={"owner": "batch-owner"})
+
+    files = [(f"b{i}.pdf", _invoice(f"Batch Vendor {i}", "05/06/2024", f"{100 + i}.00")) for i in range(3)]
+    results, summary = _post_batch(client, files)
+
+    assert summary["counts"] == {"success": 3}
+    assert [r["status"] for r in results] == ["success"] * 3
+    assert all(r["file_link"] for r in results)
+    rows, _ = query_invoices("batch-owner", fields=["original_filename", "vendor_raw"])
+    assert sorted(r["original_filename"] for r in rows) == ["b0.pdf", "b1.pdf", "b2.pdf"]
@@ -0,0 +1,43 @@
+# tests/test_vendor_index.py
+from backend.db import insert_invoices, load_vendors
+from backend.services.vendor_index import VendorIndex
+from backend.utils.text_utils import vendor_key
+
+NAMES = ["Swiggy", "Blue Tokai Coffee Roasters", "Chai Point", "Tax Invoice"]
+
+
+def _index():
+    return VendorIndex([{"key": vendor_key(n), "name": n, "name_norm": n, "uses": 3} for n in NAMES])
+
+
+def test_exact_line_match():
+    hit = _index().match(["BLUE TOKAI COFFEE ROASTERS", "Indiranagar"])
+    assert hit["vendor"] == "Blue Tokai Coffee Roasters" and hit["method"] == "exact"
+
+
+def test_prefix_only_when_the_name_stops_there():
+    index = _index()
+    assert index.match(["Swiggy #42"])["method"] == "prefix"
+    assert index.match(["Swiggy Instamart"]) is None
+
+
+def test_label_values_and_fuzzy_ocr_typos():
+    index = _index()
+    assert index.match(["Merchant: Chai Point"])["vendor"] == "Chai Point"
+    hit = index.match(["Blue Tokai Cofee Roasters"])
+    assert hit["vendor"] == "Blue Tokai Coffee Roasters" and hit["method"] == "fuzzy"
+
+
+def test_stop_words_are_never_vendors():
+    assert _index().match(["TAX INVOICE"]) is None
+
+
+def test_only_confirmed_vendors_are_learned():
+    insert_invoices([
+        {"vendor_raw": "Confirmed Stationers", "status": "success", "vendor_confirmed": True},
+        {"vendor_raw": "Guessed Stationers", "status": "success"},
+        {"vendor_raw": "Failed Stationers", "status": "failed", "error": "boom", "vendor_confirmed": True},
+    ])
+    learned = {v["name"] for v in load_vendors()}
+    assert "Confirmed Stationers" in learned
+    assert not learned & {"Guessed Stationers", "Failed Stationers"}